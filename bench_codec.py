@@ -0,0 +1,48 @@
+import argparse
+import base64
+import os
+import time
+
+import file_codec
+
+"""
+* microbenchmark codec JSON: untuk setiap backend yang terpasang (json,
+ujson, orjson) mengukur parse request UPLOAD dan serialize respon GET yang
+berisi base64, dalam detik per MB isi file
+
+* serialize diukur dua kali: lewat encoder JSON biasa dan dengan
+dumps_splice yang menyisipkan field base64 tanpa melewati encoder
+"""
+
+
+def measure(func, arg, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(arg)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="JSON codec microbenchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 4, 16], help="Payload sizes in MB")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per measurement, the best run is reported")
+    args = parser.parse_args()
+
+    print(f"default backend: {file_codec.BACKEND}")
+    print(f"{'Backend':<8} {'Size(MB)':<9} {'loads s/MB':<12} {'dumps s/MB':<12} {'splice s/MB':<12}")
+    for size_mb in args.sizes:
+        encoded = base64.b64encode(os.urandom(size_mb * 1024 * 1024)).decode()
+        request = file_codec.BACKENDS['json'][1](dict(command='UPLOAD', params=['bench.bin', encoded]))
+        response = dict(status='OK', data_namafile='bench.bin', data_file=encoded)
+        for name, (loads, dumps_bytes) in sorted(file_codec.BACKENDS.items()):
+            parse = measure(loads, request, args.repeat)
+            dump = measure(dumps_bytes, response, args.repeat)
+            splice = measure(lambda obj: file_codec.dumps_splice(obj, dumps_bytes=dumps_bytes), response, args.repeat)
+            print(f"{name:<8} {size_mb:<9} {parse / size_mb:<12.5f} {dump / size_mb:<12.5f} {splice / size_mb:<12.5f}")
+
+
+if __name__ == "__main__":
+    main()
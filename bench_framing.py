@@ -0,0 +1,73 @@
+import argparse
+import base64
+import json
+import os
+import time
+
+from file_framing import FrameReader
+
+"""
+* microbenchmark penerimaan pesan: membandingkan FrameReader dengan cara
+lama (buffer += data.decode() lalu cek "\r\n\r\n" in buffer) untuk pesan
+UPLOAD JSON+base64 dengan berbagai ukuran
+
+* socket diganti FakeSocket yang mengembalikan data per recv_size byte,
+sehingga yang terukur hanya biaya buffering dan pencarian delimiter
+"""
+
+class FakeSocket:
+    def __init__(self, payload):
+        self.payload = memoryview(payload)
+        self.offset = 0
+
+    def recv(self, n):
+        data = bytes(self.payload[self.offset:self.offset + n])
+        self.offset += len(data)
+        return data
+
+
+def build_message(size_bytes):
+    encoded = base64.b64encode(os.urandom(size_bytes)).decode()
+    return (json.dumps(dict(command='UPLOAD', params=['bench.bin', encoded])) + '\r\n\r\n').encode()
+
+
+def receive_legacy(sock, recv_size):
+    buffer = ""
+    while True:
+        data = sock.recv(recv_size)
+        if not data:
+            break
+        buffer += data.decode()
+        if "\r\n\r\n" in buffer:
+            message, buffer = buffer.split("\r\n\r\n", 1)
+            return message
+
+
+def receive_framereader(sock, recv_size):
+    return FrameReader(sock, recv_size=recv_size).read_message()[1]
+
+
+def measure(func, payload, recv_size):
+    start = time.perf_counter()
+    func(FakeSocket(payload), recv_size)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Receive buffering microbenchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32], help="Payload sizes in MB")
+    parser.add_argument("--recv-size", type=int, default=8192, help="Bytes returned per recv call")
+    parser.add_argument("--legacy-max", type=int, default=8, help="Largest size (MB) to run the legacy loop for")
+    args = parser.parse_args()
+
+    print(f"{'Size(MB)':<10} {'Legacy(s)':<12} {'FrameReader(s)':<15} {'FrameReader s/MB':<16}")
+    for size_mb in args.sizes:
+        payload = build_message(size_mb * 1024 * 1024)
+        legacy = measure(receive_legacy, payload, args.recv_size) if size_mb <= args.legacy_max else None
+        framed = measure(receive_framereader, payload, args.recv_size)
+        legacy_str = f"{legacy:.3f}" if legacy is not None else "-"
+        print(f"{size_mb:<10} {legacy_str:<12} {framed:<15.3f} {framed / size_mb:<16.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,296 @@
+import argparse
+import base64
+import csv
+import itertools
+import json
+import logging
+import math
+import os
+import platform
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from file_client_cli import FileClient
+
+"""
+* benchmark suite untuk semua varian server: menjalankan matriks
+varian server x mode protokol x operasi x ukuran file x jumlah client
+worker x jumlah server worker
+
+* setiap kombinasi menjalankan server baru di loopback (port acak, direktori
+kerja sementara), sehingga peak RSS dan waktu CPU server terukur per run;
+CPU dan RSS dibaca dari /proc untuk semua proses di process group server
+(termasuk worker process-pool), jadi pengukuran server hanya jalan di Linux
+
+* file uji dibuat sekali per ukuran dan dipakai ulang, untuk DOWNLOAD file
+diupload dulu ke server di luar pengukuran
+
+* hasil ditulis sebagai CSV dan JSON (beserta commit git) agar bisa
+dibandingkan antar commit
+"""
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+SERVER_VARIANTS = {
+    'thread': "import file_server as m; m.Server(ipaddress='127.0.0.1', port={port}).start()",
+    'threadpool': "import file_server_threadpool as m; m.Server(ipaddress='127.0.0.1', port={port}, max_workers={workers}).run()",
+    'processpool': "import file_server_processpool as m; m.Server(ipaddress='127.0.0.1', port={port}, max_workers={workers}).run()",
+    'async': "import file_server_async as m; m.Server(ipaddress='127.0.0.1', port={port}, max_workers={workers}).run()",
+}
+
+CLK_TCK = os.sysconf('SC_CLK_TCK') if hasattr(os, 'sysconf') else 100
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+class ServerMonitor(threading.Thread):
+    """
+    mencatat waktu CPU (utime+stime) dan peak RSS semua proses yang berada
+    di process group server, dengan sampling berkala dari /proc
+    """
+    def __init__(self, pgid, interval=0.1):
+        threading.Thread.__init__(self, daemon=True)
+        self.pgid = pgid
+        self.interval = interval
+        self.cpu_ticks = {}
+        self.peak_rss = 0
+        self.stopped = threading.Event()
+
+    def sample(self):
+        rss_total = 0
+        for pid in os.listdir('/proc'):
+            if not pid.isdigit():
+                continue
+            try:
+                with open(f'/proc/{pid}/stat') as fp:
+                    fields = fp.read().rsplit(')', 1)[1].split()
+            except OSError:
+                continue
+            # fields[0] adalah field ke-3 (state) pada /proc/<pid>/stat
+            if int(fields[2]) != self.pgid:
+                continue
+            self.cpu_ticks[pid] = int(fields[11]) + int(fields[12])
+            rss_total += int(fields[21]) * PAGE_SIZE
+        self.peak_rss = max(self.peak_rss, rss_total)
+
+    def run(self):
+        while not self.stopped.is_set():
+            self.sample()
+            self.stopped.wait(self.interval)
+
+    def cpu_seconds(self):
+        return sum(self.cpu_ticks.values()) / CLK_TCK
+
+    def stop(self):
+        self.sample()
+        self.stopped.set()
+        self.join()
+
+
+class ServerProcess:
+    def __init__(self, variant, server_workers, workdir):
+        self.port = free_port()
+        self.workdir = tempfile.mkdtemp(prefix=f'bench_{variant}_', dir=workdir)
+        code = f"import sys; sys.path.insert(0, {REPO_DIR!r}); " + SERVER_VARIANTS[variant].format(port=self.port, workers=server_workers)
+        self.process = subprocess.Popen([sys.executable, '-c', code], cwd=self.workdir,
+                                        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                                        start_new_session=True)
+        self.address = ('127.0.0.1', self.port)
+        deadline = time.time() + 10
+        while True:
+            try:
+                socket.create_connection(self.address, timeout=1).close()
+                break
+            except OSError:
+                if time.time() > deadline or self.process.poll() is not None:
+                    self.stop()
+                    raise RuntimeError(f'server {variant} failed to start')
+                time.sleep(0.05)
+
+    def stop(self):
+        try:
+            os.killpg(self.process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+        self.process.wait()
+
+
+class NullWriter:
+    # membuang isi download, hanya menghitung jumlah byte
+    def __init__(self):
+        self.size = 0
+
+    def write(self, data):
+        self.size += len(data)
+
+
+def make_test_file(workdir, size_mb):
+    filename = os.path.join(workdir, f'bench_file_{size_mb}MB.bin')
+    size_bytes = int(size_mb * 1024 * 1024)
+    if not os.path.exists(filename) or os.path.getsize(filename) != size_bytes:
+        with open(filename, 'wb') as fp:
+            sisa = size_bytes
+            while sisa > 0:
+                chunk = os.urandom(min(sisa, 1024 * 1024))
+                fp.write(chunk)
+                sisa -= len(chunk)
+    return filename
+
+
+def do_request(client, operation, mode, filename, encoded):
+    # satu request, hasil: jumlah byte isi file yang dipindahkan
+    name = os.path.basename(filename)
+    if operation == 'LIST':
+        hasil = client.request({'command': 'LIST', 'params': []})
+        size = 0
+    elif operation == 'UPLOAD' and mode == 'json':
+        hasil = client.request({'command': 'UPLOAD', 'params': [name, encoded]})
+        size = os.path.getsize(filename)
+    elif operation == 'UPLOAD':
+        with open(filename, 'rb') as fp:
+            hasil, _ = client.request_binary({'command': 'UPLOAD', 'params': [name]}, fp)
+        size = os.path.getsize(filename)
+    elif mode == 'json':
+        hasil = client.request({'command': 'GET', 'params': [name]})
+        size = len(hasil.get('data_file', '')) * 3 // 4
+    else:
+        writer = NullWriter()
+        hasil, _ = client.request_binary({'command': 'GET', 'params': [name], 'sendfile': mode == 'sendfile'}, output=writer)
+        size = writer.size
+    if hasil['status'] != 'OK':
+        raise RuntimeError(hasil.get('data'))
+    return size
+
+
+def client_worker(address, operation, mode, filename, encoded, requests):
+    client = FileClient(address)
+    latencies, total_bytes, fail = [], 0, 0
+    try:
+        for _ in range(requests):
+            start = time.perf_counter()
+            try:
+                total_bytes += do_request(client, operation, mode, filename, encoded)
+                latencies.append(time.perf_counter() - start)
+            except Exception as e:
+                logging.warning(f"request failed: {e}")
+                fail += 1
+    finally:
+        client.close()
+    return latencies, total_bytes, fail
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    # nearest-rank
+    values = sorted(values)
+    rank = max(math.ceil(p / 100 * len(values)), 1)
+    return values[rank - 1]
+
+
+def run_one(variant, mode, operation, size_mb, client_workers, server_workers, requests, workdir):
+    filename = make_test_file(workdir, size_mb)
+    encoded = None
+    if mode == 'json' and operation == 'UPLOAD':
+        with open(filename, 'rb') as fp:
+            encoded = base64.b64encode(fp.read()).decode()
+    server = ServerProcess(variant, server_workers, workdir)
+    try:
+        if operation == 'DOWNLOAD':
+            with open(filename, 'rb') as fp:
+                FileClient(server.address).request_binary({'command': 'UPLOAD', 'params': [os.path.basename(filename)]}, fp)
+        monitor = ServerMonitor(server.process.pid)
+        monitor.sample()
+        cpu_before = monitor.cpu_seconds()
+        monitor.start()
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=client_workers) as executor:
+            futures = [executor.submit(client_worker, server.address, operation, mode, filename, encoded, requests)
+                       for _ in range(client_workers)]
+            results = [f.result() for f in futures]
+        wall = time.perf_counter() - start
+        monitor.stop()
+    finally:
+        server.stop()
+    latencies = [lat for r in results for lat in r[0]]
+    total_bytes = sum(r[1] for r in results)
+    return {
+        'variant': variant,
+        'mode': mode,
+        'operation': operation,
+        'size_mb': size_mb,
+        'client_workers': client_workers,
+        'server_workers': server_workers,
+        'requests': client_workers * requests,
+        'success': len(latencies),
+        'fail': sum(r[2] for r in results),
+        'wall_s': round(wall, 4),
+        'aggregate_mbps': round(total_bytes / (1024 * 1024) / wall, 3) if wall > 0 else 0,
+        'p50_s': round(percentile(latencies, 50), 4),
+        'p95_s': round(percentile(latencies, 95), 4),
+        'p99_s': round(percentile(latencies, 99), 4),
+        'server_cpu_s': round(monitor.cpu_seconds() - cpu_before, 3),
+        'server_peak_rss_mb': round(monitor.peak_rss / (1024 * 1024), 1),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=REPO_DIR, stderr=subprocess.DEVNULL).decode().strip()
+    except Exception:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark matrix for all server variants")
+    parser.add_argument("--variants", nargs="+", choices=sorted(SERVER_VARIANTS), default=sorted(SERVER_VARIANTS))
+    parser.add_argument("--modes", nargs="+", choices=["json", "binary", "sendfile"], default=["binary"])
+    parser.add_argument("--operations", nargs="+", choices=["UPLOAD", "DOWNLOAD", "LIST"], default=["UPLOAD", "DOWNLOAD"])
+    parser.add_argument("--sizes", nargs="+", type=float, default=[1, 10], help="File sizes in MB")
+    parser.add_argument("--client-workers", nargs="+", type=int, default=[1, 5])
+    parser.add_argument("--server-workers", nargs="+", type=int, default=[5])
+    parser.add_argument("--requests", type=int, default=3, help="Requests per client worker")
+    parser.add_argument("--workdir", default=None, help="Directory for test files and server directories")
+    parser.add_argument("--output", default="bench_results", help="Output path prefix for .csv and .json")
+    args = parser.parse_args()
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix='file_bench_')
+    os.makedirs(workdir, exist_ok=True)
+    rows = []
+    matrix = itertools.product(args.variants, args.modes, args.operations, args.sizes, args.client_workers, args.server_workers)
+    for variant, mode, operation, size_mb, client_workers, server_workers in matrix:
+        if variant == 'thread' and server_workers != args.server_workers[0]:
+            # server thread-per-connection tidak punya jumlah worker
+            continue
+        row = run_one(variant, mode, operation, size_mb, client_workers, server_workers, args.requests, workdir)
+        rows.append(row)
+        print(f"{row['variant']:<12} {row['mode']:<9} {row['operation']:<9} {row['size_mb']:<7} "
+              f"c={row['client_workers']:<4} s={row['server_workers']:<4} ok={row['success']:<5} fail={row['fail']:<4} "
+              f"{row['aggregate_mbps']:>9.2f} MB/s  p50={row['p50_s']:.4f} p95={row['p95_s']:.4f} p99={row['p99_s']:.4f}  "
+              f"cpu={row['server_cpu_s']:.2f}s rss={row['server_peak_rss_mb']:.1f}MB", flush=True)
+
+    with open(f"{args.output}.csv", 'w', newline='') as fp:
+        writer = csv.DictWriter(fp, fieldnames=list(rows[0].keys()) if rows else [])
+        writer.writeheader()
+        writer.writerows(rows)
+    meta = dict(commit=git_commit(), timestamp=time.strftime('%Y-%m-%dT%H:%M:%S'),
+                python=platform.python_version(), platform=platform.platform(), requests_per_worker=args.requests)
+    with open(f"{args.output}.json", 'w') as fp:
+        json.dump(dict(meta=meta, results=rows), fp, indent=2)
+    print(f"\nResults written to {args.output}.csv and {args.output}.json")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.ERROR)
+    main()
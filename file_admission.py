@@ -0,0 +1,124 @@
+import json
+import multiprocessing
+import socket
+import threading
+
+from file_framing import DELIMITER, send_binary_response, send_json_response
+
+"""
+* class AdmissionControl membatasi beban server: jumlah koneksi yang
+dilayani bersamaan dan jumlah byte request yang sedang diproses
+(in-flight), supaya saat ada lonjakan client server menolak dengan cepat
+alih-alih kehabisan memori
+
+* request yang ditolak mendapat respon status BUSY beserta retry_after
+(detik); koneksi yang ditolak saat accept mendapat respon BUSY JSON dengan
+close=True lalu langsung ditutup
+
+* dengan shared=True counter disimpan di shared memory sehingga bisa
+dipakai bersama oleh worker server process-pool
+"""
+
+MAX_CONNECTIONS = 256
+MAX_INFLIGHT_BYTES = 1024 * 1024 * 1024
+# antrian koneksi di kernel yang belum di-accept (argumen listen)
+BACKLOG = 128
+# batas waktu menunggu pesan berikutnya pada koneksi keep-alive
+IDLE_TIMEOUT = 60
+# batas waktu satu recv/send di tengah pesan
+READ_TIMEOUT = 60
+RETRY_AFTER = 1.0
+
+ACTIVE, INFLIGHT, REJECTED_CONNECTIONS, REJECTED_REQUESTS = range(4)
+
+
+class AdmissionControl:
+    def __init__(self, max_connections=MAX_CONNECTIONS, max_inflight_bytes=MAX_INFLIGHT_BYTES,
+                 retry_after=RETRY_AFTER, shared=False):
+        # 0 berarti tanpa batas
+        self.max_connections = max_connections
+        self.max_inflight_bytes = max_inflight_bytes
+        self.retry_after = retry_after
+        if shared:
+            self.counts = multiprocessing.Array('q', 4)
+            self.lock = self.counts.get_lock()
+        else:
+            self.counts = [0] * 4
+            self.lock = threading.Lock()
+
+    def try_connection(self):
+        with self.lock:
+            if self.max_connections and self.counts[ACTIVE] >= self.max_connections:
+                self.counts[REJECTED_CONNECTIONS] += 1
+                return False
+            self.counts[ACTIVE] += 1
+            return True
+
+    def release_connection(self):
+        with self.lock:
+            self.counts[ACTIVE] -= 1
+
+    def try_bytes(self, n, force=False):
+        """
+        pesan n byte untuk request; request yang lebih besar dari batas
+        tetap diterima jika tidak ada request lain yang sedang berjalan
+        """
+        if n <= 0:
+            return True
+        with self.lock:
+            inflight = self.counts[INFLIGHT]
+            if not force and self.max_inflight_bytes and inflight and inflight + n > self.max_inflight_bytes:
+                self.counts[REJECTED_REQUESTS] += 1
+                return False
+            self.counts[INFLIGHT] += n
+            return True
+
+    def release_bytes(self, n):
+        if n > 0:
+            with self.lock:
+                self.counts[INFLIGHT] -= n
+
+    def busy(self, reason, close=False):
+        result = dict(status='BUSY', data=f'server busy: {reason}', retry_after=self.retry_after)
+        if close:
+            result['close'] = True
+        return result
+
+    def stats(self):
+        with self.lock:
+            return dict(active_connections=self.counts[ACTIVE], inflight_bytes=self.counts[INFLIGHT],
+                        rejected_connections=self.counts[REJECTED_CONNECTIONS],
+                        rejected_requests=self.counts[REJECTED_REQUESTS],
+                        max_connections=self.max_connections, max_inflight_bytes=self.max_inflight_bytes)
+
+
+def reject_connection(connection, response):
+    """
+    balas BUSY lalu tutup koneksi tanpa membuat thread; request yang sudah
+    terkirim dibaca (tanpa menunggu) dulu agar close tidak mengirim RST
+    sebelum client sempat membaca respon
+    """
+    try:
+        connection.setblocking(False)
+        try:
+            connection.recv(64 * 1024)
+        except OSError:
+            pass
+        connection.setblocking(True)
+        connection.settimeout(1)
+        connection.sendall(json.dumps(response).encode() + DELIMITER)
+        connection.shutdown(socket.SHUT_WR)
+    except OSError:
+        pass
+    finally:
+        connection.close()
+
+
+def send_busy(connection, message, response, metrics=None):
+    # message adalah ('busy', mode, BodyStream atau None) dari FrameReader
+    if message[2] is not None:
+        message[2].drain()
+    if message[1] == 'binary':
+        send_binary_response(connection, response, metrics=metrics)
+    else:
+        send_json_response(connection, [json.dumps(response).encode()], metrics)
@@ -0,0 +1,170 @@
+import hashlib
+import os
+import threading
+import uuid
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+"""
+* file_atomic berisi penulisan file secara atomik dan lock per nama file
+untuk FileInterface
+
+* isi file selalu ditulis ke file sementara di direktori yang sama lalu
+di-rename (os.replace) ke nama tujuan, sehingga pembaca hanya pernah
+melihat file lama atau file baru yang utuh
+
+* fsync diatur lewat mode: 'none' (hanya rename), 'file' (isi file di-fsync
+sebelum rename) atau 'full' (ditambah fsync direktori setelah rename);
+default dari environment variable FILE_FSYNC
+
+* class FileLocks adalah tabel reader/writer lock per nama file: di dalam
+satu proses memakai Condition per nama, antar proses (server process-pool)
+memakai lock fcntl pada satu byte di file .locks yang offsetnya dihitung
+dari hash nama file, sehingga lock untuk file yang berbeda tidak saling
+menunggu
+"""
+
+FSYNC = 'none'
+FSYNC_MODES = ('none', 'file', 'full')
+
+
+def fsync_mode(mode=None):
+    mode = mode or os.environ.get('FILE_FSYNC', FSYNC)
+    if mode not in FSYNC_MODES:
+        raise ValueError(f'Unknown fsync mode {mode}, choose from {FSYNC_MODES}')
+    return mode
+
+
+def sync_file(fd, mode):
+    if mode != 'none':
+        os.fsync(fd)
+
+
+def sync_dir(path, mode):
+    if mode != 'full':
+        return
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def temp_path(file_path, suffix='tmp'):
+    # diawali titik agar tidak masuk ke LIST
+    return os.path.join(os.path.dirname(file_path),
+                        f'.{os.path.basename(file_path)}.{uuid.uuid4().hex}.{suffix}')
+
+
+def write_temp(tmp_path, chunks, mode, on_chunk=None):
+    """tulis chunk ke tmp_path (file baru), hasil: jumlah byte"""
+    size = 0
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            for chunk in chunks:
+                if on_chunk is not None:
+                    on_chunk(chunk)
+                f.write(chunk)
+                size += len(chunk)
+            f.flush()
+            sync_file(f.fileno(), mode)
+    except:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return size
+
+
+def replace(src_path, file_path, mode):
+    os.replace(src_path, file_path)
+    sync_dir(os.path.dirname(file_path), mode)
+
+
+class _Entry:
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.readers = 0
+        self.writer = False
+        self.waiting_writers = 0
+        self.refs = 0
+
+
+class FileLocks:
+    def __init__(self, lock_path):
+        self.lock = threading.Lock()
+        self.entries = {}
+        # fd dibiarkan terbuka selama proses hidup: menutup fd mana pun
+        # untuk file ini melepas semua lock fcntl milik proses
+        self.fd = os.open(lock_path, os.O_RDWR | os.O_CREAT, 0o644) if fcntl is not None else None
+
+    def _entry(self, name):
+        with self.lock:
+            entry = self.entries.get(name)
+            if entry is None:
+                entry = self.entries[name] = _Entry()
+            entry.refs += 1
+            return entry
+
+    def _put(self, name, entry):
+        with self.lock:
+            entry.refs -= 1
+            if entry.refs == 0:
+                del self.entries[name]
+
+    def _flock(self, name, kind):
+        if self.fd is None:
+            return
+        offset = int.from_bytes(hashlib.blake2b(name.encode(), digest_size=7).digest(), 'big')
+        fcntl.lockf(self.fd, kind, 1, offset)
+
+    @contextmanager
+    def read(self, name):
+        entry = self._entry(name)
+        try:
+            with entry.cond:
+                # writer yang sedang menunggu didahulukan agar tidak kelaparan
+                while entry.writer or entry.waiting_writers:
+                    entry.cond.wait()
+                if entry.readers == 0:
+                    self._flock(name, fcntl.LOCK_SH if fcntl else None)
+                entry.readers += 1
+            try:
+                yield
+            finally:
+                with entry.cond:
+                    entry.readers -= 1
+                    if entry.readers == 0:
+                        self._flock(name, fcntl.LOCK_UN if fcntl else None)
+                        entry.cond.notify_all()
+        finally:
+            self._put(name, entry)
+
+    @contextmanager
+    def write(self, name):
+        entry = self._entry(name)
+        try:
+            with entry.cond:
+                entry.waiting_writers += 1
+                try:
+                    while entry.writer or entry.readers:
+                        entry.cond.wait()
+                    self._flock(name, fcntl.LOCK_EX if fcntl else None)
+                    entry.writer = True
+                finally:
+                    entry.waiting_writers -= 1
+                    if not entry.writer:
+                        entry.cond.notify_all()
+            try:
+                yield
+            finally:
+                with entry.cond:
+                    entry.writer = False
+                    self._flock(name, fcntl.LOCK_UN if fcntl else None)
+                    entry.cond.notify_all()
+        finally:
+            self._put(name, entry)
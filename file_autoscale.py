@@ -0,0 +1,238 @@
+import logging
+import multiprocessing
+import queue
+import threading
+import time
+
+"""
+* file_autoscale berisi pengaturan jumlah worker server thread-pool dan
+process-pool secara otomatis di antara batas min/max
+
+* request dibagi menjadi dua kelas dengan pool masing-masing: 'small'
+untuk perintah metadata (LIST, DELETE, HAS, STATS, ...) dan 'bulk' untuk
+transfer isi file (GET, UPLOAD, ...), sehingga request kecil tidak pernah
+antri di belakang transfer besar; perintah dikenali dari awal pesan tanpa
+membacanya (FrameReader.peek_command)
+
+* class ScalingPolicy menentukan target jumlah worker dari antrian
+(request yang menunggu worker), waktu tunggu request di antrian dan sisa
+memori (MemAvailable di /proc/meminfo): pool bertambah jika ada antrian
+atau waktu tunggu melewati LATENCY_TARGET, berkurang satu per satu jika
+worker menganggur selama SHRINK_AFTER evaluasi berturut-turut, dan pool
+bulk tidak ditambah (bahkan worker yang menganggur dilepas) jika memori
+kurang dari MEMORY_RESERVE
+
+* class PoolStats menyimpan counter pool; dengan shared=True counter ada di
+shared memory sehingga bisa diisi worker process-pool dan dibaca proses
+utama yang mengatur jumlah worker
+
+* class AutoscalingPool adalah pool thread dengan jumlah thread dinamis
+untuk server thread-pool
+"""
+
+SMALL_COMMANDS = ('list', 'delete', 'mdelete', 'has', 'stats', 'cache_stats', 'signature', 'upload_abort',
+                  'upload_commit')
+LATENCY_TARGET = 0.05
+SHRINK_AFTER = 10
+SCALE_INTERVAL = 0.5
+MEMORY_RESERVE = 256 * 1024 * 1024
+# perkiraan memori yang dipakai satu worker bulk (buffer transfer, pesan
+# JSON lama berisi base64)
+BULK_WORKER_MEMORY = 64 * 1024 * 1024
+
+WORKERS, BUSY, QUEUED, WAIT_SUM, WAIT_COUNT, LATENCY_SUM, LATENCY_COUNT, GROWN, SHRUNK = range(9)
+
+_memory_cache = [0.0, None]
+
+
+def request_class(command):
+    # perintah yang tidak dikenali dianggap bulk agar tidak menahan pool small
+    return 'small' if command in SMALL_COMMANDS else 'bulk'
+
+
+def memory_available():
+    """byte memori yang masih tersedia, None jika tidak diketahui (bukan Linux)"""
+    now = time.monotonic()
+    if now - _memory_cache[0] < SCALE_INTERVAL:
+        return _memory_cache[1]
+    value = None
+    try:
+        with open('/proc/meminfo') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    value = int(line.split()[1]) * 1024
+                    break
+    except OSError:
+        pass
+    _memory_cache[:] = [now, value]
+    return value
+
+
+class ScalingPolicy:
+    def __init__(self, min_workers, max_workers, worker_memory=0, latency_target=LATENCY_TARGET,
+                 memory_reserve=MEMORY_RESERVE, shrink_after=SHRINK_AFTER):
+        self.min_workers = max(min_workers, 0)
+        self.max_workers = max(max_workers, self.min_workers, 1)
+        # 0 berarti jumlah worker tidak dibatasi memori
+        self.worker_memory = worker_memory
+        self.latency_target = latency_target
+        self.memory_reserve = memory_reserve
+        self.shrink_after = shrink_after
+        self.calm = 0
+
+    def _spare(self):
+        # jumlah worker yang masih muat di memori, None jika tidak dibatasi
+        if not self.worker_memory:
+            return None
+        free = memory_available()
+        if free is None:
+            return None
+        return (free - self.memory_reserve) // self.worker_memory
+
+    def can_grow(self, workers):
+        if workers >= self.max_workers:
+            return False
+        spare = self._spare()
+        return workers < self.min_workers or spare is None or spare > 0
+
+    def target(self, workers, busy, queued, wait):
+        """dipanggil berkala, hasil: jumlah worker yang diinginkan"""
+        target = workers
+        if queued > 0 or wait > self.latency_target:
+            self.calm = 0
+            target = workers + max(queued, 1)
+        elif busy < workers:
+            self.calm += 1
+            if self.calm >= self.shrink_after:
+                self.calm = 0
+                target = workers - 1
+        else:
+            self.calm = 0
+        spare = self._spare()
+        if spare is not None:
+            if target > workers:
+                target = min(target, workers + max(spare, 0))
+            if spare < 0:
+                # memori hampir habis: lepas worker yang sedang menganggur
+                target = min(target, max(busy, workers + spare))
+        return min(max(target, self.min_workers), self.max_workers)
+
+
+class PoolStats:
+    def __init__(self, shared=False):
+        if shared:
+            self.counts = multiprocessing.Array('d', 9)
+            self.lock = self.counts.get_lock()
+        else:
+            self.counts = [0.0] * 9
+            self.lock = threading.Lock()
+
+    def add(self, index, value=1):
+        with self.lock:
+            self.counts[index] += value
+
+    def set_workers(self, n):
+        with self.lock:
+            self.counts[WORKERS] = n
+
+    def observe(self, wait=None, latency=None):
+        with self.lock:
+            if wait is not None:
+                self.counts[WAIT_SUM] += wait
+                self.counts[WAIT_COUNT] += 1
+            if latency is not None:
+                self.counts[LATENCY_SUM] += latency
+                self.counts[LATENCY_COUNT] += 1
+
+    def take_wait(self):
+        """rata-rata waktu tunggu sejak pemanggilan sebelumnya"""
+        with self.lock:
+            count = self.counts[WAIT_COUNT]
+            wait = self.counts[WAIT_SUM] / count if count else 0.0
+            self.counts[WAIT_SUM] = self.counts[WAIT_COUNT] = 0
+            return wait
+
+    def get(self, index):
+        with self.lock:
+            return self.counts[index]
+
+    def snapshot(self):
+        with self.lock:
+            c = list(self.counts)
+        return dict(workers=int(c[WORKERS]), busy=int(c[BUSY]), queued=int(c[QUEUED]),
+                    avg_latency=c[LATENCY_SUM] / c[LATENCY_COUNT] if c[LATENCY_COUNT] else 0.0,
+                    requests=int(c[LATENCY_COUNT]), grown=int(c[GROWN]), shrunk=int(c[SHRUNK]))
+
+
+class AutoscalingPool:
+    """
+    pool thread untuk satu kelas request; thread baru langsung dibuat jika
+    tidak ada thread yang menganggur (selama policy mengizinkan), dan
+    thread scaler mengevaluasi policy setiap SCALE_INTERVAL untuk
+    mengurangi thread
+    """
+    def __init__(self, name, policy, stats=None):
+        self.name = name
+        self.policy = policy
+        self.stats = stats or PoolStats()
+        self.tasks = queue.SimpleQueue()
+        self.lock = threading.Lock()
+        self.workers = 0
+        self.idle = 0
+        for _ in range(policy.min_workers):
+            self._spawn()
+        threading.Thread(target=self._scaler, name=f'{name}-scaler', daemon=True).start()
+
+    def _spawn(self):
+        with self.lock:
+            self.workers += 1
+            self.stats.set_workers(self.workers)
+        threading.Thread(target=self._worker, name=f'{self.name}-worker', daemon=True).start()
+
+    def submit(self, fn, *args):
+        self.stats.add(QUEUED)
+        self.tasks.put((time.monotonic(), fn, args))
+        with self.lock:
+            grow = self.idle == 0 and self.policy.can_grow(self.workers)
+        if grow:
+            self.stats.add(GROWN)
+            self._spawn()
+
+    def _worker(self):
+        while True:
+            with self.lock:
+                self.idle += 1
+            item = self.tasks.get()
+            with self.lock:
+                self.idle -= 1
+            if item is None:
+                # diminta berhenti oleh scaler
+                with self.lock:
+                    self.workers -= 1
+                    self.stats.set_workers(self.workers)
+                return
+            queued_at, fn, args = item
+            started = time.monotonic()
+            self.stats.add(QUEUED, -1)
+            self.stats.add(BUSY)
+            try:
+                fn(*args)
+            except Exception as e:
+                logging.warning(f"{self.name} pool task failed: {e}")
+            finally:
+                self.stats.add(BUSY, -1)
+                self.stats.observe(started - queued_at, time.monotonic() - started)
+
+    def _scaler(self):
+        while True:
+            time.sleep(SCALE_INTERVAL)
+            with self.lock:
+                workers = self.workers
+            target = self.policy.target(workers, int(self.stats.get(BUSY)), int(self.stats.get(QUEUED)),
+                                        self.stats.take_wait())
+            for _ in range(target - workers):
+                self.stats.add(GROWN)
+                self._spawn()
+            for _ in range(workers - target):
+                self.stats.add(SHRUNK)
+                self.tasks.put(None)
@@ -0,0 +1,65 @@
+import threading
+from collections import OrderedDict
+
+"""
+* class FileCache menyimpan isi file yang sering di-GET di memori,
+dengan batas total byte dan eviction LRU (least recently used)
+
+* key berisi nama file, mtime dan size sehingga isi yang sudah usang
+otomatis tidak terpakai lagi walaupun file diubah oleh proses lain;
+FileInterface juga memanggil invalidate() saat upload dan delete
+"""
+
+class FileCache:
+    def __init__(self, max_bytes=0, max_entry_bytes=None):
+        self.max_bytes = max_bytes
+        # file yang lebih besar dari ini tidak di-cache, agar satu file
+        # besar tidak mengusir semua isi cache
+        self.max_entry_bytes = max_entry_bytes if max_entry_bytes is not None else max_bytes // 4
+        self.entries = OrderedDict()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    def accepts(self, size):
+        return self.enabled and size <= self.max_entry_bytes
+
+    def get(self, key):
+        with self.lock:
+            value = self.entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        if not self.accepts(len(value)):
+            return
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.current_bytes -= len(old)
+            self.entries[key] = value
+            self.current_bytes += len(value)
+            while self.current_bytes > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.current_bytes -= len(evicted)
+                self.evictions += 1
+
+    def invalidate(self, filename):
+        with self.lock:
+            for key in [k for k in self.entries if k[0] == filename]:
+                self.current_bytes -= len(self.entries.pop(key))
+
+    def stats(self):
+        with self.lock:
+            return dict(hits=self.hits, misses=self.misses, evictions=self.evictions,
+                        entries=len(self.entries), bytes=self.current_bytes, max_bytes=self.max_bytes)
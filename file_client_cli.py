@@ -1,68 +1,408 @@
 import socket
 import json
 import base64
+import glob
+import hashlib
 import logging
+import mmap
 import os
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from file_framing import FrameReader, FileRange, ConcatBody, encode_binary_header, body_size, send_body, CHUNK_SIZE
+from file_compression import available, choose_codec, worth_compressing, compress_chunks, decompress_chunks, SAMPLE_SIZE
+from file_delta import compute_delta, to_wire, delta_size, LiteralBody
+from file_cluster import ClusterClient, parse_nodes, _OutputGuard
 
 server_address=('172.16.16.101', 45000)
+# mode cluster (lihat file_cluster): daftar node "host:port,host:port" dan
+# jumlah replika per file; jika kosong semua perintah ke server_address
+CLUSTER_NODES = parse_nodes(os.environ.get('FILE_CLUSTER', ''))
+REPLICAS = int(os.environ.get('FILE_REPLICAS', 1))
+
+# ukuran satu bagian untuk transfer ranged (GET_RANGE / UPLOAD_PART)
+PART_SIZE = 8 * 1024 * 1024
+# minta/kirim isi file terkompresi untuk GET dan UPLOAD jika menguntungkan
+COMPRESSION = True
+# kirim sha256 file saat upload: server content-addressed memverifikasinya,
+# dan isi yang sudah ada di server tidak dikirim ulang (HAS)
+DEDUPE = True
+# batas satu request MGET/MPUT/MDELETE: jumlah file dan total byte isi
+BATCH_FILES = 200
+BATCH_BYTES = 64 * 1024 * 1024
+# upload file yang sudah ada di server sebagai delta (hanya blok yang
+# berubah), untuk file minimal DELTA_MIN_SIZE byte; jika bagian yang
+# berubah lebih dari DELTA_MAX_LITERAL dari ukuran file, upload biasa
+DELTA = True
+DELTA_MIN_SIZE = 256 * 1024
+DELTA_MAX_LITERAL = 0.5
+
+class FileClientError(Exception):
+    pass
+
+
+class ConnectionClosed(FileClientError):
+    # server menutup koneksi sebelum satu byte respon pun diterima
+    pass
+
+
+class _Connection:
+    def __init__(self, address, timeout=None):
+        self.sock = socket.create_connection(address, timeout)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        # batas pesan hanya melindungi server; respon GET JSON lama untuk
+        # file besar (base64) boleh melebihi MAX_MESSAGE_SIZE
+        self.reader = FrameReader(self.sock, max_message_size=None)
+        self.last_used = time.monotonic()
+
+    def send_request(self, command_str, body=None):
+        # body None berarti pesan JSON lama, selain itu frame binary
+        if body is None:
+            self.sock.sendall((json.dumps(command_str) + '\r\n\r\n').encode())
+        else:
+            self.sock.sendall(encode_binary_header(command_str, body_size(body)))
+            send_body(self.sock, body)
+
+    def read_response(self, binary=False, output=None):
+        message = self.reader.read_message()
+        if message is None:
+            raise ConnectionClosed('connection closed by server')
+        if not binary:
+            if message[0] != 'json':
+                raise FileClientError('unexpected binary response')
+            return json.loads(message[1])
+        if message[0] != 'binary':
+            # server yang sedang penuh bisa membalas BUSY dalam bentuk JSON
+            hasil = json.loads(message[1])
+            if hasil.get('status') != 'BUSY':
+                raise FileClientError('unexpected JSON response')
+            return hasil, b''
+        # isi yang dikompresi server langsung di-decompress, pemanggil
+        # tetap menerima isi asli (header berisi "compression")
+        codec = message[1].get('compression')
+        chunks = decompress_chunks(message[2], codec) if codec else message[2]
+        if hasattr(output, 'start'):
+            # output yang perlu header sebelum menerima isi (lihat _BatchWriter)
+            output.start(message[1])
+        if output is None:
+            return message[1], b''.join(chunks)
+        for chunk in chunks:
+            output.write(chunk)
+        return message[1], b''
+
+    def close(self):
+        self.sock.close()
+
+
+class FileClient:
+    """
+    client dengan connection pool: koneksi dipakai ulang (keep-alive) untuk
+    beberapa perintah, dan pipeline() mengirim beberapa request sekaligus
+    lewat satu socket lalu membaca responnya sesuai urutan
+    """
+    def __init__(self, address=None, max_idle=8, idle_timeout=30, timeout=None, busy_retries=3):
+        self.address = address or server_address
+        self.max_idle = max_idle
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        # berapa kali request diulang jika server membalas BUSY
+        self.busy_retries = busy_retries
+        self.idle = []
+        self.lock = threading.Lock()
+
+    def _acquire(self):
+        with self.lock:
+            while self.idle:
+                conn = self.idle.pop()
+                if time.monotonic() - conn.last_used < self.idle_timeout:
+                    return conn, True
+                conn.close()
+        logging.warning(f"connecting to {self.address}")
+        return _Connection(self.address, self.timeout), False
+
+    def _release(self, conn):
+        conn.last_used = time.monotonic()
+        with self.lock:
+            if len(self.idle) < self.max_idle:
+                self.idle.append(conn)
+                return
+        conn.close()
+
+    def _call(self, command_str, body=None, binary=False, output=None):
+        start = body.tell() if hasattr(body, 'seek') else None
+        # body berupa iterator tidak bisa dikirim ulang
+        retries = self.busy_retries if body is None or start is not None or isinstance(body, (bytes, bytearray)) else 0
+        for attempt in range(retries + 1):
+            hasil = self._call_once(command_str, body, binary, output, start)
+            status = hasil[0] if binary else hasil
+            if status.get('status') != 'BUSY' or attempt == retries:
+                return hasil
+            logging.warning(f"server busy, retrying in {status.get('retry_after', 1)}s")
+            time.sleep(status.get('retry_after', 1))
+            if start is not None:
+                body.seek(start)
+        return hasil
+
+    def _call_once(self, command_str, body, binary, output, start):
+        conn, reused = self._acquire()
+        guard = _OutputGuard(output) if output is not None else None
+        sent = False
+        try:
+            conn.send_request(command_str, body)
+            sent = True
+            hasil = conn.read_response(binary, guard)
+        except (OSError, FileClientError) as e:
+            conn.close()
+            # koneksi lama mungkin sudah ditutup server: ulangi sekali dengan
+            # koneksi baru, tapi hanya jika request belum terkirim utuh atau
+            # server menutup koneksi sebelum membalas apa pun. Timeout atau
+            # putus di tengah respon bisa berarti perintah sudah dijalankan
+            # (DELETE, UPLOAD_PART, ...) atau output sudah terisi sebagian
+            resendable = body is None or start is not None or isinstance(body, (bytes, bytearray))
+            if (not reused or not resendable or (sent and not isinstance(e, ConnectionClosed))
+                    or (guard is not None and guard.written)):
+                raise
+            if start is not None:
+                body.seek(start)
+            conn = _Connection(self.address, self.timeout)
+            try:
+                conn.send_request(command_str, body)
+                hasil = conn.read_response(binary, output)
+            except:
+                conn.close()
+                raise
+        except:
+            conn.close()
+            raise
+        if (hasil[0] if binary else hasil).get('close'):
+            # server menolak koneksi dan menutupnya
+            conn.close()
+        else:
+            self._release(conn)
+        return hasil
+
+    def request(self, command_str):
+        return self._call(command_str)
+
+    def request_binary(self, command_str, body=b'', output=None):
+        return self._call(command_str, body, binary=True, output=output)
+
+    def pipeline(self, requests):
+        """
+        requests berisi dict perintah (dikirim sebagai JSON) atau pasangan
+        (dict perintah, body) yang dikirim sebagai frame binary; hasilnya
+        dict atau (header, body) sesuai urutan request
+        """
+        requests = [(r, None) if isinstance(r, dict) else r for r in requests]
+        conn, _ = self._acquire()
+        send_error = []
+
+        def sender():
+            try:
+                for command_str, body in requests:
+                    conn.send_request(command_str, body)
+            except Exception as e:
+                send_error.append(e)
+
+        # pengiriman di thread terpisah agar server yang sudah mulai
+        # membalas tidak tertahan menunggu client selesai mengirim
+        t = threading.Thread(target=sender, daemon=True)
+        t.start()
+        try:
+            hasil = [conn.read_response(body is not None) for _, body in requests]
+        except:
+            conn.close()
+            raise
+        finally:
+            t.join()
+        if send_error:
+            conn.close()
+            raise send_error[0]
+        self._release(conn)
+        return hasil
+
+    def close(self):
+        with self.lock:
+            idle, self.idle = self.idle, []
+        for conn in idle:
+            conn.close()
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(address=None):
+    # satu FileClient (dan pool koneksinya) per alamat server; tanpa alamat
+    # dan dengan CLUSTER_NODES hasilnya ClusterClient untuk semua node
+    if address is None and CLUSTER_NODES:
+        key = ('cluster', tuple(map(tuple, CLUSTER_NODES)), REPLICAS)
+        with _clients_lock:
+            if key not in _clients:
+                _clients[key] = ClusterClient(CLUSTER_NODES, get_client, REPLICAS)
+            return _clients[key]
+    address = tuple(address or server_address)
+    with _clients_lock:
+        if address not in _clients:
+            _clients[address] = FileClient(address)
+        return _clients[address]
+
 
 def send_command(command_str=""):
-    global server_address
-    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    sock.connect(server_address)
-    logging.warning(f"connecting to {server_address}")
     try:
         logging.warning(f"sending message ")
-        command_str = json.dumps(command_str) + '\r\n\r\n'
-        sock.sendall(command_str.encode())
-        # Look for the response, waiting until socket is done (no more data)
-        data_received="" #empty string
-        while True:
-            #socket does not receive all data at once, data comes in part, need to be concatenated at the end of process
-            data = sock.recv(8192)
-            if data:
-                #data is not empty, concat with previous content
-                data_received += data.decode()
-                if "\r\n\r\n" in data_received:
-                    break
-            else:
-                # no more data, stop the process by break
-                break
-        # at this point, data_received (string) will contain all data coming from the socket
-        # to be able to use the data_received as a dict, need to load it using json.loads()
-        hasil = json.loads(data_received)
+        hasil = get_client().request(command_str)
         logging.warning("data received from server:")
         return hasil
     except:
         logging.warning("error during data receiving")
         return False
 
+def send_binary_command(command_str={}, body=b'', output=None):
+    # sama seperti send_command, tapi memakai frame binary sehingga isi file
+    # dikirim dan diterima mentah tanpa base64. body boleh berupa file object
+    # (dikirim per chunk), dan jika output diberikan isi respon ditulis
+    # per chunk ke output alih-alih dikembalikan sebagai bytes
+    try:
+        return get_client().request_binary(command_str, body, output)
+    except:
+        logging.warning("error during data receiving")
+        return False, b''
 
-def remote_list():
-    command_str={
-        'command': 'LIST',
-        'params': []
-    }
-    hasil = send_command(command_str)
-    if (hasil['status']=='OK'):
-        print("daftar file : ")
+
+def remote_list(prefix="", page_size=1000):
+    # daftar file diambil per halaman dengan cursor
+    cursor = None
+    print("daftar file : ")
+    while True:
+        command_str={
+            'command': 'LIST',
+            'params': [dict(prefix=prefix, cursor=cursor, limit=page_size)]
+        }
+        hasil = send_command(command_str)
+        if not hasil or hasil['status'] != 'OK':
+            print("Gagal")
+            return False
         for nmfile in hasil['data']:
             print(f"- {nmfile}")
-        return True
-    else:
-        print("Gagal")
+        cursor = hasil.get('next_cursor')
+        if cursor is None:
+            return True
+
+def _compress_upload(fp):
+    """
+    hasil: (codec, file sementara berisi isi terkompresi) jika isi file
+    layak dikompresi, selain itu (None, fp)
+    """
+    codec = choose_codec(available()) if COMPRESSION else None
+    if codec is None or not worth_compressing(os.pread(fp.fileno(), SAMPLE_SIZE, 0), codec):
+        return None, fp
+    tmp = tempfile.TemporaryFile()
+    for chunk in compress_chunks(iter(lambda: fp.read(CHUNK_SIZE), b''), codec):
+        tmp.write(chunk)
+    tmp.seek(0)
+    return codec, tmp
+
+
+class _HashingWriter:
+    # meneruskan write ke output sambil menghitung sha256 isinya
+    def __init__(self, output):
+        self.output = output
+        self.hash = hashlib.sha256()
+
+    def write(self, data):
+        self.hash.update(data)
+        self.output.write(data)
+
+
+def file_sha256(filename):
+    h = hashlib.sha256()
+    with open(filename, 'rb') as fp:
+        for chunk in iter(lambda: fp.read(CHUNK_SIZE), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _checksum_ok(hasil, digest):
+    # server dengan backend plain tidak mengirim sha256
+    if hasil.get('sha256') and hasil['sha256'] != digest:
+        print(f"Checksum tidak cocok: {digest} != {hasil['sha256']}")
         return False
+    return True
+
+
+def _probe(filename, digest):
+    # True jika server sudah punya isi yang sama dan filename sudah
+    # dipetakan ke isi tersebut, sehingga transfer tidak diperlukan
+    hasil = send_command({'command': 'HAS', 'params': [digest, filename]})
+    return bool(hasil) and hasil.get('status') == 'OK' and hasil.get('data') is True
 
-def remote_get(filename=""):
+
+def _upload_delta(filename, digest, binary):
+    """
+    hasil: True/False jika upload sudah ditangani lewat delta, None jika
+    perlu upload biasa (file belum ada di server, server tidak mendukung
+    SIGNATURE, atau delta tidak menghemat cukup banyak)
+    """
+    sig = send_command({'command': 'SIGNATURE', 'params': [filename]})
+    if not sig or sig.get('status') != 'OK':
+        return None
+    if sig['sha256'] == digest:
+        print(f"File '{filename}' berhasil diupload (isi sama dengan di server).")
+        return True
+    with open(filename, 'rb') as fp:
+        with mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            ops = compute_delta(data, sig['blocks'], sig['block_size'], sig['size'])
+        copied, literal = delta_size(ops)
+        if literal > (copied + literal) * DELTA_MAX_LITERAL:
+            return None
+        if binary:
+            hasil, _ = send_binary_command({'command': 'UPLOAD_DELTA', 'params': [filename, to_wire(ops), digest]},
+                                           LiteralBody(fp, ops))
+        else:
+            encoded = base64.b64encode(LiteralBody(fp, ops).read()).decode()
+            hasil = send_command({'command': 'UPLOAD_DELTA', 'params': [filename, to_wire(ops), encoded, digest]})
+    if not hasil or hasil.get('status') != 'OK':
+        # misalnya file di server berubah sejak signature diambil
+        logging.warning(f"delta upload failed, falling back to full upload: {hasil and hasil.get('data')}")
+        return None
+    print(f"File '{filename}' berhasil diupload (delta: {literal} byte dikirim, {copied} byte dipakai ulang).")
+    return True
+
+
+def remote_get(filename="", binary=True):
     command_str={
         'command': 'GET',
         'params': [filename]
     }
+    if COMPRESSION:
+        command_str['accept_encoding'] = available()
+    if binary:
+        # isi file langsung ditulis per chunk ke file sementara, server
+        # diminta memakai jalur zero-copy (sendfile) jika tersedia
+        command_str['sendfile'] = True
+        tmpname = f"{filename}.part"
+        with open(tmpname, 'wb') as fp:
+            writer = _HashingWriter(fp)
+            hasil, _ = send_binary_command(command_str, output=writer)
+        if hasil and hasil['status'] == 'OK' and _checksum_ok(hasil, writer.hash.hexdigest()):
+            os.replace(tmpname, hasil['data_namafile'])
+            return True
+        os.remove(tmpname)
+        print("Gagal")
+        return False
     hasil = send_command(command_str)
     if (hasil['status']=='OK'):
         #proses file dalam bentuk base64 ke bentuk bytes
         namafile= hasil['data_namafile']
         isifile = base64.b64decode(hasil['data_file'])
+        if hasil.get('compression'):
+            isifile = b''.join(decompress_chunks([isifile], hasil['compression']))
+        if not _checksum_ok(hasil, hashlib.sha256(isifile).hexdigest()):
+            return False
         fp = open(namafile,'wb+')
         fp.write(isifile)
         fp.close()
@@ -71,23 +411,57 @@ def remote_get(filename=""):
         print("Gagal")
         return False
     
-def remote_upload(filename=""):
+def remote_upload(filename="", binary=True):
     if not os.path.exists(filename):
         print(f"File '{filename}' tidak ditemukan.")
         return False
 
     try:
+        digest = file_sha256(filename) if DEDUPE else None
+        if digest and _probe(filename, digest):
+            print(f"File '{filename}' berhasil diupload (sudah ada di server).")
+            return True
+        if DELTA and os.path.getsize(filename) >= DELTA_MIN_SIZE:
+            done = _upload_delta(filename, digest or file_sha256(filename), binary)
+            if done is not None:
+                return done
+        if binary:
+            command_str = {
+                'command': 'UPLOAD',
+                'params': [filename]
+            }
+            if digest:
+                command_str['sha256'] = digest
+            with open(filename, "rb") as fp:
+                codec, body = _compress_upload(fp)
+                if codec is not None:
+                    command_str['compression'] = codec
+                    command_str['original_size'] = os.fstat(fp.fileno()).st_size
+                with body:
+                    hasil, _ = send_binary_command(command_str, body)
+            if hasil and hasil['status'] == 'OK':
+                print(f"File '{filename}' berhasil diupload.")
+                return True
+            print("Gagal upload.")
+            return False
         with open(filename, "rb") as fp:
-            file_content = fp.read()
+            codec, body = _compress_upload(fp)
+            original_size = os.fstat(fp.fileno()).st_size
+            with body:
+                file_content = body.read()
         encoded_content = base64.b64encode(file_content).decode('utf-8')
 
         missing_padding = len(encoded_content) % 4
         if missing_padding != 0:
             encoded_content += '=' * (4 - missing_padding)
 
+        params = [filename, encoded_content, codec, digest]
+        if codec is not None:
+            # ukuran asli dipakai server untuk membatasi hasil dekompresi
+            params.append(original_size)
         command_str = {
             'command': 'UPLOAD',
-            'params': [filename, encoded_content]
+            'params': params
         }
         hasil = send_command(command_str)
         if hasil['status'] == 'OK':
@@ -100,6 +474,314 @@ def remote_upload(filename=""):
         print(f"Error saat upload: {e}")
         return False
     
+class _PositionalWriter:
+    # menulis isi respon ke fd mulai dari offset tertentu (pwrite)
+    def __init__(self, fd, offset):
+        self.fd = fd
+        self.offset = offset
+
+    def write(self, data):
+        os.pwrite(self.fd, data, self.offset)
+        self.offset += len(data)
+
+
+def _load_state(path):
+    try:
+        with open(path) as fp:
+            return json.load(fp)
+    except (OSError, ValueError):
+        return {}
+
+
+def _run_parts(parts, worker, state, statename, streams, retries):
+    # jalankan worker(offset, length) untuk setiap bagian secara paralel;
+    # bagian yang gagal diulang, bagian yang selesai dicatat ke file state
+    # agar transfer bisa dilanjutkan jika program dijalankan ulang
+    lock = threading.Lock()
+
+    def task(offset, length):
+        for attempt in range(retries + 1):
+            try:
+                worker(offset, length)
+                break
+            except Exception as e:
+                logging.warning(f"part at {offset} failed (attempt {attempt + 1}): {e}")
+        else:
+            return False
+        with lock:
+            state['done'].append(offset)
+            with open(statename, 'w') as fp:
+                json.dump(state, fp)
+        return True
+
+    with ThreadPoolExecutor(max_workers=streams) as executor:
+        hasil = list(executor.map(lambda part: task(*part), parts))
+    return all(hasil)
+
+
+def remote_get_ranged(filename="", streams=4, part_size=PART_SIZE, retries=3):
+    # file diunduh per bagian lewat beberapa koneksi paralel ke filename.part,
+    # bagian yang sudah selesai dicatat di filename.part.json
+    client = get_client()
+    tmpname = f"{filename}.part"
+    statename = f"{tmpname}.json"
+    try:
+        hasil, _ = client.request_binary({'command': 'GET_RANGE', 'params': [filename, 0, 1]})
+    except Exception as e:
+        print(f"Gagal: {e}")
+        return False
+    if hasil['status'] != 'OK':
+        print("Gagal")
+        return False
+    total_size = hasil['total_size']
+    state = _load_state(statename)
+    if state.get('total_size') != total_size or not os.path.exists(tmpname):
+        state = dict(total_size=total_size, done=[])
+        with open(tmpname, 'wb') as fp:
+            fp.truncate(total_size)
+    done = set(state['done'])
+    parts = [(offset, min(part_size, total_size - offset))
+             for offset in range(0, total_size, part_size) if offset not in done]
+
+    fd = os.open(tmpname, os.O_WRONLY)
+    try:
+        def worker(offset, length):
+            command_str = {'command': 'GET_RANGE', 'params': [filename, offset, length], 'sendfile': True}
+            header, _ = client.request_binary(command_str, output=_PositionalWriter(fd, offset))
+            if header['status'] != 'OK' or header['length'] != length:
+                raise FileClientError(header.get('data', 'short range'))
+        ok = _run_parts(parts, worker, state, statename, streams, retries)
+    finally:
+        os.close(fd)
+    if not ok:
+        print("Gagal, jalankan ulang untuk melanjutkan download.")
+        return False
+    if hasil.get('sha256') and not _checksum_ok(hasil, file_sha256(tmpname)):
+        # isi file berubah di server selama transfer, mulai ulang dari awal
+        if os.path.exists(statename):
+            os.remove(statename)
+        return False
+    os.replace(tmpname, filename)
+    if os.path.exists(statename):
+        os.remove(statename)
+    return True
+
+
+def remote_upload_ranged(filename="", streams=4, part_size=PART_SIZE, retries=3):
+    # file diupload per bagian (UPLOAD_PART) lewat beberapa koneksi paralel
+    # lalu disatukan di server dengan UPLOAD_COMMIT
+    if not os.path.exists(filename):
+        print(f"File '{filename}' tidak ditemukan.")
+        return False
+    client = get_client()
+    digest = file_sha256(filename) if DEDUPE else None
+    if digest and _probe(filename, digest):
+        print(f"File '{filename}' berhasil diupload (sudah ada di server).")
+        return True
+    st = os.stat(filename)
+    statename = f"{filename}.upload.json"
+    state = _load_state(statename)
+    if state.get('total_size') != st.st_size or state.get('mtime') != st.st_mtime:
+        state = dict(upload_id=uuid.uuid4().hex, total_size=st.st_size, mtime=st.st_mtime, done=[])
+    upload_id = state['upload_id']
+    done = set(state['done'])
+    parts = [(offset, min(part_size, st.st_size - offset))
+             for offset in range(0, max(st.st_size, 1), part_size) if offset not in done]
+
+    def worker(offset, length):
+        with open(filename, 'rb') as fp:
+            command_str = {'command': 'UPLOAD_PART', 'params': [filename, upload_id, offset]}
+            header, _ = client.request_binary(command_str, FileRange(fp, offset, length))
+        if header['status'] != 'OK':
+            raise FileClientError(header['data'])
+
+    if not _run_parts(parts, worker, state, statename, streams, retries):
+        print("Gagal upload, jalankan ulang untuk melanjutkan.")
+        return False
+    hasil = send_command({'command': 'UPLOAD_COMMIT', 'params': [filename, upload_id, st.st_size] + ([digest] if digest else [])})
+    if not hasil or hasil['status'] != 'OK':
+        print("Gagal upload.")
+        return False
+    if os.path.exists(statename):
+        os.remove(statename)
+    print(f"File '{filename}' berhasil diupload.")
+    return True
+
+
+class _BatchWriter:
+    """
+    menulis isi respon MGET binary (isi beberapa file berurutan) ke file
+    masing-masing sesuai size di header; setiap file ditulis ke .part lalu
+    di-rename setelah lengkap dan checksum-nya cocok
+    """
+    def __init__(self):
+        self.entries = []
+        self.index = -1
+        self.fp = None
+        self.remaining = 0
+        self.done = []
+
+    def start(self, header):
+        self.entries = [e for e in header.get('data', []) if e.get('status') == 'OK'] if header.get('status') == 'OK' else []
+        self._next()
+
+    def _next(self):
+        # tutup file yang sudah lengkap dan buka file berikutnya (file kosong
+        # langsung selesai tanpa menunggu isi)
+        while True:
+            if self.fp is not None:
+                self.fp.close()
+                entry = self.entries[self.index]
+                name = entry['data_namafile']
+                if _checksum_ok(entry, self.hash.hexdigest()):
+                    os.replace(f"{name}.part", name)
+                    self.done.append(name)
+                else:
+                    os.remove(f"{name}.part")
+                self.fp = None
+            self.index += 1
+            if self.index >= len(self.entries):
+                return
+            self.fp = open(f"{self.entries[self.index]['data_namafile']}.part", 'wb')
+            self.hash = hashlib.sha256()
+            self.remaining = self.entries[self.index]['size']
+            if self.remaining > 0:
+                return
+
+    def write(self, data):
+        data = memoryview(data)
+        while data:
+            piece, data = data[:self.remaining], data[self.remaining:]
+            self.fp.write(piece)
+            self.hash.update(piece)
+            self.remaining -= len(piece)
+            if self.remaining == 0:
+                self._next()
+
+    def close(self):
+        if self.fp is not None:
+            name = self.entries[self.index]['data_namafile']
+            self.fp.close()
+            os.remove(f"{name}.part")
+            self.fp = None
+
+
+def _batches(items, sizes=None, names=None):
+    """
+    bagi items menjadi beberapa request menurut BATCH_FILES dan BATCH_BYTES;
+    di mode cluster satu batch hanya berisi file dengan replika yang sama
+    (names: nama file di server untuk setiap item)
+    """
+    groups = {}
+    client = get_client() if CLUSTER_NODES else None
+    for i, item in enumerate(items):
+        key = client.replica_key((names or items)[i]) if client is not None else None
+        groups.setdefault(key, []).append(i)
+    for indexes in groups.values():
+        batch, total = [], 0
+        for i in indexes:
+            size = sizes[i] if sizes else 0
+            if batch and (len(batch) >= BATCH_FILES or total + size > BATCH_BYTES):
+                yield batch
+                batch, total = [], 0
+            batch.append(items[i])
+            total += size
+        if batch:
+            yield batch
+
+
+def _print_batch(hasil, verb):
+    ok = True
+    for entry in hasil:
+        if entry.get('status') == 'OK':
+            print(f"File '{entry.get('data_namafile')}' berhasil {verb}.")
+        else:
+            print(f"Gagal: {entry.get('data')}")
+            ok = False
+    return ok
+
+
+def remote_mget(filenames, binary=True):
+    # download banyak file dengan satu request per batch
+    ok = True
+    for batch in _batches(list(filenames)):
+        command_str = {'command': 'MGET', 'params': [batch]}
+        if binary:
+            writer = _BatchWriter()
+            try:
+                hasil, _ = send_binary_command(command_str, output=writer)
+            finally:
+                writer.close()
+            if not hasil or hasil['status'] != 'OK':
+                print("Gagal")
+                return False
+            for entry in hasil['data']:
+                if entry['status'] == 'OK' and entry['data_namafile'] not in writer.done:
+                    entry.update(status='ERROR', data=f"Checksum tidak cocok untuk {entry['data_namafile']}")
+            ok = _print_batch(hasil['data'], 'didownload') and ok
+            continue
+        hasil = send_command(command_str)
+        if not hasil or hasil['status'] != 'OK':
+            print("Gagal")
+            return False
+        for entry in hasil['data']:
+            if entry['status'] != 'OK':
+                continue
+            isifile = base64.b64decode(entry.pop('data_file'))
+            if _checksum_ok(entry, hashlib.sha256(isifile).hexdigest()):
+                with open(entry['data_namafile'], 'wb') as fp:
+                    fp.write(isifile)
+            else:
+                entry.update(status='ERROR', data=f"Checksum tidak cocok untuk {entry['data_namafile']}")
+        ok = _print_batch(hasil['data'], 'didownload') and ok
+    return ok
+
+
+def remote_mput(patterns, binary=True):
+    """
+    upload semua file yang cocok dengan pola glob, nama file di server
+    adalah nama file tanpa direktori
+    """
+    filenames = []
+    ok = True
+    for pattern in patterns:
+        matches = sorted(p for p in glob.glob(pattern) if os.path.isfile(p))
+        if not matches:
+            print(f"File '{pattern}' tidak ditemukan.")
+            ok = False
+        filenames.extend(matches)
+    sizes = [os.path.getsize(name) for name in filenames]
+    for batch in _batches(list(zip(filenames, sizes)), sizes, [os.path.basename(name) for name in filenames]):
+        items = [[os.path.basename(name), size] + ([file_sha256(name)] if DEDUPE else []) for name, size in batch]
+        if binary:
+            body = ConcatBody([open(name, 'rb') for name, _ in batch])
+            try:
+                hasil, _ = send_binary_command({'command': 'MUPLOAD', 'params': [items]}, body)
+            finally:
+                body.close()
+        else:
+            for item, (name, _) in zip(items, batch):
+                with open(name, 'rb') as fp:
+                    item[1:2] = [base64.b64encode(fp.read()).decode(), None]
+            hasil = send_command({'command': 'MUPLOAD', 'params': [items]})
+        if not hasil or hasil['status'] != 'OK':
+            print("Gagal upload.")
+            return False
+        ok = _print_batch(hasil['data'], 'diupload') and ok
+    return ok
+
+
+def remote_mdelete(filenames):
+    ok = True
+    for batch in _batches(list(filenames)):
+        hasil = send_command({'command': 'MDELETE', 'params': [batch]})
+        if not hasil or hasil['status'] != 'OK':
+            print("Gagal hapus.")
+            return False
+        ok = _print_batch(hasil['data'], 'dihapus') and ok
+    return ok
+
+
 def remote_delete(filename=""):
     command_str = {
         'command': 'DELETE',
@@ -117,7 +799,8 @@ def remote_delete(filename=""):
 import shlex
 
 if __name__ == '__main__':
-    print("Ketik perintah: LIST | GET <namafile> | UPLOAD <namafile> | DELETE <namafile> | EXIT")
+    print("Ketik perintah: LIST [prefix] | GET <namafile> | UPLOAD <namafile> | DELETE <namafile> | RGET <namafile> [n] | RPUT <namafile> [n] | "
+          "MGET <namafile>... | MPUT <pola glob>... | MDELETE <namafile>... | EXIT")
 
     while True:
         try:
@@ -132,7 +815,7 @@ if __name__ == '__main__':
                 print("Keluar dari aplikasi.")
                 break
             elif cmd == 'LIST':
-                remote_list()
+                remote_list(tokens[1] if len(tokens) >= 2 else "")
             elif cmd == 'GET':
                 if len(tokens) >= 2:
                     remote_get(tokens[1])
@@ -143,11 +826,30 @@ if __name__ == '__main__':
                     remote_upload(tokens[1])
                 else:
                     print("Format: UPLOAD <namafile>")
+            elif cmd in ('RGET', 'RPUT'):
+                if len(tokens) >= 2:
+                    streams = int(tokens[2]) if len(tokens) >= 3 else 4
+                    if cmd == 'RGET':
+                        remote_get_ranged(tokens[1], streams)
+                    else:
+                        remote_upload_ranged(tokens[1], streams)
+                else:
+                    print(f"Format: {cmd} <namafile> [jumlah_stream]")
             elif cmd == 'DELETE':
                 if len(tokens) >= 2:
                     remote_delete(tokens[1])
                 else:
                     print("Format: DELETE <namafile>")
+            elif cmd in ('MGET', 'MPUT', 'MDELETE'):
+                if len(tokens) >= 2:
+                    if cmd == 'MGET':
+                        remote_mget(tokens[1:])
+                    elif cmd == 'MPUT':
+                        remote_mput(tokens[1:])
+                    else:
+                        remote_mdelete(tokens[1:])
+                else:
+                    print(f"Format: {cmd} <namafile>...")
             else:
                 print("Perintah tidak dikenal.")
         except KeyboardInterrupt:
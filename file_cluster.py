@@ -0,0 +1,279 @@
+import hashlib
+import itertools
+import logging
+import tempfile
+import threading
+from bisect import bisect_right
+
+from file_framing import CHUNK_SIZE
+
+"""
+* file_cluster berisi mode cluster di sisi client: file dibagi ke
+beberapa node server, masing-masing dengan direktori files/ sendiri
+
+* class HashRing memetakan nama file ke node dengan consistent hashing:
+setiap node punya VNODES titik (virtual node) di ring, nama file dipetakan
+ke titik pertama searah jarum jam; dengan replikasi R file disimpan di R
+node berbeda berikutnya di ring, sehingga menambah/menghapus node hanya
+memindahkan sebagian kecil file
+
+* class ClusterClient punya antarmuka yang sama dengan FileClient
+(request / request_binary), jadi fungsi remote_* di file_client_cli
+tidak perlu tahu mode cluster:
+  - perintah tulis (UPLOAD, DELETE, UPLOAD_PART, ...) dikirim ke semua
+    replika nama file
+  - perintah baca (GET, GET_RANGE, SIGNATURE, MGET) dibagi bergiliran ke
+    replika, dan jika satu replika gagal dicoba replika berikutnya
+  - LIST dikirim ke semua node dan hasilnya digabung (termasuk cursor)
+  - perintah tanpa nama file (STATS, ...) dikirim ke semua node, data
+    respon berupa dict per node
+  - perintah batch harus berisi file dengan replika yang sama (lihat
+    replica_key), file_client_cli mengelompokkannya lebih dulu
+
+* file_rebalance memindahkan file jika susunan node berubah
+"""
+
+VNODES = 64
+REPLICAS = 1
+
+WRITE_COMMANDS = ('upload', 'upload_delta', 'delete', 'upload_part', 'upload_commit', 'upload_abort',
+                  'mupload', 'mdelete', 'has')
+READ_COMMANDS = ('get', 'get_range', 'signature', 'mget')
+BATCH_COMMANDS = ('mget', 'mupload', 'mdelete')
+
+
+def parse_nodes(value):
+    """'host:port,host:port' -> [(host, port), ...]"""
+    nodes = []
+    for item in value.replace(' ', ',').split(','):
+        if item:
+            host, _, port = item.rpartition(':')
+            nodes.append((host, int(port)))
+    return nodes
+
+
+def node_name(node):
+    return f'{node[0]}:{node[1]}'
+
+
+def _hash(key):
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), 'big')
+
+
+class HashRing:
+    def __init__(self, nodes, vnodes=VNODES):
+        if not nodes:
+            raise ValueError('Cluster has no nodes')
+        self.nodes = [tuple(node) for node in nodes]
+        self.ring = sorted((_hash(f'{node_name(node)}#{i}'), node) for node in self.nodes for i in range(vnodes))
+        self.keys = [h for h, _ in self.ring]
+
+    def nodes_for(self, name, replicas=1):
+        """R node berbeda untuk nama file, node pertama adalah node utama"""
+        replicas = min(max(replicas, 1), len(self.nodes))
+        start = bisect_right(self.keys, _hash(name))
+        found = []
+        for i in range(len(self.ring)):
+            node = self.ring[(start + i) % len(self.ring)][1]
+            if node not in found:
+                found.append(node)
+                if len(found) == replicas:
+                    break
+        return found
+
+
+def _key(command, params):
+    # nama file yang menentukan node untuk perintah ini, None jika tidak ada
+    if not params:
+        return None
+    if command == 'has':
+        return params[1] if len(params) > 1 and params[1] else None
+    if command in BATCH_COMMANDS:
+        items = params[0]
+        if not items:
+            return None
+        return items[0][0] if command == 'mupload' else items[0]
+    return params[0] if isinstance(params[0], str) else None
+
+
+def _batch_names(command, params):
+    return [item[0] for item in params[0]] if command == 'mupload' else list(params[0])
+
+
+def _rewindable(body):
+    # isi request dikirim ulang ke setiap replika; isi yang tidak bisa
+    # di-seek (misalnya ConcatBody untuk MUPLOAD) disalin dulu ke file sementara
+    if body is None or isinstance(body, (bytes, bytearray, memoryview)) or hasattr(body, 'seek'):
+        return body, False
+    tmp = tempfile.TemporaryFile()
+    for chunk in iter(lambda: body.read(CHUNK_SIZE), b''):
+        tmp.write(chunk)
+    tmp.seek(0)
+    return tmp, True
+
+
+class _OutputGuard:
+    # mencatat apakah isi respon sudah mulai ditulis ke output, karena
+    # hanya request yang belum menulis apa pun yang bisa diulang di replika lain
+    def __init__(self, output):
+        self.output = output
+        self.written = False
+        if hasattr(output, 'start'):
+            self.start = self._start
+
+    def _start(self, header):
+        self.written = True
+        self.output.start(header)
+
+    def write(self, data):
+        self.written = True
+        self.output.write(data)
+
+
+class ClusterClient:
+    def __init__(self, nodes, client_factory, replicas=REPLICAS, vnodes=VNODES):
+        """client_factory(address) -> FileClient untuk satu node"""
+        self.ring = HashRing(nodes, vnodes)
+        self.replicas = replicas
+        self.client_factory = client_factory
+        # giliran replika untuk perintah baca
+        self.counter = itertools.count()
+        self.lock = threading.Lock()
+
+    def replica_key(self, name):
+        return tuple(self.ring.nodes_for(name, self.replicas))
+
+    def _send(self, node, command_str, body, binary, output):
+        client = self.client_factory(node)
+        if binary:
+            return client.request_binary(command_str, body, output)
+        return client.request(command_str)
+
+    def _call(self, command_str, body=None, binary=False, output=None):
+        command = str(command_str.get('command', '')).lower()
+        params = command_str.get('params', [])
+        if command == 'list':
+            hasil = self._list(command_str)
+            return (hasil, b'') if binary else hasil
+        key = _key(command, params)
+        if key is None:
+            hasil = self._broadcast(command_str)
+            return (hasil, b'') if binary else hasil
+        replicas = self.ring.nodes_for(key, self.replicas)
+        if command in BATCH_COMMANDS:
+            wrong = [n for n in _batch_names(command, params) if self.ring.nodes_for(n, self.replicas) != replicas]
+            if wrong:
+                hasil = dict(status='ERROR', data=f'Batch spans several replica sets: {wrong[:5]}')
+                return (hasil, b'') if binary else hasil
+        if command in READ_COMMANDS:
+            return self._read(replicas, command_str, body, binary, output)
+        if command in WRITE_COMMANDS:
+            return self._write(replicas, command_str, body, binary, output)
+        return self._send(replicas[0], command_str, body, binary, output)
+
+    def _read(self, replicas, command_str, body, binary, output):
+        with self.lock:
+            start = next(self.counter) % len(replicas)
+        order = replicas[start:] + replicas[:start]
+        hasil = None
+        for i, node in enumerate(order):
+            last = i == len(order) - 1
+            guard = _OutputGuard(output) if output is not None else None
+            try:
+                hasil = self._send(node, command_str, body, binary, guard)
+            except Exception as e:
+                if last or (guard is not None and guard.written):
+                    raise
+                logging.warning(f"node {node_name(node)} failed: {e}, trying next replica")
+                continue
+            status = hasil[0] if binary else hasil
+            if status.get('status') == 'OK' or last:
+                return hasil
+            logging.warning(f"node {node_name(node)}: {status.get('data')}, trying next replica")
+        return hasil
+
+    def _write(self, replicas, command_str, body, binary, output):
+        body, spooled = _rewindable(body)
+        start = body.tell() if hasattr(body, 'seek') else None
+        try:
+            results = []
+            for node in replicas:
+                if start is not None:
+                    body.seek(start)
+                try:
+                    results.append((node, self._send(node, command_str, body, binary, output)))
+                except Exception as e:
+                    logging.warning(f"node {node_name(node)} failed: {e}")
+                    failed = dict(status='ERROR', data=f'node {node_name(node)} failed: {e}')
+                    results.append((node, (failed, b'') if binary else failed))
+        finally:
+            if spooled:
+                body.close()
+        if str(command_str.get('command', '')).lower() == 'has':
+            # isi dianggap sudah ada hanya jika semua replika sudah punya
+            found = all((r[0] if binary else r).get('data') is True for _, r in results)
+            hasil = results[0][1]
+            (hasil[0] if binary else hasil)['data'] = found
+            return hasil
+        for node, hasil in results:
+            status = hasil[0] if binary else hasil
+            if status.get('status') != 'OK':
+                status['data'] = f"{node_name(node)}: {status.get('data')}"
+                return hasil
+        return results[0][1]
+
+    def _each_node(self, command_str):
+        results = {}
+        for node in self.ring.nodes:
+            try:
+                results[node] = self.client_factory(node).request(command_str)
+            except Exception as e:
+                logging.warning(f"node {node_name(node)} failed: {e}")
+                results[node] = dict(status='ERROR', data=str(e))
+        return results
+
+    def _broadcast(self, command_str):
+        results = self._each_node(command_str)
+        if all(r.get('status') != 'OK' for r in results.values()):
+            return next(iter(results.values()))
+        return dict(status='OK', data={node_name(node): r.get('data') for node, r in results.items()})
+
+    def _list(self, command_str):
+        """
+        LIST ke semua node lalu digabung; cursor adalah nama file (lihat
+        DirectoryIndex.page), jadi halaman berikutnya tetap bisa diminta
+        ke semua node dengan cursor yang sama
+        """
+        params = command_str.get('params', [])
+        opsi = params[0] if params and isinstance(params[0], dict) else None
+        results = self._each_node(command_str)
+        ok = [r for r in results.values() if r.get('status') == 'OK']
+        if not ok:
+            return next(iter(results.values()))
+        merged = {}
+        for r in ok:
+            for entry in r['data']:
+                merged.setdefault(entry['name'] if isinstance(entry, dict) else entry, entry)
+        names = sorted(merged)
+        result = dict(status='OK')
+        if opsi is not None:
+            limit = opsi.get('limit')
+            more = any(r.get('next_cursor') is not None for r in ok)
+            if limit is not None and len(names) > limit:
+                names, more = names[:limit], True
+            result['next_cursor'] = names[-1] if more and names else None
+        result['data'] = [merged[name] for name in names]
+        unavailable = [node_name(node) for node, r in results.items() if r.get('status') != 'OK']
+        if unavailable:
+            result['unavailable'] = unavailable
+        return result
+
+    def request(self, command_str):
+        return self._call(command_str)
+
+    def request_binary(self, command_str, body=b'', output=None):
+        return self._call(command_str, body, binary=True, output=output)
+
+    def close(self):
+        for node in self.ring.nodes:
+            self.client_factory(node).close()
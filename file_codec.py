@@ -0,0 +1,80 @@
+import json
+import os
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+"""
+* file_codec memilih backend JSON untuk FileProtocol: orjson jika
+terpasang, lalu ujson, dan json bawaan Python sebagai cadangan; backend
+bisa dipaksa lewat environment variable FILE_JSON_BACKEND
+
+* semua backend dibungkus sebagai pasangan (loads, dumps) dengan dumps
+menghasilkan bytes, karena respon langsung dikirim ke socket
+
+* field respon yang berisi base64 (data_file) tidak dilewatkan ke encoder
+JSON: base64 tidak pernah butuh escape, jadi isinya cukup disisipkan
+langsung ke hasil encode field lainnya (dumps_splice)
+"""
+
+# field respon berisi base64 yang disisipkan tanpa di-encode ulang
+BLOB_FIELDS = ('data_file',)
+
+
+def _json_dumps(obj):
+    return json.dumps(obj).encode()
+
+
+BACKENDS = {'json': (json.loads, _json_dumps)}
+if ujson is not None:
+    BACKENDS['ujson'] = (ujson.loads, lambda obj: ujson.dumps(obj, escape_forward_slashes=False).encode())
+if orjson is not None:
+    BACKENDS['orjson'] = (orjson.loads, orjson.dumps)
+
+
+def pilih_backend(name=None):
+    name = name or os.environ.get('FILE_JSON_BACKEND')
+    if not name:
+        name = next(n for n in ('orjson', 'ujson', 'json') if n in BACKENDS)
+    if name not in BACKENDS:
+        raise ValueError(f'JSON backend {name} is not available, choose from {sorted(BACKENDS)}')
+    return name, BACKENDS[name]
+
+
+BACKEND, (loads, dumps_bytes) = pilih_backend()
+
+
+def dumps(obj):
+    return dumps_bytes(obj).decode()
+
+
+def splice_prefix(obj, field='data_file', dumps_bytes=dumps_bytes):
+    """
+    awal objek JSON sampai pembuka string field, misalnya
+    {"status":"OK",...,"data_file":" ; isi field dan '"}' dikirim terpisah
+    """
+    head = dumps_bytes(obj)[:-1]
+    return head + (b',' if obj else b'') + b'"' + field.encode() + b'":"'
+
+
+def dumps_splice(obj, blob_fields=BLOB_FIELDS, dumps_bytes=dumps_bytes):
+    blobs = [(k, obj[k]) for k in blob_fields if isinstance(obj.get(k), (str, bytes))]
+    if not blobs:
+        return dumps_bytes(obj)
+    names = {k for k, _ in blobs}
+    rest = {k: v for k, v in obj.items() if k not in names}
+    parts = [dumps_bytes(rest)[:-1]]
+    for k, v in blobs:
+        sep = b',' if len(parts) > 1 or rest else b''
+        parts.append(sep + b'"' + k.encode() + b'":"')
+        parts.append(v.encode('ascii') if isinstance(v, str) else v)
+        parts.append(b'"')
+    parts.append(b'}')
+    return b''.join(parts)
@@ -0,0 +1,211 @@
+import base64
+import os
+import zlib
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import lz4.frame
+except ImportError:
+    lz4 = None
+
+"""
+* file_compression berisi kompresi isi file yang dinegosiasikan per
+request: client mengirim daftar codec yang didukung (accept_encoding),
+server memilih salah satu dan menandai respon dengan "compression"
+
+* zlib selalu tersedia, zstd dan lz4 dipakai jika modul zstandard /
+lz4 terpasang
+
+* kompresi dan dekompresi dilakukan per chunk (compress_chunks /
+decompress_chunks), sehingga file besar tidak perlu ditampung utuh
+
+* sebelum mengompresi file, potongan awal file dikompresi dulu sebagai
+sampel; jika rasionya buruk (misalnya data acak atau file yang sudah
+terkompresi) file dikirim apa adanya
+
+* dekompresi menghasilkan potongan maksimal OUTPUT_CHUNK byte per langkah
+dan dibatasi max_size (upload di server: MAX_DECOMPRESSED_SIZE atau ukuran
+asli yang dikirim client), sehingga beberapa KB data terkompresi tidak bisa
+mengembang menjadi gigabyte di memori atau di disk
+"""
+
+ZLIB_LEVEL = 6
+ZSTD_LEVEL = 3
+# file yang lebih kecil dari ini tidak dikompresi
+MIN_COMPRESS_SIZE = 4 * 1024
+SAMPLE_SIZE = 64 * 1024
+# kompresi dipakai jika sampel menyusut minimal menjadi 90% ukuran aslinya
+MIN_RATIO = 0.9
+# batas hasil dekompresi satu file upload, bisa diatur lewat
+# FILE_MAX_DECOMPRESSED_SIZE
+MAX_DECOMPRESSED_SIZE = int(os.environ.get('FILE_MAX_DECOMPRESSED_SIZE', 4 * 1024 * 1024 * 1024))
+OUTPUT_CHUNK = 1024 * 1024
+
+
+class _ChunkReader:
+    # iterable chunk sebagai file object (read), untuk stream_reader zstd
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.buf = b''
+
+    def read(self, n=-1):
+        while not self.buf:
+            self.buf = next(self.chunks, None)
+            if self.buf is None:
+                self.buf = b''
+                return b''
+        n = len(self.buf) if n is None or n < 0 else n
+        out, self.buf = self.buf[:n], self.buf[n:]
+        return bytes(out)
+
+
+class _Zlib:
+    def compressor(self):
+        return zlib.compressobj(ZLIB_LEVEL)
+
+    def decompress_chunks(self, chunks):
+        decompressor = zlib.decompressobj()
+        for chunk in chunks:
+            while chunk:
+                out = decompressor.decompress(chunk, OUTPUT_CHUNK)
+                if out:
+                    yield out
+                chunk = decompressor.unconsumed_tail
+        out = decompressor.flush()
+        if out:
+            yield out
+
+
+class _Zstd:
+    def compressor(self):
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+
+    def decompress_chunks(self, chunks):
+        reader = zstandard.ZstdDecompressor().stream_reader(_ChunkReader(chunks))
+        yield from iter(lambda: reader.read(OUTPUT_CHUNK), b'')
+
+
+class _Lz4:
+    class _Compressor:
+        def __init__(self):
+            self.compressor = lz4.frame.LZ4FrameCompressor()
+            self.started = False
+
+        def compress(self, data):
+            head = b''
+            if not self.started:
+                head, self.started = self.compressor.begin(), True
+            return head + self.compressor.compress(data)
+
+        def flush(self):
+            head = b'' if self.started else self.compressor.begin()
+            return head + self.compressor.flush()
+
+    def compressor(self):
+        return self._Compressor()
+
+    def decompress_chunks(self, chunks):
+        decompressor = lz4.frame.LZ4FrameDecompressor()
+        for chunk in chunks:
+            out = decompressor.decompress(chunk, OUTPUT_CHUNK)
+            while True:
+                if out:
+                    yield out
+                if decompressor.needs_input or decompressor.eof:
+                    break
+                out = decompressor.decompress(b'', OUTPUT_CHUNK)
+
+
+CODECS = {'zlib': _Zlib()}
+if zstandard is not None:
+    CODECS['zstd'] = _Zstd()
+if lz4 is not None:
+    CODECS['lz4'] = _Lz4()
+
+# urutan pilihan server jika client mendukung beberapa codec
+PREFERENCE = ('zstd', 'lz4', 'zlib')
+
+
+def available():
+    return [name for name in PREFERENCE if name in CODECS]
+
+
+def choose_codec(accepted):
+    if not accepted:
+        return None
+    if isinstance(accepted, str):
+        accepted = [accepted]
+    for name in PREFERENCE:
+        if name in CODECS and name in accepted:
+            return name
+    return None
+
+
+def get_codec(name):
+    if name not in CODECS:
+        raise ValueError(f'Unsupported compression {name}')
+    return CODECS[name]
+
+
+def worth_compressing(sample, codec):
+    if len(sample) < MIN_COMPRESS_SIZE:
+        return False
+    compressor = get_codec(codec).compressor()
+    size = len(compressor.compress(sample)) + len(compressor.flush())
+    return size <= len(sample) * MIN_RATIO
+
+
+def compress_bytes(data, codec):
+    compressor = get_codec(codec).compressor()
+    return compressor.compress(data) + compressor.flush()
+
+
+def decompress_bytes(data, codec, max_size=None):
+    return b''.join(decompress_chunks([data], codec, max_size))
+
+
+def compress_chunks(chunks, codec):
+    compressor = get_codec(codec).compressor()
+    for chunk in chunks:
+        out = compressor.compress(chunk)
+        if out:
+            yield out
+    out = compressor.flush()
+    if out:
+        yield out
+
+
+def decompress_chunks(chunks, codec, max_size=None, expected_size=None):
+    """
+    max_size: batas hasil dekompresi; expected_size: ukuran asli yang
+    dikirim client, hasil yang lebih besar atau lebih kecil ditolak
+    """
+    if expected_size is not None:
+        expected_size = int(expected_size)
+        max_size = expected_size if max_size is None else min(max_size, expected_size)
+    total = 0
+    for out in get_codec(codec).decompress_chunks(chunks):
+        total += len(out)
+        if max_size is not None and total > max_size:
+            raise ValueError(f'Decompressed data exceeds {max_size} bytes')
+        yield out
+    if expected_size is not None and total != expected_size:
+        raise ValueError(f'Decompressed size {total} does not match declared size {expected_size}')
+
+
+def b64encode_stream(chunks):
+    # encode base64 dari chunk dengan panjang sembarang, sisa yang belum
+    # kelipatan 3 disimpan untuk chunk berikutnya
+    sisa = b''
+    for chunk in chunks:
+        data = sisa + chunk
+        cut = len(data) - len(data) % 3
+        sisa = data[cut:]
+        if cut:
+            yield base64.b64encode(data[:cut])
+    if sisa:
+        yield base64.b64encode(sisa)
@@ -0,0 +1,164 @@
+import hashlib
+import math
+import os
+import zlib
+
+"""
+* file_delta berisi upload delta ala rsync: server mengirim signature
+file lama (per blok: checksum adler32 yang bisa digeser + hash kuat
+blake2b), client mencari blok-blok tersebut di file barunya dan hanya
+mengirim bagian yang berubah
+
+* hasil compute_delta adalah daftar op: ('copy', offset di file lama,
+panjang) atau ('data', offset di file baru, panjang); di protokol op copy
+dikirim sebagai [offset, panjang] dan op data sebagai jumlah byte literal
+yang diambil berurutan dari isi request (to_wire)
+
+* pencarian blok: blok yang tetap di posisinya (edit di tempat, append)
+cukup dicek per blok dengan adler32/blake2b bawaan C; hanya bagian yang
+berubah yang digeser per byte dengan rolling checksum, dan setelah
+SCAN_LIMIT byte tanpa blok yang cocok pencarian kembali melompat per blok
+agar file yang berubah total tidak dipindai per byte di Python
+"""
+
+MIN_BLOCK_SIZE = 1024
+MAX_BLOCK_SIZE = 128 * 1024
+SCAN_LIMIT = 1024 * 1024
+# modulus adler32
+MOD = 65521
+
+
+def block_size_for(size):
+    # sekitar akar ukuran file (seperti rsync), dibulatkan ke kelipatan 1 KB
+    block_size = -(-math.isqrt(size) // MIN_BLOCK_SIZE) * MIN_BLOCK_SIZE
+    return min(max(block_size, MIN_BLOCK_SIZE), MAX_BLOCK_SIZE)
+
+
+def strong_hash(data):
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def signature(fp, block_size, digest=None):
+    """
+    hasil: (daftar [adler32, blake2b] per blok, sha256 seluruh isi); sha256
+    tidak dihitung ulang jika sudah diketahui (backend content-addressed)
+    """
+    blocks = []
+    h = hashlib.sha256() if digest is None else None
+    for block in iter(lambda: fp.read(block_size), b''):
+        blocks.append([zlib.adler32(block), strong_hash(block)])
+        if h is not None:
+            h.update(block)
+    return blocks, digest or h.hexdigest()
+
+
+def _emit(ops, kind, offset, length):
+    if length <= 0:
+        return
+    if ops and ops[-1][0] == kind and ops[-1][1] + ops[-1][2] == offset:
+        ops[-1] = (kind, ops[-1][1], ops[-1][2] + length)
+    else:
+        ops.append((kind, offset, length))
+
+
+def compute_delta(data, blocks, block_size, base_size, scan_limit=SCAN_LIMIT):
+    """
+    data: isi file baru (bytes atau mmap); blocks, block_size, base_size:
+    signature dan ukuran file lama di server
+    """
+    # blok terakhir file lama bisa lebih pendek dari block_size, dicek
+    # terpisah di akhir file baru
+    tail_len = base_size % block_size
+    tail = blocks[-1] if tail_len and blocks else None
+    table = {}
+    for index, (weak, strong) in enumerate(blocks[:-1] if tail is not None else blocks):
+        table.setdefault(weak, {}).setdefault(strong, index)
+
+    ops = []
+    n = len(data)
+    pos = lit = scanned = 0
+    weak = None
+    while pos + block_size <= n:
+        if weak is None:
+            weak = zlib.adler32(data[pos:pos + block_size])
+            a, b = weak & 0xffff, weak >> 16
+        candidates = table.get(weak)
+        index = candidates.get(strong_hash(data[pos:pos + block_size])) if candidates else None
+        if index is not None:
+            _emit(ops, 'data', lit, pos - lit)
+            _emit(ops, 'copy', index * block_size, block_size)
+            pos += block_size
+            lit = pos
+            weak = None
+            scanned = 0
+            continue
+        if scanned >= scan_limit:
+            pos += block_size
+            weak = None
+            continue
+        # geser jendela satu byte: keluarkan data[pos], masukkan data[pos + block_size]
+        if pos + block_size < n:
+            keluar, masuk = data[pos], data[pos + block_size]
+            a = (a - keluar + masuk) % MOD
+            b = (b - block_size * keluar + a - 1) % MOD
+            weak = (b << 16) | a
+        pos += 1
+        scanned += 1
+
+    if tail is not None and n - tail_len >= lit:
+        start = n - tail_len
+        piece = data[start:n]
+        if zlib.adler32(piece) == tail[0] and strong_hash(piece) == tail[1]:
+            _emit(ops, 'data', lit, start - lit)
+            _emit(ops, 'copy', base_size - tail_len, tail_len)
+            lit = n
+    _emit(ops, 'data', lit, n - lit)
+    return ops
+
+
+def to_wire(ops):
+    return [[offset, length] if kind == 'copy' else length for kind, offset, length in ops]
+
+
+def delta_size(ops):
+    """hasil: (byte yang dipakai ulang dari file lama, byte literal)"""
+    copied = sum(length for kind, _, length in ops if kind == 'copy')
+    return copied, sum(length for kind, _, length in ops if kind == 'data')
+
+
+class LiteralBody:
+    """
+    isi request UPLOAD_DELTA: potongan literal file baru yang dibaca
+    berurutan dengan pread, tanpa ditampung di memori
+    """
+    def __init__(self, fp, ops):
+        self.fp = fp
+        self.runs = [(offset, length) for kind, offset, length in ops if kind == 'data']
+        self.length = sum(length for _, length in self.runs)
+        self.index = 0
+        self.pos = 0
+
+    def read(self, n=-1):
+        out = []
+        while self.index < len(self.runs) and n != 0:
+            offset, length = self.runs[self.index]
+            size = length - self.pos if n is None or n < 0 else min(n, length - self.pos)
+            chunk = os.pread(self.fp.fileno(), size, offset + self.pos)
+            if not chunk:
+                raise ValueError('File changed while uploading delta')
+            self.pos += len(chunk)
+            if self.pos >= length:
+                self.index, self.pos = self.index + 1, 0
+            out.append(chunk)
+            if n is not None and n > 0:
+                n -= len(chunk)
+        return b''.join(out)
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
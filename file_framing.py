@@ -0,0 +1,502 @@
+import json
+import mmap
+import os
+import re
+import socket
+import struct
+import time
+
+"""
+* file_framing berisi aturan pembingkaian (framing) pesan di atas TCP
+
+* mode lama (legacy): pesan JSON diakhiri dengan "\r\n\r\n", isi file
+dikirim dalam bentuk base64 di dalam JSON
+
+* mode binary: b"FBIN" + panjang header (4 byte, big endian) + header JSON
++ isi file mentah sebanyak header['size'] byte. Server mengenali mode dari
+4 byte pertama setiap pesan, sehingga client lama tetap bisa dilayani
+
+* isi frame binary tidak pernah ditampung utuh di memori: FrameReader
+mengembalikan BodyStream yang membaca isi frame per chunk langsung dari
+socket, dan send_binary_response mengirim file per chunk
+
+* client bisa meminta jalur zero-copy dengan menambahkan "sendfile": true
+pada header request binary, isi file lalu dikirim dengan socket.sendfile
+"""
+
+DELIMITER = b"\r\n\r\n"
+BINARY_MAGIC = b"FBIN"
+HEADER_LEN = struct.Struct('!I')
+MAX_HEADER_SIZE = 1024 * 1024
+CHUNK_SIZE = 64 * 1024
+# batas buffer per koneksi untuk pesan JSON lama (upload 100MB dalam base64
+# kira-kira 134MB), frame binary tidak terkena batas ini karena di-stream
+MAX_MESSAGE_SIZE = 256 * 1024 * 1024
+# pesan JSON lama dipesan ke admission control per kelipatan ini selama
+# masih diterima, agar lock tidak diambil setiap recv
+RESERVE_STEP = 1024 * 1024
+# batas data yang dilihat peek_command untuk mengenali perintah berikutnya
+PEEK_SIZE = 64 * 1024
+COMMAND_PATTERN = re.compile(rb'"command"\s*:\s*"([A-Za-z_]*)"')
+
+
+def encode_binary_header(header, size=0):
+    header = dict(header)
+    header['size'] = size
+    raw = json.dumps(header).encode()
+    return BINARY_MAGIC + HEADER_LEN.pack(len(raw)) + raw
+
+
+def encode_binary_frame(header, body=b''):
+    return encode_binary_header(header, len(body)) + body
+
+
+def body_size(body):
+    if isinstance(body, (bytes, bytearray, memoryview)):
+        return len(body)
+    if hasattr(body, 'length'):
+        # potongan file (FileRange)
+        return body.length
+    return os.fstat(body.fileno()).st_size - body.tell()
+
+
+def send_body(sock, body, chunk_size=CHUNK_SIZE, use_sendfile=False):
+    """
+    kirim isi frame, berupa bytes atau file object yang dibaca per chunk;
+    dengan use_sendfile file object diserahkan langsung ke kernel
+    (os.sendfile) tanpa disalin ke user space
+    """
+    if isinstance(body, (bytes, bytearray, memoryview)):
+        if body:
+            sock.sendall(body)
+        return
+    if use_sendfile and hasattr(body, 'fileno'):
+        sock.sendfile(body, body.tell(), body_size(body))
+        return
+    while True:
+        chunk = body.read(chunk_size)
+        if not chunk:
+            break
+        sock.sendall(chunk)
+
+
+def send_binary_response(sock, header, body=b'', chunk_size=CHUNK_SIZE, use_sendfile=False, metrics=None):
+    try:
+        size = body_size(body)
+        raw_header = encode_binary_header(header, size)
+        sock.sendall(raw_header)
+        send_body(sock, body, chunk_size, use_sendfile)
+        if metrics is not None:
+            metrics.add_bytes(bytes_out=len(raw_header) + size)
+        return len(raw_header) + size
+    finally:
+        if hasattr(body, 'close'):
+            body.close()
+
+
+def send_json_response(sock, chunks, metrics=None):
+    # kirim potongan respon JSON (lihat FileProtocol.proses_string_stream)
+    # lalu delimiter
+    sent = 0
+    for chunk in chunks:
+        sock.sendall(chunk)
+        sent += len(chunk)
+    sock.sendall(DELIMITER)
+    if metrics is not None:
+        metrics.add_bytes(bytes_out=sent + len(DELIMITER))
+
+
+class FileRange:
+    """
+    potongan file (offset, length) yang bisa dikirim seperti file object
+    biasa, termasuk lewat socket.sendfile / loop.sendfile
+    """
+    def __init__(self, fp, offset, length):
+        self.fp = fp
+        self.length = length
+        self.end = offset + length
+        fp.seek(offset)
+
+    def fileno(self):
+        return self.fp.fileno()
+
+    def tell(self):
+        return self.fp.tell()
+
+    def seek(self, pos, whence=0):
+        return self.fp.seek(pos, whence)
+
+    def read(self, n=-1):
+        sisa = max(self.end - self.fp.tell(), 0)
+        return self.fp.read(sisa if n is None or n < 0 else min(n, sisa))
+
+    def readinto(self, b):
+        data = self.read(len(b))
+        b[:len(data)] = data
+        return len(data)
+
+    def close(self):
+        self.fp.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class MappedRange:
+    """
+    potongan file yang dibaca lewat mmap: read() mengembalikan memoryview
+    ke halaman page cache tanpa menyalinnya ke heap, sehingga beberapa
+    request untuk file yang sama berbagi memori yang sama; tetap bisa
+    dikirim lewat sendfile karena fileno/tell/seek diteruskan ke file
+
+    file tidak pernah dipotong di tempat (upload selalu lewat rename), jadi
+    mapping tetap valid walaupun file ditimpa selama dikirim
+    """
+    def __init__(self, fp, offset=0, length=None):
+        self.fp = fp
+        if length is None:
+            length = os.fstat(fp.fileno()).st_size - offset
+        self.length = length
+        self.pos = offset
+        self.end = offset + length
+        self.mm = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) if length else None
+        self.view = memoryview(self.mm) if self.mm is not None else memoryview(b'')
+
+    def fileno(self):
+        return self.fp.fileno()
+
+    def tell(self):
+        return self.pos
+
+    def seek(self, pos, whence=0):
+        self.pos = pos if whence == 0 else (self.pos + pos if whence == 1 else self.end + pos)
+        return self.pos
+
+    def read(self, n=-1):
+        end = self.end if n is None or n < 0 else min(self.end, self.pos + n)
+        if self.pos >= end:
+            return b''
+        chunk = self.view[self.pos:end]
+        self.pos = end
+        return chunk
+
+    def readinto(self, b):
+        # salin langsung dari mapping ke buffer pemanggil
+        n = max(min(len(b), self.end - self.pos), 0)
+        b[:n] = self.view[self.pos:self.pos + n]
+        self.pos += n
+        return n
+
+    def close(self):
+        self.view.release()
+        if self.mm is not None:
+            try:
+                self.mm.close()
+            except BufferError:
+                # masih ada memoryview potongan yang dipegang (misalnya di
+                # buffer transport), mapping dilepas saat potongan itu dibuang
+                pass
+        self.fp.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ConcatBody:
+    """
+    beberapa isi (bytes atau file object) yang dikirim berurutan sebagai
+    satu isi frame, misalnya respon MGET
+    """
+    def __init__(self, parts):
+        self.parts = list(parts)
+        self.length = sum(body_size(part) for part in self.parts)
+        self.index = 0
+        self.pos = 0
+
+    def read(self, n=-1):
+        out = []
+        while self.index < len(self.parts) and n != 0:
+            part = self.parts[self.index]
+            if isinstance(part, (bytes, bytearray, memoryview)):
+                end = len(part) if n is None or n < 0 else min(len(part), self.pos + n)
+                chunk = part[self.pos:end]
+                self.pos = end
+                if self.pos >= len(part):
+                    self.index, self.pos = self.index + 1, 0
+            else:
+                chunk = part.read(n)
+                if not chunk:
+                    part.close()
+                    self.index += 1
+                    continue
+            out.append(chunk)
+            if n is not None and n > 0:
+                n -= len(chunk)
+        return b''.join(out)
+
+    def close(self):
+        for part in self.parts:
+            if hasattr(part, 'close'):
+                part.close()
+
+
+class FrameError(Exception):
+    pass
+
+
+class BodyStream:
+    """
+    isi frame binary yang dibaca per chunk dari socket; harus dibaca habis
+    (atau di-drain) sebelum pesan berikutnya dibaca
+    """
+    def __init__(self, reader, size):
+        self.reader = reader
+        self.size = size
+        self.remaining = size
+
+    def __iter__(self):
+        while self.remaining > 0:
+            chunk = self.reader._read_some(min(self.remaining, self.reader.chunk_size))
+            self.remaining -= len(chunk)
+            yield chunk
+
+    def read(self):
+        return b''.join(self)
+
+    def drain(self):
+        for _ in self:
+            pass
+
+
+def _command_of(data):
+    if data.startswith(BINARY_MAGIC):
+        prefix = len(BINARY_MAGIC) + HEADER_LEN.size
+        if len(data) < prefix:
+            return ''
+        (header_len,) = HEADER_LEN.unpack(data[len(BINARY_MAGIC):prefix])
+        if len(data) < prefix + header_len:
+            return ''
+        try:
+            return str(json.loads(data[prefix:prefix + header_len]).get('command', '')).lower()
+        except (ValueError, AttributeError):
+            return ''
+    match = COMMAND_PATTERN.search(data)
+    return match.group(1).decode().lower() if match else ''
+
+
+class FrameReader:
+    """
+    membaca pesan satu per satu dari socket, baik pesan JSON lama
+    maupun frame binary
+
+    data diterima ke satu bytearray; self.pos menandai awal data yang
+    belum dibaca dan self.scanned batas yang sudah dicari delimiternya,
+    sehingga setiap byte hanya disalin dan dicari sekali (O(n), bukan
+    O(n^2) seperti buffer += data.decode() lalu split)
+
+    jika metrics diberikan, byte yang diterima dan waktu recv dicatat;
+    waktu menunggu pesan berikutnya pada koneksi yang idle tidak dihitung
+
+    jika admission diberikan (lihat file_admission), byte setiap pesan
+    dipesan dulu; pesan yang tidak mendapat jatah dibaca sampai habis tanpa
+    disimpan dan dikembalikan sebagai ('busy', mode, BodyStream atau None).
+    Jatah pesan dilepas saat pesan berikutnya dibaca atau saat release()
+
+    idle_timeout membatasi waktu menunggu pesan berikutnya (koneksi lalu
+    dianggap selesai), read_timeout membatasi setiap recv di tengah pesan;
+    max_message_size None berarti pesan JSON lama tidak dibatasi
+    """
+    def __init__(self, sock, recv_size=8192, max_message_size=MAX_MESSAGE_SIZE, chunk_size=CHUNK_SIZE, metrics=None,
+                 admission=None, idle_timeout=None, read_timeout=None):
+        self.sock = sock
+        self.metrics = metrics
+        self.admission = admission
+        self.reserved = 0
+        self.idle_timeout = idle_timeout
+        self.read_timeout = read_timeout
+        self.timeouts = idle_timeout is not None or read_timeout is not None
+        self.recv_size = recv_size
+        self.max_message_size = max_message_size
+        self.chunk_size = chunk_size
+        self.buffer = bytearray()
+        self.pos = 0
+        self.scanned = 0
+
+    def _available(self):
+        return len(self.buffer) - self.pos
+
+    def _compact(self):
+        # buang data yang sudah dibaca jika sudah lebih dari separuh buffer
+        if self.pos == len(self.buffer):
+            self.buffer.clear()
+        elif self.pos > len(self.buffer) // 2:
+            del self.buffer[:self.pos]
+        else:
+            return
+        self.scanned = max(self.scanned - self.pos, 0)
+        self.pos = 0
+
+    def _recv(self, n, idle=False):
+        if self.timeouts:
+            self.sock.settimeout(self.idle_timeout if idle else self.read_timeout)
+        started = time.perf_counter()
+        try:
+            data = self.sock.recv(n)
+        except socket.timeout:
+            if not self.timeouts:
+                # timeout milik pemanggil (misalnya socket client), bukan
+                # idle_timeout/read_timeout reader ini
+                raise
+            if idle:
+                # koneksi keep-alive yang terlalu lama diam ditutup
+                return b''
+            raise FrameError('timed out in the middle of a message')
+        if self.metrics is not None:
+            self.metrics.add_recv(len(data), 0.0 if idle else time.perf_counter() - started)
+        return data
+
+    def release(self):
+        if self.reserved:
+            self.admission.release_bytes(self.reserved)
+            self.reserved = 0
+
+    def _fill(self, idle=False):
+        if self.max_message_size is not None and self._available() > self.max_message_size:
+            raise FrameError(f'message exceeds per-connection limit of {self.max_message_size} bytes')
+        if self.pos:
+            self._compact()
+        data = self._recv(self.recv_size, idle)
+        if not data:
+            return False
+        self.buffer += data
+        return True
+
+    def _take(self, n):
+        data = bytes(self.buffer[self.pos:self.pos + n])
+        self.pos += len(data)
+        return data
+
+    def _read_some(self, n):
+        if self._available():
+            return self._take(n)
+        data = self._recv(n)
+        if not data:
+            raise FrameError('connection closed in the middle of a frame')
+        return data
+
+    def _read_exact(self, n):
+        while self._available() < n:
+            if not self._fill():
+                raise FrameError('connection closed in the middle of a frame')
+        return self._take(n)
+
+    def buffered(self):
+        return self._available() > 0
+
+    def peek_command(self):
+        """
+        nama perintah (huruf kecil) pesan berikutnya tanpa membacanya: None
+        jika koneksi ditutup atau idle terlalu lama, '' jika perintah tidak
+        bisa dikenali dari PEEK_SIZE byte pertama
+
+        data yang belum masuk buffer hanya dilihat dengan MSG_PEEK, sehingga
+        jika buffer kosong koneksi masih bisa diserahkan ke thread atau
+        proses lain sebelum pesan dibaca
+        """
+        if self._available():
+            return _command_of(bytes(self.buffer[self.pos:self.pos + PEEK_SIZE]))
+        if self.timeouts:
+            self.sock.settimeout(self.idle_timeout)
+        try:
+            data = self.sock.recv(PEEK_SIZE, socket.MSG_PEEK)
+            if not data:
+                return None
+            if self.timeouts:
+                self.sock.settimeout(self.read_timeout)
+            prefix = len(BINARY_MAGIC) + HEADER_LEN.size
+            if data.startswith(BINARY_MAGIC) or BINARY_MAGIC.startswith(data):
+                # tunggu sampai header frame lengkap ada di socket
+                data = self.sock.recv(prefix, socket.MSG_PEEK | socket.MSG_WAITALL)
+                if len(data) < prefix or not data.startswith(BINARY_MAGIC):
+                    return _command_of(data) if len(data) == prefix else None
+                (header_len,) = HEADER_LEN.unpack(data[len(BINARY_MAGIC):])
+                if prefix + header_len > PEEK_SIZE:
+                    return ''
+                data = self.sock.recv(prefix + header_len, socket.MSG_PEEK | socket.MSG_WAITALL)
+        except socket.timeout:
+            return None
+        return _command_of(data)
+
+    def read_message(self):
+        """
+        hasil: None jika koneksi ditutup, ('json', str) untuk pesan lama,
+        atau ('binary', header, BodyStream) untuk frame binary
+        """
+        self.release()
+        while self._available() < len(BINARY_MAGIC) and BINARY_MAGIC.startswith(self.buffer[self.pos:]):
+            if not self._fill(idle=not self._available()):
+                if self._available():
+                    raise FrameError('connection closed in the middle of a frame')
+                return None
+        if self.buffer.startswith(BINARY_MAGIC, self.pos):
+            return self._read_binary()
+        return self._read_json()
+
+    def _read_json(self):
+        discard = False
+        while True:
+            # cukup cari di data yang baru masuk (mundur 3 byte untuk
+            # delimiter yang terpotong di antara dua recv)
+            start = max(self.pos, self.scanned - len(DELIMITER) + 1)
+            idx = self.buffer.find(DELIMITER, start)
+            if idx >= 0:
+                break
+            self.scanned = len(self.buffer)
+            if self.admission is not None and not discard and self._available() - self.reserved >= RESERVE_STEP:
+                if self.admission.try_bytes(self._available() - self.reserved):
+                    self.reserved = self._available()
+                else:
+                    discard = True
+                    self.release()
+            if discard:
+                # pesan ditolak: buang isinya, sisakan ekor yang mungkin
+                # berisi awal delimiter
+                del self.buffer[:max(len(self.buffer) - len(DELIMITER) + 1, self.pos)]
+                self.pos = 0
+                self.scanned = len(self.buffer)
+            if not self._fill():
+                if self.buffer[self.pos:].strip():
+                    raise FrameError('connection closed before message delimiter')
+                return None
+        if discard:
+            self.pos = idx + len(DELIMITER)
+            self.scanned = self.pos
+            return ('busy', 'json', None)
+        message = self.buffer[self.pos:idx].decode()
+        if self.admission is not None:
+            # pesan kecil selalu diterima, jatah disesuaikan dengan ukuran asli
+            self.admission.try_bytes(idx - self.pos - self.reserved, force=True)
+            self.admission.release_bytes(self.reserved - (idx - self.pos))
+            self.reserved = idx - self.pos
+        self.pos = idx + len(DELIMITER)
+        self.scanned = self.pos
+        return ('json', message)
+
+    def _read_binary(self):
+        self._read_exact(len(BINARY_MAGIC))
+        (header_len,) = HEADER_LEN.unpack(self._read_exact(HEADER_LEN.size))
+        if header_len > MAX_HEADER_SIZE:
+            raise FrameError(f'binary header too large: {header_len}')
+        header = json.loads(self._read_exact(header_len))
+        size = int(header.get('size', 0))
+        if self.admission is not None:
+            if not self.admission.try_bytes(size):
+                return ('busy', 'binary', BodyStream(self, size))
+            self.reserved = size
+        return ('binary', header, BodyStream(self, size))
@@ -0,0 +1,218 @@
+import os
+import sqlite3
+import threading
+import time
+from bisect import bisect_left, bisect_right, insort
+
+from file_store import SHA256_PATTERN
+
+"""
+* class DirectoryIndex menyimpan daftar file di direktori files/ di memori
+(terurut berdasarkan nama, beserta size dan mtime), sehingga LIST tidak
+perlu membaca ulang isi direktori setiap request
+
+* index dibangun sekali dengan os.scandir saat start, lalu diperbarui oleh
+upload/delete; perubahan dari proses lain (misalnya worker lain di server
+process-pool) dideteksi dari mtime direktori dan memicu rebuild
+
+* perubahan lokal hanya memajukan mtime yang dicatat jika mtime direktori
+sebelum perubahan (mark) masih sama dengan yang dicatat; jika tidak, ada
+perubahan lain yang belum masuk index, jadi mtime lama dibiarkan agar
+refresh tetap melakukan rebuild
+
+* mtime direktori hanya bisa dipercaya jika dicatat lebih dari satu
+"tick" timestamp filesystem setelah mtime itu sendiri: perubahan lain di
+tick yang sama tidak mengubah mtime. Selama mtime yang dicatat masih
+sedekat itu dengan waktu pencatatannya, refresh tetap melakukan rebuild
+
+* class MetadataIndex punya antarmuka yang sama tetapi disimpan di tabel
+SQLite (nama -> path, size, mtime, sha256) untuk susunan direktori hashed
+(lihat file_layout): cek keberadaan, stat dan LIST menjadi lookup index di
+database alih-alih scan direktori, dan karena database ada di disk
+perubahan dari worker lain langsung terlihat tanpa rebuild
+"""
+
+# resolusi timestamp direktori: Linux memperbarui mtime dari clock kernel
+# yang kasar (beberapa milidetik), filesystem lama menyimpan detik saja
+MTIME_GRANULARITY_NS = 10 * 1000 * 1000
+COARSE_MTIME_GRANULARITY_NS = 2 * 1000 * 1000 * 1000
+
+
+class DirectoryIndex:
+    def __init__(self, directory):
+        self.directory = directory
+        self.lock = threading.Lock()
+        self.names = []
+        self.meta = {}
+        self.dir_mtime = None
+        # waktu saat dir_mtime dibaca
+        self.read_at = None
+        self.rebuild()
+
+    def _dir_mtime(self):
+        return os.stat(self.directory).st_mtime_ns
+
+    def _racy(self):
+        # mtime yang masih dalam tick yang sama dengan waktu dibacanya
+        # belum tentu mencakup semua perubahan di tick tersebut
+        granularity = COARSE_MTIME_GRANULARITY_NS if self.dir_mtime % 1000000000 == 0 else MTIME_GRANULARITY_NS
+        return self.read_at - self.dir_mtime < granularity
+
+    def rebuild(self):
+        # mtime direktori diambil sebelum scan, sehingga perubahan selama
+        # scan tetap memicu rebuild berikutnya
+        dir_mtime = self._dir_mtime()
+        read_at = time.time_ns()
+        meta = {}
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                # file yang diawali titik adalah file sementara/tersembunyi
+                if entry.name.startswith('.') or not entry.is_file():
+                    continue
+                st = entry.stat()
+                meta[entry.name] = (st.st_size, st.st_mtime)
+        with self.lock:
+            self.meta = meta
+            self.names = sorted(meta)
+            self.dir_mtime, self.read_at = dir_mtime, read_at
+
+    def refresh(self):
+        if self._dir_mtime() != self.dir_mtime or self._racy():
+            self.rebuild()
+
+    def mark(self):
+        """dipanggil sebelum mengubah direktori, hasilnya diberikan ke add/remove"""
+        return self._dir_mtime()
+
+    def _advance(self, before):
+        if before is not None and before == self.dir_mtime:
+            self.dir_mtime, self.read_at = self._dir_mtime(), time.time_ns()
+
+    def add(self, name, size, mtime, path=None, sha256=None, before=None):
+        # path dan sha256 hanya disimpan oleh MetadataIndex
+        with self.lock:
+            if name not in self.meta:
+                insort(self.names, name)
+            self.meta[name] = (size, mtime)
+            self._advance(before)
+
+    def remove(self, name, before=None):
+        with self.lock:
+            if self.meta.pop(name, None) is not None:
+                del self.names[bisect_left(self.names, name)]
+            self._advance(before)
+
+    def __contains__(self, name):
+        return name in self.meta
+
+    def page(self, prefix='', cursor=None, limit=None):
+        """
+        hasil: (daftar (nama, size, mtime), cursor berikutnya); cursor adalah
+        nama terakhir di halaman ini, None jika sudah tidak ada halaman lagi
+        """
+        with self.lock:
+            names = self.names
+            start = bisect_left(names, prefix)
+            if cursor is not None:
+                start = max(start, bisect_right(names, cursor))
+            end = start
+            while end < len(names) and names[end].startswith(prefix) and (limit is None or end - start < limit):
+                end += 1
+            entries = [(n,) + self.meta[n] for n in names[start:end]]
+            has_more = end < len(names) and names[end].startswith(prefix)
+        next_cursor = entries[-1][0] if has_more and entries else None
+        return entries, next_cursor
+
+
+def _prefix_end(prefix):
+    # batas atas (eksklusif) nama yang diawali prefix, urutan sama dengan
+    # urutan string Python karena SQLite membandingkan byte UTF-8
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1) if prefix else None
+
+
+class MetadataIndex:
+    def __init__(self, directory, db_path, fsync='none'):
+        self.directory = directory
+        self.db_path = db_path
+        self.synchronous = 'FULL' if fsync == 'full' else 'NORMAL'
+        # koneksi SQLite tidak boleh dipakai bersama antar thread maupun
+        # dibawa lewat fork, jadi dibuat per thread per proses
+        self.local = threading.local()
+        db = self._db()
+        db.execute('CREATE TABLE IF NOT EXISTS files (name TEXT PRIMARY KEY, path TEXT NOT NULL, '
+                   'size INTEGER NOT NULL, mtime REAL NOT NULL, sha256 TEXT) WITHOUT ROWID')
+
+    def _db(self):
+        db = getattr(self.local, 'db', None)
+        if db is None or self.local.pid != os.getpid():
+            db = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute(f'PRAGMA synchronous={self.synchronous}')
+            self.local.db, self.local.pid = db, os.getpid()
+        return db
+
+    def empty(self):
+        return self._db().execute('SELECT 1 FROM files LIMIT 1').fetchone() is None
+
+    def rebuild(self, entries):
+        """isi ulang tabel dari iterable (nama, path), misalnya file_layout.scan_hashed"""
+        rows = []
+        for name, path in entries:
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            # hash backend cas diambil dari nama blob target symlink
+            digest = os.path.basename(os.readlink(path)) if os.path.islink(path) else None
+            if digest is not None and not SHA256_PATTERN.match(digest):
+                digest = None
+            rows.append((name, os.path.relpath(path, self.directory), st.st_size, st.st_mtime, digest))
+        db = self._db()
+        with db:
+            db.execute('BEGIN IMMEDIATE')
+            db.execute('DELETE FROM files')
+            db.executemany('INSERT INTO files VALUES (?, ?, ?, ?, ?)', rows)
+
+    def refresh(self):
+        pass
+
+    def mark(self):
+        return None
+
+    def add(self, name, size, mtime, path=None, sha256=None, before=None):
+        self._db().execute('INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?)',
+                           (name, os.path.relpath(path, self.directory), size, mtime, sha256))
+
+    def remove(self, name, before=None):
+        self._db().execute('DELETE FROM files WHERE name = ?', (name,))
+
+    def __contains__(self, name):
+        return self._db().execute('SELECT 1 FROM files WHERE name = ?', (name,)).fetchone() is not None
+
+    def stat(self, name):
+        """hasil: dict path, size, mtime, sha256, atau None jika file tidak ada"""
+        row = self._db().execute('SELECT path, size, mtime, sha256 FROM files WHERE name = ?', (name,)).fetchone()
+        if row is None:
+            return None
+        return dict(path=os.path.join(self.directory, row[0]), size=row[1], mtime=row[2], sha256=row[3])
+
+    def page(self, prefix='', cursor=None, limit=None):
+        # sama seperti DirectoryIndex.page, satu baris ekstra diambil untuk
+        # mengetahui apakah masih ada halaman berikutnya
+        sql, args = 'SELECT name, size, mtime FROM files WHERE name >= ?', [prefix]
+        end = _prefix_end(prefix)
+        if end is not None:
+            sql += ' AND name < ?'
+            args.append(end)
+        if cursor is not None:
+            sql += ' AND name > ?'
+            args.append(cursor)
+        sql += ' ORDER BY name'
+        if limit is not None:
+            sql += ' LIMIT ?'
+            args.append(limit + 1)
+        entries = self._db().execute(sql, args).fetchall()
+        has_more = limit is not None and len(entries) > limit
+        entries = entries[:limit] if limit is not None else entries
+        next_cursor = entries[-1][0] if has_more and entries else None
+        return entries, next_cursor
@@ -1,42 +1,450 @@
 import os
+import re
 import json
 import base64
-from glob import glob
+import hashlib
+import tempfile
+import time
+import queue
+import logging
+import threading
+
+from file_cache import FileCache
+from file_index import DirectoryIndex, MetadataIndex
+from file_layout import layout_mode, check_name, resolve, scan_hashed, migrate_flat
+from file_store import ContentStore, ChecksumMismatch
+from file_delta import block_size_for, signature, MIN_BLOCK_SIZE, MAX_BLOCK_SIZE
+from file_atomic import FileLocks, fsync_mode, temp_path, write_temp, replace, sync_file
+from file_framing import FileRange, MappedRange, ConcatBody, body_size, CHUNK_SIZE
+from file_compression import (choose_codec, worth_compressing, compress_bytes, compress_chunks, decompress_chunks,
+                              b64encode_stream, SAMPLE_SIZE, MAX_DECOMPRESSED_SIZE)
+
+# ukuran chunk baca file untuk base64, kelipatan 3 agar tiap chunk
+# bisa di-encode terpisah tanpa padding di tengah
+B64_READ_SIZE = 3 * 16 * 1024
+# batas memori cache isi file per FileInterface, 0 untuk mematikan cache
+CACHE_MAX_BYTES = 128 * 1024 * 1024
+# isi file/range sebesar ini atau lebih dibaca lewat mmap (MappedRange)
+MMAP_MIN_SIZE = 1024 * 1024
+# backend penyimpanan: 'plain' (files/<filename>) atau 'cas' (content-
+# addressed, lihat file_store), bisa diatur lewat FILE_STORAGE
+STORAGE = 'plain'
+# database metadata untuk susunan direktori hashed (lihat file_layout)
+METADATA_DB = '.meta.db'
+
+
+def file_body(fp, offset=0, length=None):
+    """
+    bungkus file yang sudah dibuka sebagai isi respon: potongan besar
+    dibaca lewat mmap sehingga request bersamaan untuk file yang sama
+    berbagi page cache, bukan salinan masing-masing di heap
+    """
+    if length is None:
+        length = os.fstat(fp.fileno()).st_size - offset
+    if length >= MMAP_MIN_SIZE:
+        return MappedRange(fp, offset, length)
+    return FileRange(fp, offset, length)
+
+
+def b64encode_chunks(fp, chunk_size=B64_READ_SIZE):
+    while True:
+        chunk = fp.read(chunk_size)
+        if not chunk:
+            break
+        yield base64.b64encode(chunk)
+
+
+def b64decode_chunks(chunks):
+    # decode base64 secara bertahap, sisa yang belum kelipatan 4
+    # disimpan untuk chunk berikutnya
+    sisa = b''
+    for chunk in chunks:
+        data = sisa + chunk
+        cut = len(data) - len(data) % 4
+        sisa = data[cut:]
+        if cut:
+            yield base64.b64decode(data[:cut])
+    if sisa:
+        yield base64.b64decode(sisa + b'=' * (-len(sisa) % 4))
+
+
+# upload_id untuk upload per bagian dipakai sebagai bagian nama file sementara
+UPLOAD_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+# file .part upload per bagian disimpan di files/.parts/; file yang tidak
+# mendapat bagian baru selama PART_MAX_AGE detik (client putus tanpa
+# UPLOAD_COMMIT/UPLOAD_ABORT) dihapus saat start dan setiap
+# PART_CLEANUP_INTERVAL detik
+PARTS_DIR = '.parts'
+PART_MAX_AGE = 24 * 3600
+PART_CLEANUP_INTERVAL = 3600
+
+# perintah batch (MGET/MUPLOAD/MDELETE): jumlah file maksimal per request
+# dan jumlah file yang diproses paralel
+MAX_BATCH = 1000
+BATCH_WORKERS = 8
+# file sampai ukuran ini dibaca/ditulis utuh oleh worker batch, file yang
+# lebih besar di-stream langsung agar memori tetap terbatas
+BATCH_INLINE_SIZE = 1024 * 1024
+
+
+class _BatchTask:
+    def __init__(self, func, args, kwargs):
+        self.func, self.args, self.kwargs = func, args, kwargs
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+    def run(self):
+        try:
+            self.value = self.func(*self.args, **self.kwargs)
+        except BaseException as e:
+            self.error = e
+        finally:
+            self.done.set()
+
+    def result(self):
+        self.done.wait()
+        if self.error is not None:
+            raise self.error
+        return self.value
+
+
+class _BatchWorkers:
+    """
+    thread worker (daemon) untuk perintah batch; tidak memakai
+    ThreadPoolExecutor karena executor menolak tugas baru setelah main
+    thread selesai, padahal file_server.py menjalankan server di thread lain
+    """
+    def __init__(self, size):
+        self.size = size
+        self.queue = queue.Queue()
+        self.threads = []
+        self.lock = threading.Lock()
+
+    def submit(self, func, *args, **kwargs):
+        with self.lock:
+            if not self.threads:
+                for i in range(self.size):
+                    t = threading.Thread(target=self._loop, name=f'batch-{i}', daemon=True)
+                    t.start()
+                    self.threads.append(t)
+        task = _BatchTask(func, args, kwargs)
+        self.queue.put(task)
+        return task
+
+    def _loop(self):
+        while True:
+            self.queue.get().run()
+
+
+def _named(result, name):
+    # hasil per file pada perintah batch selalu menyebut nama filenya
+    result.setdefault('data_namafile', name)
+    return result
+
+
+class _BodySplitter:
+    # membagi isi frame (iterable chunk) menjadi isi beberapa file berurutan
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.buf = memoryview(b'')
+
+    def take(self, n):
+        while n > 0:
+            if not self.buf:
+                chunk = next(self.chunks, b'')
+                if not chunk:
+                    raise ValueError('Body is shorter than the declared sizes')
+                self.buf = memoryview(chunk)
+            piece, self.buf = self.buf[:n], self.buf[n:]
+            n -= len(piece)
+            yield piece
+
+
+def _identity(fd):
+    st = os.fstat(fd)
+    return st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns
+
+
+class _DeferredBody:
+    """
+    isi file besar pada respon MGET yang baru dibuka saat gilirannya
+    dikirim, sehingga satu respon tidak menahan ratusan file/mmap terbuka;
+    file yang sudah berganti sejak ukurannya dicatat di header membatalkan
+    pengiriman (isinya tidak lagi cocok dengan header)
+    """
+    def __init__(self, opener, identity):
+        self.opener = opener
+        self.identity = identity
+        self.length = identity[2]
+        self.body = None
+        self.closed = False
+
+    def read(self, n=-1):
+        if self.closed:
+            return b''
+        if self.body is None:
+            fp = self.opener()
+            if _identity(fp.fileno()) != self.identity:
+                fp.close()
+                raise OSError('File changed while sending batch')
+            self.body = file_body(fp)
+        return self.body.read(n)
+
+    def close(self):
+        self.closed = True
+        if self.body is not None:
+            self.body.close()
+
 
 class FileInterface:
-    def __init__(self):
+    def __init__(self, cache_max_bytes=CACHE_MAX_BYTES, storage=None, fsync=None, layout=None):
         # Tentukan direktori files/ relatif terhadap direktori kerja saat ini
         self.files_dir = os.path.join(os.getcwd(), 'files')
-        # Buat direktori files/ jika belum ada
-        if not os.path.exists(self.files_dir):
-            os.makedirs(self.files_dir)
+        # Buat direktori files/ jika belum ada; worker pre-fork bisa
+        # membuatnya bersamaan
+        os.makedirs(self.files_dir, exist_ok=True)
+        # cache isi file untuk GET yang sering diminta, mentah ('raw')
+        # atau sudah di-encode base64 ('b64')
+        self.cache = FileCache(cache_max_bytes)
+        # mode fsync untuk penulisan file: 'none', 'file' atau 'full'
+        self.fsync = fsync_mode(fsync)
+        # susunan file di disk: 'flat' atau 'hashed', bisa diatur lewat FILE_LAYOUT
+        self.layout = layout_mode(layout)
+        moved = []
+        if self.layout == 'hashed':
+            # index untuk LIST/cek keberadaan di SQLite; database yang baru
+            # (atau hilang) diisi dari disk, file susunan flat dipindah dulu
+            self.index = MetadataIndex(self.files_dir, os.path.join(self.files_dir, METADATA_DB), self.fsync)
+            if self.index.empty():
+                moved = migrate_flat(self.files_dir)
+                self.index.rebuild(scan_hashed(self.files_dir))
+        else:
+            # index isi direktori untuk LIST, dibangun sekali dengan scandir
+            self.index = DirectoryIndex(self.files_dir)
+        # reader/writer lock per nama file, berlaku antar thread dan antar
+        # proses worker (lihat file_atomic)
+        self.locks = FileLocks(os.path.join(self.files_dir, '.locks'))
+        storage = storage or os.environ.get('FILE_STORAGE', STORAGE)
+        if storage not in ('plain', 'cas'):
+            raise ValueError(f'Unknown storage backend {storage}')
+        self.store = ContentStore(self.files_dir, self.fsync, self.locks) if storage == 'cas' else None
+        if self.store is not None:
+            # symlink pindah ke path baru, catat ulang di index balik
+            for name, new_path in moved:
+                self.store.moved(os.path.join(self.files_dir, name), new_path)
+        # worker untuk perintah batch, thread baru dibuat saat pertama dipakai
+        self.batch_workers = _BatchWorkers(BATCH_WORKERS)
+        self.parts_dir = os.path.join(self.files_dir, PARTS_DIR)
+        os.makedirs(self.parts_dir, exist_ok=True)
+        threading.Thread(target=self._cleanup_loop, name='part-cleanup', daemon=True).start()
+
+    def _cleanup_loop(self):
+        while True:
+            try:
+                self.cleanup_parts()
+            except Exception as e:
+                logging.warning(f"Cleaning up stale upload parts failed: {e}")
+            time.sleep(PART_CLEANUP_INTERVAL)
+
+    def cleanup_parts(self, max_age=PART_MAX_AGE):
+        """hapus file .part yang sudah lama tidak ditulis, hasil: jumlah file yang dihapus"""
+        limit = time.time() - max_age
+        removed = 0
+        with os.scandir(self.parts_dir) as it:
+            for entry in it:
+                try:
+                    if entry.name.endswith('.part') and entry.stat().st_mtime < limit:
+                        os.remove(entry.path)
+                        removed += 1
+                except FileNotFoundError:
+                    # sudah di-commit/abort atau dihapus worker lain
+                    pass
+        return removed
+
+    def _batch_map(self, func, items):
+        # jalankan func untuk setiap item dengan paralelisme terbatas,
+        # hasil sesuai urutan item
+        if len(items) > MAX_BATCH:
+            raise ValueError(f'Too many files in one batch: {len(items)} > {MAX_BATCH}')
+        if len(items) <= 1:
+            return [func(item) for item in items]
+        tasks = [self.batch_workers.submit(func, item) for item in items]
+        return [task.result() for task in tasks]
+
+    def _file_path(self, filename, create=False):
+        # path file di dalam files/, nama yang bisa keluar dari files/
+        # ditolak; create membuat subdirektori susunan hashed untuk penulisan
+        file_path = resolve(self.files_dir, filename, self.layout)
+        if create and self.layout == 'hashed':
+            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        return file_path
+
+    def _existing_path(self, filename):
+        # path file yang sudah ada; susunan hashed mengambilnya dari
+        # metadata sehingga file yang tidak ada ditolak tanpa menyentuh disk
+        if self.layout != 'hashed':
+            return self._file_path(filename)
+        check_name(filename)
+        meta = self.index.stat(filename)
+        if meta is None:
+            raise FileNotFoundError(f'File {filename} not found')
+        return meta['path']
+
+    def _open_existing(self, filename):
+        # file yang tidak ada dilaporkan dengan namanya, bukan path di server
+        try:
+            return self._open(self._existing_path(filename))
+        except FileNotFoundError:
+            raise FileNotFoundError(f'File {filename} not found') from None
+
+    def _open(self, file_path):
+        # hasil: (file object, sha256 isi file atau None untuk backend plain);
+        # file dibuka di bawah read lock sehingga tidak bertabrakan dengan
+        # rename oleh writer, setelah terbuka isinya tetap utuh
+        with self.locks.read(file_path):
+            if self.store is None:
+                return open(file_path, 'rb'), None
+            return self.store.open(file_path)
+
+    def _write(self, file_path, chunks, sha256=None):
+        # hasil: info tambahan untuk respon upload (hash dan status dedup)
+        if self.store is not None:
+            return self.store.put(file_path, chunks, sha256)
+        # tulis ke file sementara di luar lock, lock hanya dipegang saat
+        # rename sehingga pembaca tidak menunggu selama transfer; susunan
+        # hashed menyimpan sha256 di metadata, dihitung sambil menulis
+        tmp_path = temp_path(file_path)
+        h = hashlib.sha256() if self.layout == 'hashed' else None
+        write_temp(tmp_path, chunks, self.fsync, h.update if h is not None else None)
+        try:
+            with self.locks.write(file_path):
+                replace(tmp_path, file_path, self.fsync)
+        except:
+            os.remove(tmp_path)
+            raise
+        return dict(sha256=h.hexdigest()) if h is not None else {}
+
+    def _read_cached(self, fp, filename, kind):
+        # key diambil dari fstat file yang sudah dibuka, sehingga isi cache
+        # selalu cocok dengan versi file yang sedang dibaca
+        st = os.fstat(fp.fileno())
+        size = st.st_size if kind == 'raw' else (st.st_size + 2) // 3 * 4
+        if not self.cache.accepts(size):
+            return None
+        key = (filename, st.st_mtime_ns, st.st_size, kind)
+        data = self.cache.get(key)
+        if data is None:
+            data = fp.read()
+            if kind == 'b64':
+                data = base64.b64encode(data)
+            self.cache.put(key, data)
+        return data
+
+    def _compressed(self, fp, filename, accept_encoding):
+        """
+        hasil: (codec, isi terkompresi) atau (None, None) jika client tidak
+        meminta kompresi atau isi file tidak layak dikompresi; isi berupa
+        bytes (dari/ke cache) atau file sementara untuk file besar
+        """
+        codec = choose_codec(accept_encoding)
+        if codec is None:
+            return None, None
+        st = os.fstat(fp.fileno())
+        key = (filename, st.st_mtime_ns, st.st_size, codec)
+        cacheable = self.cache.accepts(st.st_size)
+        if cacheable:
+            data = self.cache.get(key)
+            if data is not None:
+                # b'' menandai file yang sudah pernah dicek tidak layak dikompresi
+                return (codec, data) if data else (None, None)
+        if not worth_compressing(os.pread(fp.fileno(), SAMPLE_SIZE, 0), codec):
+            if cacheable:
+                self.cache.put(key, b'')
+            return None, None
+        if cacheable:
+            data = compress_bytes(fp.read(), codec)
+            if len(data) >= st.st_size:
+                data = b''
+            self.cache.put(key, data)
+            fp.seek(0)
+            return (codec, data) if data else (None, None)
+        # file besar dikompresi per chunk ke file sementara, karena ukuran
+        # isi harus diketahui sebelum header respon dikirim
+        tmp = tempfile.TemporaryFile()
+        try:
+            body = file_body(fp)
+            for chunk in compress_chunks(iter(lambda: body.read(CHUNK_SIZE), b''), codec):
+                tmp.write(chunk)
+            tmp.seek(0)
+        except:
+            tmp.close()
+            raise
+        return codec, tmp
+
+    def cache_stats(self, params=[]):
+        return dict(status='OK', data=self.cache.stats())
+
+    def _file_changed(self, filename, file_path, sha256=None, before=None):
+        # before: hasil index.mark() sebelum file ditulis
+        self.cache.invalidate(filename)
+        if self.layout == 'hashed' or os.path.dirname(file_path) == self.files_dir:
+            st = os.stat(file_path)
+            self.index.add(filename, st.st_size, st.st_mtime, file_path, sha256, before)
+
+    def _file_removed(self, filename, before=None):
+        self.cache.invalidate(filename)
+        self.index.remove(filename, before)
 
     def list(self, params=[]):
+        # params opsional berupa dict: prefix, cursor, limit, detail
+        # tanpa params hasilnya sama seperti dulu, daftar semua nama file
         try:
-            # Gunakan path absolut ke direktori files/
-            filelist = glob(os.path.join(self.files_dir, '*.*'))
-            # Ekstrak hanya nama file, bukan path lengkap
-            filelist = [os.path.basename(f) for f in filelist]
+            opsi = params[0] if params and isinstance(params[0], dict) else {}
+            self.index.refresh()
+            entries, next_cursor = self.index.page(opsi.get('prefix', ''), opsi.get('cursor'), opsi.get('limit'))
+            if opsi.get('detail'):
+                filelist = [dict(name=name, size=size, mtime=mtime) for name, size, mtime in entries]
+            else:
+                filelist = [name for name, _, _ in entries]
             result = dict(status='OK', data=filelist)
+            if opsi:
+                result['next_cursor'] = next_cursor
         except Exception as e:
             result = dict(status='ERROR', data=str(e))
         return result
 
-    def get(self, params=[]):
+    def get(self, params=[], accept_encoding=None):
         try:
             filename = params[0]
             if filename == '':
                 result = dict(status='ERROR', data='Filename or file data is empty')
                 return result
-            file_path = os.path.join(self.files_dir, filename)
-            with open(file_path, 'rb') as fp:
-                isifile = base64.b64encode(fp.read()).decode()
-            result = dict(status='OK', data_namafile=filename, data_file=isifile)
+            fp, digest = self._open_existing(filename)
+            with fp:
+                codec, compressed = self._compressed(fp, filename, accept_encoding)
+                if hasattr(compressed, 'read'):
+                    with compressed:
+                        compressed = compressed.read()
+                if codec is not None:
+                    isifile = base64.b64encode(compressed)
+                else:
+                    isifile = self._read_cached(fp, filename, 'b64')
+                    if isifile is None:
+                        with file_body(fp) as body:
+                            isifile = base64.b64encode(body.read())
+            result = dict(status='OK', data_namafile=filename, data_file=isifile.decode())
+            if codec is not None:
+                result['compression'] = codec
+            if digest is not None:
+                result['sha256'] = digest
         except Exception as e:
             result = dict(status='ERROR', data=str(e))
         return result
         
     def upload(self, params=[]):
+        # params: [filename, data_base64, compression, sha256, original_size],
+        # tiga terakhir opsional; original_size adalah ukuran sebelum dikompresi
         try:
             filename = params[0]
             filedata_b64 = params[1]
@@ -46,27 +454,455 @@ class FileInterface:
             missing_padding = len(filedata_b64) % 4
             if missing_padding != 0:
                 filedata_b64 += '=' * (4 - missing_padding)
-            filedata = base64.b64decode(filedata_b64)
-            file_path = os.path.join(self.files_dir, filename)
-            with open(file_path, 'wb') as f:
-                f.write(filedata)
-            result = dict(status='OK', data_namafile=filename)
+            chunks = [base64.b64decode(filedata_b64)]
+            if len(params) > 2 and params[2]:
+                # hasil dekompresi langsung di-stream ke file, tidak ditampung
+                chunks = decompress_chunks(chunks, params[2], MAX_DECOMPRESSED_SIZE,
+                                           params[4] if len(params) > 4 else None)
+            file_path = self._file_path(filename, create=True)
+            before = self.index.mark()
+            info = self._write(file_path, chunks, params[3] if len(params) > 3 else None)
+            self._file_changed(filename, file_path, info.get('sha256'), before)
+            result = dict(status='OK', data_namafile=filename, **info)
         except Exception as e:
             result = dict(status='ERROR', data=str(e))
         return result
         
+    def get_binary(self, params=[], accept_encoding=None):
+        # sama seperti get, tapi isi file dikembalikan sebagai file object
+        # yang dikirim mentah (tanpa base64) per chunk oleh server
+        try:
+            filename = params[0]
+            if filename == '':
+                return dict(status='ERROR', data='Filename or file data is empty'), b''
+            fp, digest = self._open_existing(filename)
+            result = dict(status='OK', data_namafile=filename)
+            if digest is not None:
+                result['sha256'] = digest
+            try:
+                codec, compressed = self._compressed(fp, filename, accept_encoding)
+            except:
+                fp.close()
+                raise
+            if codec is not None:
+                fp.close()
+                result['compression'] = codec
+                return result, compressed
+            cached = self._read_cached(fp, filename, 'raw')
+        except Exception as e:
+            return dict(status='ERROR', data=str(e)), b''
+        if cached is not None:
+            fp.close()
+            return result, cached
+        return result, file_body(fp)
+
+    def get_stream(self, params=[], accept_encoding=None):
+        # seperti get, tapi isi base64 dikembalikan sebagai iterator chunk
+        # sehingga file besar tidak perlu di-encode utuh di memori
+        try:
+            filename = params[0]
+            if filename == '':
+                return dict(status='ERROR', data='Filename or file data is empty'), iter(())
+            fp, digest = self._open_existing(filename)
+        except Exception as e:
+            return dict(status='ERROR', data=str(e)), iter(())
+        result = dict(status='OK', data_namafile=filename)
+        if digest is not None:
+            result['sha256'] = digest
+        codec = choose_codec(accept_encoding)
+        try:
+            if codec is not None and self.cache.accepts(os.fstat(fp.fileno()).st_size):
+                # file kecil: pakai (dan isi) cache hasil kompresi
+                codec, compressed = self._compressed(fp, filename, accept_encoding)
+                if codec is not None:
+                    fp.close()
+                    result['compression'] = codec
+                    return result, iter([base64.b64encode(compressed)])
+            elif codec is not None and worth_compressing(os.pread(fp.fileno(), SAMPLE_SIZE, 0), codec):
+                # JSON tidak butuh ukuran di depan, jadi file besar bisa
+                # dikompresi dan di-encode sambil dikirim
+                result['compression'] = codec
+                return result, self._b64_compressed_chunks(fp, codec)
+        except Exception as e:
+            fp.close()
+            return dict(status='ERROR', data=str(e)), iter(())
+        return result, self._b64_chunks(fp, filename)
+
+    def _b64_chunks(self, fp, filename):
+        with fp:
+            cached = self._read_cached(fp, filename, 'b64')
+            if cached is not None:
+                yield cached
+            else:
+                with file_body(fp) as body:
+                    yield from b64encode_chunks(body)
+
+    def _b64_compressed_chunks(self, fp, codec):
+        with file_body(fp) as body:
+            yield from b64encode_stream(compress_chunks(iter(lambda: body.read(B64_READ_SIZE), b''), codec))
+
+    def upload_binary(self, params=[], filedata=b'', encoding='raw', compression=None, sha256=None,
+                      original_size=None):
+        # filedata bisa berupa bytes atau iterable berisi chunk bytes,
+        # sehingga file ditulis per chunk tanpa ditampung utuh di memori
+        try:
+            filename = params[0]
+            if filename == '':
+                result = dict(status='ERROR', data='Filename or file data is empty')
+                return result
+            chunks = [filedata] if isinstance(filedata, (bytes, bytearray)) else filedata
+            if encoding == 'base64':
+                chunks = b64decode_chunks(chunks)
+            if compression:
+                chunks = decompress_chunks(chunks, compression, MAX_DECOMPRESSED_SIZE, original_size)
+            file_path = self._file_path(filename, create=True)
+            before = self.index.mark()
+            info = self._write(file_path, chunks, sha256)
+            self._file_changed(filename, file_path, info.get('sha256'), before)
+            result = dict(status='OK', data_namafile=filename, **info)
+        except Exception as e:
+            result = dict(status='ERROR', data=str(e))
+        return result
+
+    def _open_range(self, params):
+        # params: [filename, offset, length], length 0 berarti sampai akhir file
+        filename = params[0]
+        if filename == '':
+            raise ValueError('Filename is empty')
+        offset = int(params[1]) if len(params) > 1 else 0
+        length = int(params[2]) if len(params) > 2 else 0
+        if offset < 0 or length < 0:
+            raise ValueError('Offset and length must not be negative')
+        fp, digest = self._open_existing(filename)
+        total_size = os.fstat(fp.fileno()).st_size
+        offset = min(offset, total_size)
+        length = total_size - offset if length == 0 else min(length, total_size - offset)
+        result = dict(status='OK', data_namafile=filename, offset=offset, length=length, total_size=total_size)
+        if digest is not None:
+            # hash seluruh file, untuk verifikasi setelah semua bagian selesai
+            result['sha256'] = digest
+        return result, file_body(fp, offset, length)
+
+    def get_range(self, params=[]):
+        try:
+            result, body = self._open_range(params)
+            with body:
+                result['data_file'] = base64.b64encode(body.read()).decode()
+        except Exception as e:
+            result = dict(status='ERROR', data=str(e))
+        return result
+
+    def get_range_stream(self, params=[]):
+        # seperti get_range, tapi isi base64 dikembalikan per chunk (lihat
+        # get_stream)
+        try:
+            result, body = self._open_range(params)
+        except Exception as e:
+            return dict(status='ERROR', data=str(e)), iter(())
+        return result, self._b64_range_chunks(body)
+
+    def _b64_range_chunks(self, body):
+        with body:
+            yield from b64encode_chunks(body)
+
+    def get_range_binary(self, params=[]):
+        try:
+            return self._open_range(params)
+        except Exception as e:
+            return dict(status='ERROR', data=str(e)), b''
+
+    def _part_path(self, filename, upload_id):
+        if not UPLOAD_ID_PATTERN.match(str(upload_id)):
+            raise ValueError(f'Invalid upload id {upload_id}')
+        # semua file .part ada di satu direktori agar mudah dibersihkan,
+        # nama file diganti hash (nama asli bisa panjang atau berisi '/')
+        self._file_path(filename)
+        key = hashlib.blake2b(filename.encode(), digest_size=16).hexdigest()
+        return os.path.join(self.parts_dir, f'{key}.{upload_id}.part')
+
+    def upload_part(self, params=[]):
+        # params: [filename, upload_id, offset, data_base64]
+        try:
+            filedata = base64.b64decode(params[3] + '=' * (-len(params[3]) % 4))
+        except Exception as e:
+            return dict(status='ERROR', data=str(e))
+        return self.upload_part_binary(params[:3], filedata)
+
+    def upload_part_binary(self, params=[], filedata=b''):
+        # setiap bagian ditulis di offsetnya ke file sementara, sehingga
+        # beberapa bagian bisa dikirim paralel lewat koneksi berbeda
+        try:
+            filename, upload_id, offset = params[0], params[1], int(params[2])
+            if filename == '' or offset < 0:
+                return dict(status='ERROR', data='Filename is empty or offset is negative')
+            part_path = self._part_path(filename, upload_id)
+            chunks = [filedata] if isinstance(filedata, (bytes, bytearray)) else filedata
+            fd = os.open(part_path, os.O_WRONLY | os.O_CREAT, 0o644)
+            written = 0
+            try:
+                for chunk in chunks:
+                    written += os.pwrite(fd, chunk, offset + written)
+            finally:
+                os.close(fd)
+            result = dict(status='OK', data_namafile=filename, offset=offset, length=written)
+        except Exception as e:
+            result = dict(status='ERROR', data=str(e))
+        return result
+
+    def upload_commit(self, params=[]):
+        # params: [filename, upload_id, total_size, sha256 (opsional)]; file
+        # sementara di-rename secara atomik menjadi file tujuan
+        try:
+            filename, upload_id, total_size = params[0], params[1], int(params[2])
+            part_path = self._part_path(filename, upload_id)
+            size = os.path.getsize(part_path)
+            if size != total_size:
+                return dict(status='ERROR', data=f'Upload incomplete: {size} of {total_size} bytes')
+            file_path = self._file_path(filename, create=True)
+            before = self.index.mark()
+            info = {}
+            if self.store is not None:
+                info = self.store.put_file(file_path, part_path, params[3] if len(params) > 3 else None)
+            else:
+                if self.fsync != 'none':
+                    with open(part_path, 'rb') as f:
+                        sync_file(f.fileno(), self.fsync)
+                with self.locks.write(file_path):
+                    replace(part_path, file_path, self.fsync)
+            self._file_changed(filename, file_path, info.get('sha256'), before)
+            result = dict(status='OK', data_namafile=filename, **info)
+        except Exception as e:
+            result = dict(status='ERROR', data=str(e))
+        return result
+
+    def upload_abort(self, params=[]):
+        try:
+            os.remove(self._part_path(params[0], params[1]))
+            result = dict(status='OK', data_namafile=params[0])
+        except Exception as e:
+            result = dict(status='ERROR', data=str(e))
+        return result
+
+    def signature(self, params=[]):
+        # params: [filename, block_size (opsional)]; signature per blok untuk
+        # upload delta (lihat file_delta), beserta sha256 dan ukuran file
+        try:
+            filename = params[0]
+            if filename == '':
+                return dict(status='ERROR', data='Filename is empty')
+            fp, digest = self._open_existing(filename)
+            with fp:
+                size = os.fstat(fp.fileno()).st_size
+                block_size = int(params[1]) if len(params) > 1 and params[1] else block_size_for(size)
+                if not MIN_BLOCK_SIZE <= block_size <= MAX_BLOCK_SIZE:
+                    return dict(status='ERROR', data=f'Block size must be between {MIN_BLOCK_SIZE} and {MAX_BLOCK_SIZE}')
+                blocks, digest = signature(fp, block_size, digest)
+            result = dict(status='OK', data_namafile=filename, size=size, block_size=block_size,
+                          blocks=blocks, sha256=digest)
+        except Exception as e:
+            result = dict(status='ERROR', data=str(e))
+        return result
+
+    def upload_delta(self, params=[]):
+        # params: [filename, ops, literal_base64, sha256]
+        try:
+            literal = base64.b64decode(params[2] + '=' * (-len(params[2]) % 4))
+        except Exception as e:
+            return dict(status='ERROR', data=str(e))
+        return self.upload_delta_binary([params[0], params[1], params[3]], literal)
+
+    def upload_delta_binary(self, params=[], filedata=b''):
+        """
+        params: [filename, ops, sha256]; file baru disusun dari potongan
+        file lama (op [offset, length]) dan byte literal dari filedata (op
+        berupa jumlah byte), ditulis atomik seperti upload biasa dan ditolak
+        jika sha256 hasilnya tidak cocok, misalnya karena file lama sudah
+        berubah sejak signature diambil
+        """
+        try:
+            filename, ops, sha256 = params[0], params[1], params[2]
+            if filename == '' or not sha256:
+                return dict(status='ERROR', data='Filename or sha256 is empty')
+            file_path = self._file_path(filename)
+            literal = [filedata] if isinstance(filedata, (bytes, bytearray)) else filedata
+            fp, _ = self._open_existing(filename)
+            before = self.index.mark()
+            with fp:
+                counts = dict(copied_bytes=0, literal_bytes=0)
+                chunks = self._delta_chunks(fp, ops, literal, counts)
+                if self.store is None:
+                    chunks = self._verified(chunks, sha256)
+                info = self._write(file_path, chunks, sha256)
+            self._file_changed(filename, file_path, info.get('sha256'), before)
+            result = dict(status='OK', data_namafile=filename, **counts, **info)
+        except Exception as e:
+            result = dict(status='ERROR', data=str(e))
+        return result
+
+    def _delta_chunks(self, fp, ops, literal, counts):
+        base_size = os.fstat(fp.fileno()).st_size
+        splitter = _BodySplitter(literal)
+        for op in ops:
+            if isinstance(op, list):
+                offset, length = int(op[0]), int(op[1])
+                if offset < 0 or length < 0 or offset + length > base_size:
+                    raise ValueError(f'Delta copies outside the base file: {offset}+{length} > {base_size}')
+                counts['copied_bytes'] += length
+                end = offset + length
+                while offset < end:
+                    chunk = os.pread(fp.fileno(), min(end - offset, CHUNK_SIZE * 16), offset)
+                    if not chunk:
+                        raise ValueError('Base file is shorter than expected')
+                    offset += len(chunk)
+                    yield chunk
+            else:
+                length = int(op)
+                if length < 0:
+                    raise ValueError('Literal length must not be negative')
+                counts['literal_bytes'] += length
+                yield from splitter.take(length)
+
+    def _verified(self, chunks, expected):
+        # backend plain tidak memverifikasi hash, jadi dicek di sini sebelum
+        # file sementara di-rename
+        h = hashlib.sha256()
+        for chunk in chunks:
+            h.update(chunk)
+            yield chunk
+        if h.hexdigest() != expected:
+            raise ChecksumMismatch(f'Checksum mismatch: expected {expected}, got {h.hexdigest()}')
+
+    def mget(self, params=[]):
+        # params: [daftar filename]; data berisi hasil GET per file
+        try:
+            return dict(status='OK', data=self._batch_map(lambda name: _named(self.get([name]), name), list(params[0])))
+        except Exception as e:
+            return dict(status='ERROR', data=str(e))
+
+    def mget_binary(self, params=[]):
+        """
+        hasil: header berisi hasil per file (dengan size untuk file yang
+        berhasil) dan isi berupa isi semua file berurutan sesuai daftar
+        """
+        def open_one(name):
+            result, body = self.get_binary([name])
+            _named(result, name)
+            if result['status'] == 'OK' and not isinstance(body, (bytes, bytearray)):
+                with body:
+                    if body_size(body) <= BATCH_INLINE_SIZE:
+                        body = body.read()
+                    else:
+                        # file besar ditutup lagi, dibuka ulang saat dikirim
+                        body = _DeferredBody(lambda: self._open_existing(name)[0],
+                                             _identity(body.fileno()))
+            return result, body
+
+        try:
+            opened = self._batch_map(open_one, list(params[0]))
+        except Exception as e:
+            return dict(status='ERROR', data=str(e)), b''
+        entries, parts = [], []
+        for result, body in opened:
+            if result['status'] == 'OK':
+                result['size'] = body_size(body)
+                parts.append(body)
+            entries.append(result)
+        return dict(status='OK', data=entries), ConcatBody(parts)
+
+    def mupload(self, params=[]):
+        # params: [daftar [filename, data_base64, compression, sha256]],
+        # dua elemen terakhir opsional seperti pada UPLOAD
+        try:
+            return dict(status='OK', data=self._batch_map(self.upload, list(params[0])))
+        except Exception as e:
+            return dict(status='ERROR', data=str(e))
+
+    def mupload_binary(self, params=[], filedata=b''):
+        """
+        params: [daftar [filename, size, sha256 (opsional)]], isi frame
+        berisi isi semua file berurutan; file kecil ditulis paralel oleh
+        worker batch sementara isi berikutnya masih dibaca dari socket
+        """
+        try:
+            items = list(params[0])
+            if len(items) > MAX_BATCH:
+                raise ValueError(f'Too many files in one batch: {len(items)} > {MAX_BATCH}')
+            splitter = _BodySplitter([filedata] if isinstance(filedata, (bytes, bytearray)) else filedata)
+            results = [None] * len(items)
+            tasks = []
+            for i, item in enumerate(items):
+                name, size, sha256 = item[0], int(item[1]), (item[2] if len(item) > 2 else None)
+                if size > BATCH_INLINE_SIZE:
+                    part = splitter.take(size)
+                    results[i] = self.upload_binary([name], part, sha256=sha256)
+                    # upload yang gagal di tengah jalan tidak membaca isinya
+                    # sampai habis, sisanya dilewati agar file berikutnya pas
+                    for _ in part:
+                        pass
+                    continue
+                data = b''.join(splitter.take(size))
+                # batasi file yang sudah dibaca tapi belum ditulis, agar
+                # memori tidak tumbuh jika disk lebih lambat dari jaringan
+                if len(tasks) >= BATCH_WORKERS:
+                    tasks[-BATCH_WORKERS][1].done.wait()
+                tasks.append((i, self.batch_workers.submit(self.upload_binary, [name], data, sha256=sha256)))
+            for i, task in tasks:
+                results[i] = task.result()
+        except Exception as e:
+            return dict(status='ERROR', data=str(e))
+        return dict(status='OK', data=results)
+
+    def mdelete(self, params=[]):
+        # params: [daftar filename]
+        try:
+            return dict(status='OK', data=self._batch_map(lambda name: _named(self.delete([name]), name), list(params[0])))
+        except Exception as e:
+            return dict(status='ERROR', data=str(e))
+
+    def has(self, params=[]):
+        # params: [sha256, filename (opsional)]; jika blob sudah ada dan
+        # filename diberikan, filename langsung dipetakan ke blob tersebut
+        # sehingga client tidak perlu mengirim isi file
+        try:
+            if self.store is None:
+                return dict(status='ERROR', data='Content-addressed storage is disabled')
+            digest = params[0]
+            if len(params) > 1 and params[1]:
+                file_path = self._file_path(params[1], create=True)
+                before = self.index.mark()
+                found = self.store.link(file_path, digest)
+                if found:
+                    self._file_changed(params[1], file_path, digest, before)
+            else:
+                found = self.store.has(digest)
+            result = dict(status='OK', data=found, sha256=digest)
+        except Exception as e:
+            result = dict(status='ERROR', data=str(e))
+        return result
+
     def delete(self, params=[]):
         try:
             filename = params[0]
             if filename == '':
                 result = dict(status='ERROR', data='Filename is empty')
                 return result
-            file_path = os.path.join(self.files_dir, filename)
-            if os.path.exists(file_path):
-                os.remove(file_path)
-                result = dict(status='OK', data=f'File {filename} deleted successfully')
-            else:
-                result = dict(status='ERROR', data=f'File {filename} not found')
+            try:
+                file_path = self._existing_path(filename)
+            except FileNotFoundError as e:
+                return dict(status='ERROR', data=str(e))
+            before = self.index.mark()
+            # langsung hapus tanpa cek exists lebih dulu, agar tidak ada
+            # jeda antara cek dan hapus
+            try:
+                if self.store is not None:
+                    self.store.remove(file_path)
+                else:
+                    with self.locks.write(file_path):
+                        os.remove(file_path)
+            except FileNotFoundError:
+                return dict(status='ERROR', data=f'File {filename} not found')
+            self._file_removed(filename, before)
+            result = dict(status='OK', data=f'File {filename} deleted successfully')
         except Exception as e:
             result = dict(status='ERROR', data=str(e))
         return result
@@ -0,0 +1,109 @@
+import hashlib
+import os
+from urllib.parse import quote, unquote
+
+"""
+* file_layout menentukan lokasi file di disk dari nama file yang dikirim
+client, dengan dua susunan (FILE_LAYOUT):
+  - 'flat': semua file langsung di files/<filename> (susunan lama)
+  - 'hashed': file dibagi ke subdirektori dari hash nama file,
+    files/<2 hex>/<2 hex>/<filename ter-escape>, sehingga satu direktori
+    tidak pernah berisi jutaan entry; metadata (nama -> path, size, mtime,
+    sha256) disimpan di SQLite (lihat file_index.MetadataIndex)
+
+* semua nama file dicek dengan check_name sebelum dipakai sebagai path:
+nama kosong, path absolut, komponen '..' dan nama yang diawali titik (file
+internal seperti .locks, .blobs, .meta.db dan file sementara) ditolak,
+jadi params[0] tidak bisa keluar dari direktori files/; susunan flat juga
+menolak '/' di nama file karena semua file ada langsung di files/ (tidak
+ada subdirektori yang dibuat maupun di-LIST)
+
+* pada susunan hashed nama file di-escape (quote) sehingga '/' di nama
+file tidak membuat subdirektori, dan nama asli tetap bisa dibaca ulang
+dari path (unquote) jika database metadata hilang
+"""
+
+LAYOUT = 'flat'
+LAYOUTS = ('flat', 'hashed')
+# dua level subdirektori, masing-masing 256 entry
+SHARD_LEVELS = 2
+
+
+def layout_mode(layout=None):
+    layout = layout or os.environ.get('FILE_LAYOUT', LAYOUT)
+    if layout not in LAYOUTS:
+        raise ValueError(f'Unknown layout {layout}, choose from {LAYOUTS}')
+    return layout
+
+
+def check_name(filename):
+    if not isinstance(filename, str) or filename == '':
+        raise ValueError('Filename is empty')
+    parts = filename.replace('\\', '/').split('/')
+    if '\x00' in filename or any(part in ('', '..') or part.startswith('.') for part in parts):
+        raise ValueError(f'Invalid filename {filename!r}')
+    return filename
+
+
+def shard_of(filename):
+    digest = hashlib.blake2b(filename.encode(), digest_size=SHARD_LEVELS).hexdigest()
+    return [digest[i:i + 2] for i in range(0, 2 * SHARD_LEVELS, 2)]
+
+
+def resolve(files_dir, filename, layout=LAYOUT):
+    """path absolut file di dalam files_dir, ValueError jika nama tidak aman"""
+    check_name(filename)
+    if layout != 'hashed' and ('/' in filename or '\\' in filename):
+        raise ValueError(f'Invalid filename {filename!r}')
+    if layout == 'hashed':
+        path = os.path.join(files_dir, *shard_of(filename), quote(filename, safe=''))
+    else:
+        path = os.path.normpath(os.path.join(files_dir, filename))
+    if os.path.commonpath([files_dir, path]) != files_dir or path == files_dir:
+        raise ValueError(f'Invalid filename {filename!r}')
+    return path
+
+
+def scan_hashed(files_dir):
+    """
+    hasil: (nama, path) semua file di susunan hashed, untuk membangun ulang
+    database metadata; file sementara (diawali titik) dilewati
+    """
+    for root, dirs, files in os.walk(files_dir):
+        depth = len(os.path.relpath(root, files_dir).split(os.sep)) if root != files_dir else 0
+        dirs[:] = [d for d in dirs if not d.startswith('.')] if depth < SHARD_LEVELS else []
+        if depth != SHARD_LEVELS:
+            continue
+        for name in files:
+            if not name.startswith('.'):
+                yield unquote(name), os.path.join(root, name)
+
+
+def migrate_flat(files_dir):
+    """
+    pindahkan file susunan flat (langsung di files/) ke susunan hashed,
+    hasil: daftar (nama, path baru); symlink (file backend cas) dibuat ulang
+    karena targetnya relatif terhadap direktori symlink
+    """
+    moved = []
+    with os.scandir(files_dir) as it:
+        entries = [e for e in it if not e.name.startswith('.') and not e.is_dir(follow_symlinks=False)]
+    for entry in entries:
+        try:
+            check_name(entry.name)
+        except ValueError:
+            continue
+        new_path = resolve(files_dir, entry.name, 'hashed')
+        os.makedirs(os.path.dirname(new_path), exist_ok=True)
+        try:
+            if entry.is_symlink():
+                target = os.path.realpath(entry.path)
+                os.symlink(os.path.relpath(target, os.path.dirname(new_path)), new_path)
+                os.remove(entry.path)
+            else:
+                os.replace(entry.path, new_path)
+        except (FileNotFoundError, FileExistsError):
+            # sudah dipindah worker lain yang start bersamaan
+            continue
+        moved.append((entry.name, new_path))
+    return moved
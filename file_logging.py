@@ -0,0 +1,134 @@
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+import time
+
+"""
+* file_logging mengatur logging untuk semua varian server
+
+* handler di root logger adalah QueueHandler: worker hanya memasukkan
+record ke antrian (tanpa menunggu), penulisan ke stderr dilakukan oleh
+satu thread QueueListener; jika antrian penuh record dibuang dan dihitung,
+sehingga logging tidak pernah menahan thread worker
+
+* access log ditulis ke logger "file_server.access" dalam format
+key=value (command, file, bytes, duration_ms, status); saat request rate
+tinggi hanya sebagian baris yang ditulis (maksimal rate baris per detik),
+jumlah baris yang dilewati dicantumkan di baris berikutnya
+
+* konfigurasi lewat argumen setup_logging atau environment variable
+FILE_LOG_LEVEL, FILE_ACCESS_LOG_RATE dan FILE_LOG_MAX_FIELD
+"""
+
+LOG_FORMAT = '%(asctime)s %(levelname)s %(processName)s %(name)s: %(message)s'
+QUEUE_SIZE = 10000
+# panjang maksimal nilai (misalnya payload) yang ditulis ke log
+MAX_FIELD = 200
+# baris access log per detik sebelum sampling aktif
+ACCESS_LOG_RATE = 100
+
+access_logger = logging.getLogger('file_server.access')
+
+
+def ringkas(value, limit=None):
+    """potong nilai panjang agar payload base64 tidak ikut tertulis utuh"""
+    limit = MAX_FIELD if limit is None else limit
+    text = value if isinstance(value, str) else repr(value)
+    if len(text) <= limit:
+        return text
+    return f'{text[:limit]}...({len(text)} chars)'
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    def __init__(self, log_queue):
+        logging.handlers.QueueHandler.__init__(self, log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class AccessLog:
+    """
+    penulis access log dengan batas baris per detik; request yang gagal
+    selalu ditulis
+    """
+    def __init__(self, rate=None):
+        # None: ikuti ACCESS_LOG_RATE (bisa diubah oleh setup_logging)
+        self.rate = rate
+        self.lock = threading.Lock()
+        self.window = 0
+        self.written = 0
+        self.suppressed = 0
+
+    def _boleh(self, ok, rate):
+        now = int(time.monotonic())
+        with self.lock:
+            if now != self.window:
+                self.window = now
+                self.written = 0
+            if ok and self.written >= rate:
+                self.suppressed += 1
+                return None
+            self.written += 1
+            suppressed, self.suppressed = self.suppressed, 0
+            return suppressed
+
+    def log(self, command, filename, nbytes, duration, ok=True):
+        rate = ACCESS_LOG_RATE if self.rate is None else self.rate
+        if rate <= 0 or not access_logger.isEnabledFor(logging.INFO):
+            return
+        suppressed = self._boleh(ok, rate)
+        if suppressed is None:
+            return
+        access_logger.info('command=%s file=%s bytes=%d duration_ms=%.2f status=%s suppressed=%d',
+                           command, ringkas(filename or '-', 100), nbytes, duration * 1000,
+                           'OK' if ok else 'ERROR', suppressed)
+
+
+_listener = None
+_listener_pid = None
+
+
+def setup_logging(level=None, access_rate=None, max_field=None):
+    """
+    pasang QueueHandler di root logger (sekali per proses); dipanggil
+    ulang di proses hasil fork karena thread listener tidak ikut ter-fork
+    """
+    global _listener, _listener_pid, MAX_FIELD, ACCESS_LOG_RATE
+    if _listener is not None and _listener_pid == os.getpid():
+        return _listener
+    if level is None and _listener is not None:
+        # proses hasil fork: pakai level yang sudah diatur di proses induk
+        level = logging.getLogger().level
+    level = level or os.environ.get('FILE_LOG_LEVEL', 'INFO')
+    if access_rate is None:
+        access_rate = int(os.environ.get('FILE_ACCESS_LOG_RATE', ACCESS_LOG_RATE))
+    if max_field is None:
+        max_field = int(os.environ.get('FILE_LOG_MAX_FIELD', MAX_FIELD))
+    ACCESS_LOG_RATE = access_rate
+    MAX_FIELD = max_field
+
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    log_queue = queue.Queue(QUEUE_SIZE)
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(DroppingQueueHandler(log_queue))
+    root.setLevel(level.upper() if isinstance(level, str) else level)
+    _listener = logging.handlers.QueueListener(log_queue, stream_handler)
+    _listener.start()
+    _listener_pid = os.getpid()
+    return _listener
+
+
+def setup_logging_after_fork():
+    """pasang ulang logging di proses worker jika proses induk sudah memasangnya"""
+    if _listener is not None and _listener_pid != os.getpid():
+        setup_logging()
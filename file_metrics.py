@@ -0,0 +1,167 @@
+import os
+import threading
+import time
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+"""
+* class Metrics mengumpulkan statistik server: jumlah request dan error
+per perintah, histogram latensi, byte masuk/keluar, koneksi aktif, dan
+total waktu per fase (recv, parse, disk, encode)
+
+* setiap update hanya berupa penambahan angka di bawah satu lock, sehingga
+cukup murah untuk dibiarkan aktif saat beban tinggi
+
+* nilai yang dihitung saat dibaca (misalnya antrian executor atau statistik
+cache) didaftarkan sebagai gauge berupa fungsi
+"""
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0)
+PHASES = ('recv', 'parse', 'disk', 'encode')
+
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        # satu slot tambahan untuk nilai di atas bucket terbesar (+Inf)
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def snapshot(self):
+        cumulative, total = [], 0
+        for bound, n in zip(self.buckets + (float('inf'),), self.counts):
+            total += n
+            cumulative.append((bound, total))
+        return dict(buckets=cumulative, sum=self.sum, count=self.count)
+
+
+class Metrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.requests = {}
+        self.errors = {}
+        self.latency = {}
+        self.phase_seconds = dict.fromkeys(PHASES, 0.0)
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.active_connections = 0
+        self.total_connections = 0
+        self.gauges = {}
+
+    def observe_request(self, command, duration, ok=True):
+        with self.lock:
+            self.requests[command] = self.requests.get(command, 0) + 1
+            if not ok:
+                self.errors[command] = self.errors.get(command, 0) + 1
+            histogram = self.latency.get(command)
+            if histogram is None:
+                histogram = self.latency[command] = Histogram()
+            histogram.observe(duration)
+
+    def add_phase(self, phase, seconds):
+        with self.lock:
+            self.phase_seconds[phase] += seconds
+
+    def add_bytes(self, bytes_in=0, bytes_out=0):
+        with self.lock:
+            self.bytes_in += bytes_in
+            self.bytes_out += bytes_out
+
+    def add_recv(self, nbytes, seconds):
+        # dipanggil setiap recv, jadi byte dan waktu dicatat dengan satu lock
+        with self.lock:
+            self.bytes_in += nbytes
+            self.phase_seconds['recv'] += seconds
+
+    def connection_opened(self):
+        with self.lock:
+            self.active_connections += 1
+            self.total_connections += 1
+
+    def connection_closed(self):
+        with self.lock:
+            self.active_connections -= 1
+
+    def register_gauge(self, name, func):
+        self.gauges[name] = func
+
+    def snapshot(self):
+        with self.lock:
+            result = dict(
+                pid=os.getpid(),
+                uptime_seconds=time.time() - self.started,
+                requests=dict(self.requests),
+                errors=dict(self.errors),
+                latency={c: h.snapshot() for c, h in self.latency.items()},
+                phase_seconds=dict(self.phase_seconds),
+                bytes_in=self.bytes_in,
+                bytes_out=self.bytes_out,
+                active_connections=self.active_connections,
+                total_connections=self.total_connections,
+            )
+        for name, func in list(self.gauges.items()):
+            try:
+                result[name] = func()
+            except Exception as e:
+                result[name] = f'error: {e}'
+        return result
+
+    def render_prometheus(self):
+        snap = self.snapshot()
+        lines = []
+
+        def metric(name, kind, samples):
+            if kind:
+                lines.append(f'# TYPE file_server_{name} {kind}')
+            for labels, value in samples:
+                label_str = ','.join(f'{k}="{v}"' for k, v in labels.items())
+                lines.append(f'file_server_{name}{{{label_str}}} {value}' if label_str else f'file_server_{name} {value}')
+
+        metric('requests_total', 'counter', [({'command': c}, n) for c, n in snap['requests'].items()])
+        metric('errors_total', 'counter', [({'command': c}, n) for c, n in snap['errors'].items()])
+        samples = []
+        for command, h in snap['latency'].items():
+            for bound, n in h['buckets']:
+                samples.append(({'command': command, 'le': '+Inf' if bound == float('inf') else bound}, n))
+        lines.append('# TYPE file_server_request_duration_seconds histogram')
+        metric('request_duration_seconds_bucket', None, samples)
+        metric('request_duration_seconds_sum', None, [({'command': c}, h['sum']) for c, h in snap['latency'].items()])
+        metric('request_duration_seconds_count', None, [({'command': c}, h['count']) for c, h in snap['latency'].items()])
+        metric('phase_seconds_total', 'counter', [({'phase': p}, s) for p, s in snap['phase_seconds'].items()])
+        metric('bytes_in_total', 'counter', [({}, snap['bytes_in'])])
+        metric('bytes_out_total', 'counter', [({}, snap['bytes_out'])])
+        metric('active_connections', 'gauge', [({}, snap['active_connections'])])
+        metric('connections_total', 'counter', [({}, snap['total_connections'])])
+        for name in self.gauges:
+            value = snap.get(name)
+            if isinstance(value, dict):
+                metric(name, 'gauge', [({'key': k}, v) for k, v in value.items() if isinstance(v, (int, float))])
+            elif isinstance(value, (int, float)):
+                metric(name, 'gauge', [({}, value)])
+        return '\n'.join(lines) + '\n'
+
+
+def serve_prometheus(metrics, port, ipaddress='0.0.0.0'):
+    """jalankan endpoint HTTP /metrics (format teks Prometheus) di thread daemon"""
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = metrics.render_prometheus().encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    httpd = ThreadingHTTPServer((ipaddress, port), Handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    return httpd
@@ -1,8 +1,11 @@
-import json
 import logging
 import shlex
+import time
 
+import file_codec
 from file_interface import FileInterface
+from file_metrics import Metrics
+from file_logging import AccessLog, ringkas
 
 """
 * class FileProtocol bertugas untuk memproses 
@@ -14,26 +17,221 @@ pada akhirnya akan diproses dalam bentuk string
 
 * class FileProtocol akan memproses data yang masuk dalam bentuk
 string
+
+* untuk frame binary (lihat file_framing), proses_binary menerima header
+yang sudah di-decode dan isi file mentah, lalu mengembalikan pasangan
+(header respon, isi respon)
+
+* perintah dipanggil lewat tabel handler (register), bukan getattr, sehingga
+client hanya bisa memanggil perintah yang memang didaftarkan
+
+* encode/decode JSON memakai file_codec (orjson/ujson jika tersedia)
+
+* GET dan UPLOAD bisa dikompresi: request GET membawa accept_encoding,
+request UPLOAD membawa compression (lihat file_compression)
+
+* dengan backend content-addressed (FILE_STORAGE=cas), GET mengembalikan
+sha256 isi file, UPLOAD boleh membawa sha256 untuk diverifikasi, dan
+HAS <sha256> [filename] mengecek/memakai blob yang sudah ada
+
+* MGET, MUPLOAD dan MDELETE memproses banyak file dalam satu request
+(paralel di server), hasilnya berupa daftar hasil per file; pada frame
+binary isi semua file dikirim berurutan di isi frame
+
+* SIGNATURE <filename> mengembalikan signature per blok file yang sudah
+ada, lalu UPLOAD_DELTA hanya membawa blok yang berubah dan file baru
+disusun ulang di server (lihat file_delta)
+
+* nama file di params tidak bisa keluar dari direktori files/ ('..',
+path absolut dan nama diawali titik ditolak); dengan FILE_LAYOUT=hashed
+file dibagi ke subdirektori dan metadata disimpan di SQLite (lihat
+file_layout)
 """
 
 
 
 class FileProtocol:
-    def __init__(self):
-        self.file = FileInterface()
-    def proses_string(self, string_datamasuk=''):
-        logging.warning(f"string diproses: {string_datamasuk}")
+    def __init__(self, file_interface=None, metrics=None):
+        self.file = file_interface or FileInterface()
+        # metrics dipakai bersama oleh semua koneksi yang memakai instance ini
+        self.metrics = metrics or Metrics()
+        self.metrics.register_gauge('cache', self.file.cache.stats)
+        if self.file.store is not None:
+            self.metrics.register_gauge('storage', self.file.store.stats)
+        self.access_log = AccessLog()
+        # tabel perintah: hanya perintah yang terdaftar yang bisa dipanggil
+        # client, handler(params) -> dict respon
+        self.handlers = {}
+        # handler khusus frame binary: handler(params, header, body) ->
+        # (dict respon, isi respon); perintah tanpa handler binary memakai
+        # handler biasa dengan isi respon kosong
+        self.binary_handlers = {}
+        # perintah JSON yang isi base64-nya dikirim per chunk oleh
+        # proses_string_stream: handler(request) -> (dict respon, chunk)
+        self.stream_handlers = {
+            'get': lambda c: self.file.get_stream(c.get('params', []), c.get('accept_encoding')),
+            'get_range': lambda c: self.file.get_range_stream(c.get('params', [])),
+        }
+        self.register('list', self.file.list)
+        self.register('get', self.file.get,
+                      lambda params, header, body: self.file.get_binary(params, header.get('accept_encoding')))
+        self.register('upload', self.file.upload,
+                      lambda params, header, body: (self.file.upload_binary(params, body, header.get('encoding', 'raw'),
+                                                                            header.get('compression'),
+                                                                            header.get('sha256'),
+                                                                            header.get('original_size')), b''))
+        self.register('has', self.file.has)
+        self.register('mget', self.file.mget,
+                      lambda params, header, body: self.file.mget_binary(params))
+        self.register('mupload', self.file.mupload,
+                      lambda params, header, body: (self.file.mupload_binary(params, body), b''))
+        self.register('mdelete', self.file.mdelete)
+        self.register('delete', self.file.delete)
+        self.register('get_range', self.file.get_range,
+                      lambda params, header, body: self.file.get_range_binary(params))
+        self.register('upload_part', self.file.upload_part,
+                      lambda params, header, body: (self.file.upload_part_binary(params, body), b''))
+        self.register('signature', self.file.signature)
+        self.register('upload_delta', self.file.upload_delta,
+                      lambda params, header, body: (self.file.upload_delta_binary(params, body), b''))
+        self.register('upload_commit', self.file.upload_commit)
+        self.register('upload_abort', self.file.upload_abort)
+        self.register('cache_stats', self.file.cache_stats)
+        self.register('stats', self.stats)
+
+    def register(self, command, handler, binary_handler=None):
+        command = command.lower()
+        self.handlers[command] = handler
+        if binary_handler is not None:
+            self.binary_handlers[command] = binary_handler
+
+    def stats(self, params=[]):
+        if params and params[0] == 'prometheus':
+            return dict(status='OK', data=self.metrics.render_prometheus())
+        return dict(status='OK', data=self.metrics.snapshot())
+
+    def command_label(self, header):
+        # nama perintah untuk metrics; perintah yang tidak dikenal dijadikan
+        # satu label agar jumlah seri metrics tidak tumbuh tanpa batas
+        c_request = str(header.get('command', '')).lower()
+        return c_request if c_request in self.handlers else 'invalid'
+
+    def catat_request(self, c, duration, ok, nbytes=0):
+        """catat request yang sudah selesai ke metrics dan access log"""
+        c_request = self.command_label(c) if isinstance(c, dict) else 'invalid'
+        self.metrics.observe_request(c_request, duration, ok)
+        params = c.get('params') if isinstance(c, dict) else None
+        filename = params[0] if isinstance(params, list) and params and isinstance(params[0], str) else None
+        self.access_log.log(c_request, filename, nbytes, duration, ok)
+
+    def _parse(self, string_datamasuk):
+        started = time.perf_counter()
+        c = file_codec.loads(string_datamasuk)
+        self.metrics.add_phase('parse', time.perf_counter() - started)
+        return c
+
+    def _jalankan(self, c_request, params):
+        handler = self.handlers.get(c_request)
+        if handler is None:
+            return dict(status='ERROR', data=f'unknown command: {c_request}')
+        started = time.perf_counter()
+        try:
+            return handler(params)
+        finally:
+            self.metrics.add_phase('disk', time.perf_counter() - started)
+
+    def _proses(self, c, started, nbytes=0):
         try:
-            c = json.loads(string_datamasuk)
-            c_request = c.get('command', '').lower()
-            logging.warning(f"memproses request: {c_request}")
             params = c.get('params', [])
-            logging.warning(f"params: {params}")
-            cl = getattr(self.file, c_request)(params)
-            return json.dumps(cl)
+            if logging.getLogger().isEnabledFor(logging.DEBUG):
+                logging.debug(f"memproses request: {c.get('command')} params: {ringkas(params)}")
+            cl = self._jalankan(c.get('command', '').lower(), params)
+            encode_started = time.perf_counter()
+            hasil = file_codec.dumps_splice(cl)
+            self.metrics.add_phase('encode', time.perf_counter() - encode_started)
+            ok = cl.get('status') == 'OK'
+        except Exception as e:
+            logging.warning(f"Exception saat memproses perintah: {e}")
+            hasil = file_codec.dumps_bytes(dict(status='ERROR', data=str(e)))
+            ok = False
+        self.catat_request(c, time.perf_counter() - started, ok, nbytes + len(hasil))
+        return hasil
+
+    def proses_string(self, string_datamasuk=''):
+        started = time.perf_counter()
+        if logging.getLogger().isEnabledFor(logging.DEBUG):
+            logging.debug(f"string diproses: {ringkas(string_datamasuk)}")
+        try:
+            c = self._parse(string_datamasuk)
+        except Exception as e:
+            logging.warning(f"Exception saat memproses perintah: {ringkas(str(e))}")
+            hasil = file_codec.dumps(dict(status='ERROR', data=str(e)))
+            self.catat_request(None, time.perf_counter() - started, False, len(string_datamasuk) + len(hasil))
+            return hasil
+        return self._proses(c, started, len(string_datamasuk)).decode()
+
+    def proses_string_stream(self, string_datamasuk=''):
+        """
+        sama seperti proses_string, tapi hasilnya berupa potongan bytes;
+        untuk GET dan GET_RANGE isi file di-encode base64 per chunk sehingga
+        file besar tidak perlu ditampung utuh di memori
+        """
+        started = time.perf_counter()
+        try:
+            c = self._parse(string_datamasuk)
+        except Exception:
+            # JSON tidak valid, biarkan proses_string yang membuat pesan error
+            yield self.proses_string(string_datamasuk).encode()
+            return
+        stream = self.stream_handlers.get(c.get('command', '').lower()) if isinstance(c, dict) else None
+        if stream is None:
+            yield self._proses(c, started, len(string_datamasuk))
+            return
+        ok = False
+        sent = len(string_datamasuk)
+        try:
+            result, chunks = stream(c)
+            if result['status'] != 'OK':
+                yield file_codec.dumps_bytes(result)
+                return
+            yield file_codec.splice_prefix(result)
+            chunks = iter(chunks)
+            while True:
+                # waktu baca + encode base64 per chunk, di luar waktu kirim
+                encode_started = time.perf_counter()
+                chunk = next(chunks, None)
+                self.metrics.add_phase('encode', time.perf_counter() - encode_started)
+                if chunk is None:
+                    break
+                sent += len(chunk)
+                yield chunk
+            yield b'"}'
+            ok = True
+        finally:
+            self.catat_request(c, time.perf_counter() - started, ok, sent)
+
+    def proses_binary(self, header, body=b''):
+        """
+        latensi request binary dicatat oleh server (lihat catat_request),
+        karena pengiriman isi respon terjadi setelah fungsi ini selesai
+        """
+        started = time.perf_counter()
+        try:
+            c_request = header.get('command', '').lower()
+            logging.debug("memproses request binary: %s", c_request)
+            params = header.get('params', [])
+            binary_handler = self.binary_handlers.get(c_request)
+            if binary_handler is not None:
+                return binary_handler(params, header, body)
+            handler = self.handlers.get(c_request)
+            if handler is None:
+                return dict(status='ERROR', data=f'unknown command: {c_request}'), b''
+            return handler(params), b''
         except Exception as e:
             logging.warning(f"Exception saat memproses perintah: {e}")
-            return json.dumps(dict(status='ERROR', data=str(e)))
+            return dict(status='ERROR', data=str(e)), b''
+        finally:
+            self.metrics.add_phase('disk', time.perf_counter() - started)
 
 
 if __name__=='__main__':
@@ -0,0 +1,140 @@
+import argparse
+import hashlib
+import logging
+import os
+import tempfile
+
+from file_client_cli import FileClient, FileClientError
+from file_cluster import HashRing, parse_nodes, node_name, VNODES, REPLICAS
+
+"""
+* tool rebalance untuk mode cluster (lihat file_cluster): setelah node
+ditambah atau dihapus, setiap file dipindahkan ke R node yang sekarang
+menjadi replikanya menurut HashRing
+
+* isi setiap node dibaca dengan LIST (detail), sehingga tool ini tidak
+perlu tahu susunan node sebelumnya; node yang akan dikeluarkan dari
+cluster diberikan lewat --drain agar filenya ikut dipindahkan
+
+* file disalin dulu ke semua replika yang belum punya (atau yang ukurannya
+berbeda, dari salinan paling baru), baru setelah semua salinan berhasil
+salinan di node yang bukan replika dihapus; file sementara di host yang
+menjalankan tool dipakai sebagai perantara
+
+* contoh: python file_rebalance.py --nodes 127.0.0.1:45001 127.0.0.1:45002
+127.0.0.1:45003 --replicas 2
+"""
+
+
+def list_node(client, page_size=1000):
+    # hasil: {nama: (size, mtime)} untuk satu node
+    files, cursor = {}, None
+    while True:
+        hasil = client.request({'command': 'LIST', 'params': [dict(cursor=cursor, limit=page_size, detail=True)]})
+        if hasil.get('status') != 'OK':
+            raise FileClientError(hasil.get('data'))
+        for entry in hasil['data']:
+            files[entry['name']] = (entry['size'], entry['mtime'])
+        cursor = hasil.get('next_cursor')
+        if cursor is None:
+            return files
+
+
+class _HashingFile:
+    def __init__(self, fp):
+        self.fp = fp
+        self.hash = hashlib.sha256()
+
+    def write(self, data):
+        self.hash.update(data)
+        self.fp.write(data)
+
+
+def copy_file(name, source, targets, clients):
+    """salin name dari node source ke setiap node targets, hasil: True jika semua berhasil"""
+    with tempfile.TemporaryFile() as tmp:
+        writer = _HashingFile(tmp)
+        hasil, _ = clients[source].request_binary({'command': 'GET', 'params': [name]}, output=writer)
+        if hasil.get('status') != 'OK':
+            logging.warning(f"GET {name} from {node_name(source)} failed: {hasil.get('data')}")
+            return False
+        digest = writer.hash.hexdigest()
+        if hasil.get('sha256') and hasil['sha256'] != digest:
+            logging.warning(f"checksum mismatch for {name} from {node_name(source)}")
+            return False
+        ok = True
+        for target in targets:
+            tmp.seek(0)
+            hasil, _ = clients[target].request_binary({'command': 'UPLOAD', 'params': [name], 'sha256': digest}, tmp)
+            if hasil.get('status') != 'OK':
+                logging.warning(f"UPLOAD {name} to {node_name(target)} failed: {hasil.get('data')}")
+                ok = False
+        return ok
+
+
+def rebalance(nodes, drain=(), replicas=REPLICAS, vnodes=VNODES, dry_run=False, keep=False):
+    ring = HashRing(nodes, vnodes)
+    all_nodes = list(ring.nodes) + [tuple(n) for n in drain if tuple(n) not in ring.nodes]
+    clients = {node: FileClient(node) for node in all_nodes}
+    summary = dict(files=0, copied=0, deleted=0, failed=0)
+    try:
+        holders = {}
+        for node in all_nodes:
+            for name, meta in list_node(clients[node]).items():
+                holders.setdefault(name, {})[node] = meta
+        for name in sorted(holders):
+            have = holders[name]
+            want = ring.nodes_for(name, replicas)
+            summary['files'] += 1
+            # salinan paling baru menjadi sumber, replika yang ukurannya
+            # berbeda dianggap belum punya
+            source = max(have, key=lambda node: (have[node][1], node in want))
+            size = have[source][0]
+            missing = [node for node in want if node not in have or have[node][0] != size]
+            extra = [node for node in have if node not in want]
+            if not missing and (keep or not extra):
+                continue
+            print(f"{name}: {node_name(source)} -> {[node_name(n) for n in missing]}"
+                  f"{'' if keep else f', delete from {[node_name(n) for n in extra]}'}")
+            if dry_run:
+                continue
+            if missing:
+                if not copy_file(name, source, missing, clients):
+                    summary['failed'] += 1
+                    continue
+                summary['copied'] += len(missing)
+            if keep:
+                continue
+            for node in extra:
+                hasil = clients[node].request({'command': 'DELETE', 'params': [name]})
+                if hasil.get('status') == 'OK':
+                    summary['deleted'] += 1
+                else:
+                    logging.warning(f"DELETE {name} on {node_name(node)} failed: {hasil.get('data')}")
+                    summary['failed'] += 1
+    finally:
+        for client in clients.values():
+            client.close()
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Move files to their replicas after cluster nodes change")
+    parser.add_argument("--nodes", nargs="+", required=True, help="Cluster nodes host:port after the change")
+    parser.add_argument("--drain", nargs="*", default=[], help="Nodes leaving the cluster, emptied to --nodes")
+    parser.add_argument("--replicas", type=int, default=int(os.environ.get('FILE_REPLICAS', REPLICAS)))
+    parser.add_argument("--vnodes", type=int, default=VNODES)
+    parser.add_argument("--dry-run", action="store_true", help="Only print the planned moves")
+    parser.add_argument("--keep", action="store_true", help="Do not delete copies from nodes that are no longer replicas")
+    args = parser.parse_args()
+
+    nodes = parse_nodes(','.join(args.nodes))
+    drain = parse_nodes(','.join(args.drain))
+    summary = rebalance(nodes, drain, args.replicas, args.vnodes, args.dry_run, args.keep)
+    print(f"files={summary['files']} copied={summary['copied']} deleted={summary['deleted']} failed={summary['failed']}")
+    return 1 if summary['failed'] else 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.ERROR)
+    raise SystemExit(main())
@@ -7,39 +7,69 @@ import sys
 
 
 from file_protocol import  FileProtocol
+from file_framing import FrameReader, send_binary_response, send_json_response, MAX_MESSAGE_SIZE
+from file_metrics import serve_prometheus
+from file_admission import AdmissionControl, reject_connection, send_busy, MAX_CONNECTIONS, MAX_INFLIGHT_BYTES, BACKLOG, IDLE_TIMEOUT, READ_TIMEOUT
+from file_logging import setup_logging
 fp = FileProtocol()
 
 
 class ProcessTheClient(threading.Thread):
-    def __init__(self, connection, address):
+    def __init__(self, connection, address, max_message_size=MAX_MESSAGE_SIZE, admission=None,
+                 idle_timeout=None, read_timeout=None):
         self.connection = connection
         self.address = address
+        self.max_message_size = max_message_size
+        self.admission = admission or AdmissionControl(0, 0)
+        self.idle_timeout = idle_timeout
+        self.read_timeout = read_timeout
         threading.Thread.__init__(self)
 
     def run(self):
-        buffer = ""
+        reader = FrameReader(self.connection, max_message_size=self.max_message_size, metrics=fp.metrics,
+                             admission=self.admission, idle_timeout=self.idle_timeout, read_timeout=self.read_timeout)
+        fp.metrics.connection_opened()
         try:
             while True:
-                data = self.connection.recv(8192)
-                if not data:
+                message = reader.read_message()
+                if message is None:
                     break
-                buffer += data.decode()
-
-                while "\r\n\r\n" in buffer:
-                    message, buffer = buffer.split("\r\n\r\n", 1)
-                    hasil = fp.proses_string(message)
-                    hasil += "\r\n\r\n"
-                    self.connection.sendall(hasil.encode())
+                if message[0] == 'busy':
+                    send_busy(self.connection, message, self.admission.busy('too many bytes in flight'), fp.metrics)
+                elif message[0] == 'binary':
+                    started = time.perf_counter()
+                    header, body = fp.proses_binary(message[1], message[2])
+                    message[2].drain()
+                    sent = send_binary_response(self.connection, header, body, use_sendfile=message[1].get('sendfile', False),
+                                                metrics=fp.metrics)
+                    fp.catat_request(message[1], time.perf_counter() - started, header.get('status') == 'OK',
+                                     message[2].size + sent)
+                else:
+                    send_json_response(self.connection, fp.proses_string_stream(message[1]), fp.metrics)
         except Exception as e:
             logging.warning(f"Error: {e}")
         finally:
+            reader.release()
             self.connection.close()
+            self.admission.release_connection()
+            fp.metrics.connection_closed()
 
 
 
 class Server(threading.Thread):
-    def __init__(self,ipaddress='0.0.0.0',port=45000):
+    def __init__(self,ipaddress='0.0.0.0',port=45000,max_message_size=MAX_MESSAGE_SIZE,metrics_port=None,
+                 max_connections=MAX_CONNECTIONS,max_inflight_bytes=MAX_INFLIGHT_BYTES,backlog=BACKLOG,
+                 idle_timeout=IDLE_TIMEOUT,read_timeout=READ_TIMEOUT):
         self.ipinfo=(ipaddress,port)
+        self.max_message_size = max_message_size
+        # port endpoint HTTP /metrics (format Prometheus), None = tidak aktif
+        self.metrics_port = metrics_port
+        # satu thread per koneksi, jumlah koneksi dibatasi admission control
+        self.admission = AdmissionControl(max_connections, max_inflight_bytes)
+        fp.metrics.register_gauge('admission', self.admission.stats)
+        self.backlog = backlog
+        self.idle_timeout = idle_timeout
+        self.read_timeout = read_timeout
         self.the_clients = []
         self.my_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self.my_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
@@ -48,17 +78,29 @@ class Server(threading.Thread):
     def run(self):
         logging.warning(f"server berjalan di ip address {self.ipinfo}")
         self.my_socket.bind(self.ipinfo)
-        self.my_socket.listen(1)
+        self.my_socket.listen(self.backlog)
+        if self.metrics_port:
+            serve_prometheus(fp.metrics, self.metrics_port, self.ipinfo[0])
         while True:
             self.connection, self.client_address = self.my_socket.accept()
-            logging.warning(f"connection from {self.client_address}")
+            # header dan isi respon dikirim terpisah, matikan Nagle agar
+            # bagian terakhir tidak tertahan delayed ACK
+            self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            logging.debug(f"connection from {self.client_address}")
+            if not self.admission.try_connection():
+                reject_connection(self.connection, self.admission.busy('too many connections', close=True))
+                continue
 
-            clt = ProcessTheClient(self.connection, self.client_address)
+            clt = ProcessTheClient(self.connection, self.client_address, self.max_message_size,
+                                   self.admission, self.idle_timeout, self.read_timeout)
             clt.start()
+            # thread yang sudah selesai tidak perlu disimpan
+            self.the_clients = [c for c in self.the_clients if c.is_alive()]
             self.the_clients.append(clt)
 
 
 def main():
+    setup_logging()
     svr = Server(ipaddress='0.0.0.0',port=45000)
     svr.start()
 
@@ -0,0 +1,334 @@
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from file_protocol import FileProtocol
+from file_metrics import serve_prometheus
+from file_admission import AdmissionControl, MAX_CONNECTIONS, MAX_INFLIGHT_BYTES, BACKLOG, IDLE_TIMEOUT, READ_TIMEOUT
+from file_logging import setup_logging
+from file_framing import BINARY_MAGIC, DELIMITER, HEADER_LEN, MAX_HEADER_SIZE, CHUNK_SIZE, MAX_MESSAGE_SIZE, RESERVE_STEP, FrameError, encode_binary_header, body_size
+import json
+
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
+# body frame binary yang lebih kecil dari ini dibaca utuh dulu di event loop,
+# yang lebih besar dialirkan ke worker lewat BodyFeeder
+SMALL_BODY_SIZE = 1024 * 1024
+# batas read-ahead asyncio StreamReader per koneksi
+STREAM_LIMIT = 4 * CHUNK_SIZE
+
+
+class BodyFeeder:
+    """
+    menjembatani isi frame binary dari asyncio StreamReader ke FileProtocol
+    yang berjalan di thread executor; antrian dibatasi sehingga pembacaan
+    socket ikut melambat jika penulisan ke disk lambat
+    """
+    def __init__(self, reader, size, loop, read_timeout=None):
+        self.reader = reader
+        self.remaining = size
+        self.loop = loop
+        self.read_timeout = read_timeout
+        self.queue = asyncio.Queue(maxsize=8)
+        self.error = None
+
+    async def feed(self):
+        try:
+            while self.remaining > 0:
+                chunk = await asyncio.wait_for(self.reader.read(min(self.remaining, CHUNK_SIZE)), self.read_timeout)
+                if not chunk:
+                    raise FrameError('connection closed in the middle of a frame')
+                self.remaining -= len(chunk)
+                await self.queue.put(chunk)
+        except Exception as e:
+            self.error = e
+            while self.queue.full():
+                self.queue.get_nowait()
+            self.queue.put_nowait(None)
+            raise
+        await self.queue.put(None)
+
+    def chunks(self):
+        # dipanggil dari thread executor
+        while True:
+            chunk = asyncio.run_coroutine_threadsafe(self.queue.get(), self.loop).result()
+            if chunk is None:
+                if self.error is not None:
+                    raise FrameError(f'upload aborted: {self.error}')
+                return
+            yield chunk
+
+    async def drain(self):
+        while self.remaining > 0:
+            chunk = await asyncio.wait_for(self.reader.read(min(self.remaining, CHUNK_SIZE)), self.read_timeout)
+            if not chunk:
+                raise FrameError('connection closed in the middle of a frame')
+            self.remaining -= len(chunk)
+
+
+class ProcessTheClient:
+    def __init__(self, server, reader, writer):
+        self.server = server
+        self.reader = reader
+        self.writer = writer
+        self.address = writer.get_extra_info('peername')
+        self.loop = asyncio.get_running_loop()
+
+    def run_in_executor(self, func, *args):
+        self.server.pending += 1
+        future = self.loop.run_in_executor(self.server.executor, func, *args)
+        future.add_done_callback(self.server.executor_done)
+        return future
+
+    def read(self, coro):
+        # setiap pembacaan di tengah pesan dibatasi read_timeout
+        return asyncio.wait_for(coro, self.server.read_timeout)
+
+    async def read_message(self):
+        try:
+            # koneksi keep-alive yang terlalu lama diam ditutup
+            head = await asyncio.wait_for(self.reader.readexactly(1), self.server.idle_timeout)
+        except (asyncio.IncompleteReadError, asyncio.TimeoutError):
+            return None
+        if head == BINARY_MAGIC[:1]:
+            try:
+                head += await self.read(self.reader.readexactly(len(BINARY_MAGIC) - 1))
+            except asyncio.IncompleteReadError:
+                raise FrameError('connection closed before message delimiter')
+        if head == BINARY_MAGIC:
+            (header_len,) = HEADER_LEN.unpack(await self.read(self.reader.readexactly(HEADER_LEN.size)))
+            if header_len > MAX_HEADER_SIZE:
+                raise FrameError(f'binary header too large: {header_len}')
+            header = json.loads(await self.read(self.reader.readexactly(header_len)))
+            # hanya byte yang dicatat, waktu recv tidak bisa dipisahkan dari
+            # waktu menunggu di event loop
+            size = int(header.get('size', 0))
+            self.server.fp.metrics.add_bytes(bytes_in=len(BINARY_MAGIC) + HEADER_LEN.size + header_len + size)
+            return ('binary', header, size)
+        message, reserved = await self.read_until_delimiter(head)
+        if message is None:
+            return ('busy', 'json', 0)
+        self.server.fp.metrics.add_bytes(bytes_in=len(message))
+        return ('json', message[:-len(DELIMITER)].decode(), reserved)
+
+    async def read_until_delimiter(self, head):
+        """
+        hasil: (pesan, byte yang sudah dipesan di admission); byte dipesan
+        per RESERVE_STEP selama pesan dibaca seperti FrameReader, dan jika
+        jatah habis sisa pesan dibuang sampai delimiter dengan hasil None
+        """
+        admission = self.server.admission
+        buf = bytearray(head)
+        reserved = 0
+        discard = False
+        # pastikan delimiter tidak terpotong antara head dan sisa stream
+        while not buf.endswith(DELIMITER) and any(buf.endswith(DELIMITER[:k]) for k in range(1, len(DELIMITER))):
+            buf += await self.read(self.reader.readexactly(1))
+        # limit StreamReader sengaja kecil agar read-ahead per koneksi tetap
+        # kecil, pesan JSON yang lebih panjang dibaca bertahap
+        try:
+            while not buf.endswith(DELIMITER):
+                try:
+                    buf += await self.read(self.reader.readuntil(DELIMITER))
+                    break
+                except asyncio.LimitOverrunError as e:
+                    # bagian ini tidak memuat awal delimiter, aman dibuang
+                    data = await self.read(self.reader.readexactly(e.consumed))
+                    if discard:
+                        continue
+                    buf += data
+                if len(buf) > self.server.max_message_size:
+                    raise FrameError(f'message exceeds per-connection limit of {self.server.max_message_size} bytes')
+                if len(buf) - reserved >= RESERVE_STEP:
+                    if admission.try_bytes(len(buf) - reserved):
+                        reserved = len(buf)
+                    else:
+                        discard = True
+                        admission.release_bytes(reserved)
+                        reserved = 0
+                        buf.clear()
+        except BaseException:
+            admission.release_bytes(reserved)
+            raise
+        if discard:
+            return None, 0
+        # pesan kecil selalu diterima, jatah disesuaikan dengan ukuran asli
+        size = len(buf) - len(DELIMITER)
+        admission.try_bytes(size - reserved, force=True)
+        admission.release_bytes(reserved - size)
+        return buf, size
+
+    async def process(self):
+        self.server.fp.metrics.connection_opened()
+        try:
+            while True:
+                message = await self.read_message()
+                if message is None:
+                    break
+                admission = self.server.admission
+                size = message[2]
+                # byte pesan JSON sudah dipesan saat dibaca (read_until_delimiter)
+                if message[0] == 'busy' or (message[0] == 'binary' and not admission.try_bytes(size)):
+                    busy = admission.busy('too many bytes in flight')
+                    if message[0] == 'binary':
+                        await BodyFeeder(self.reader, size, self.loop, self.server.read_timeout).drain()
+                        await self.send_binary_response(busy, b'')
+                    else:
+                        await self.send_json(busy)
+                    continue
+                try:
+                    if message[0] == 'binary':
+                        await self.process_binary(message[1], message[2])
+                    else:
+                        await self.process_string(message[1])
+                finally:
+                    admission.release_bytes(size)
+            return True
+        except Exception as e:
+            logging.warning(f"Error processing client {self.address}: {e}")
+            return False
+        finally:
+            self.writer.close()
+            self.server.fp.metrics.connection_closed()
+
+    async def send_json(self, result):
+        self.writer.write(json.dumps(result).encode() + DELIMITER)
+        await self.writer.drain()
+
+    async def process_string(self, message):
+        hasil = self.server.fp.proses_string_stream(message)
+        sent = 0
+        while True:
+            chunk = await self.run_in_executor(next, hasil, None)
+            if chunk is None:
+                break
+            self.writer.write(chunk)
+            sent += len(chunk)
+            await self.writer.drain()
+        self.writer.write(DELIMITER)
+        await self.writer.drain()
+        self.server.fp.metrics.add_bytes(bytes_out=sent + len(DELIMITER))
+
+    async def process_binary(self, header, size):
+        fp = self.server.fp
+        started = time.perf_counter()
+        if size <= SMALL_BODY_SIZE:
+            body = await self.read(self.reader.readexactly(size)) if size else b''
+            resp_header, resp_body = await self.run_in_executor(fp.proses_binary, header, body)
+        else:
+            feeder = BodyFeeder(self.reader, size, self.loop, self.server.read_timeout)
+            feed_task = asyncio.ensure_future(feeder.feed())
+            try:
+                resp_header, resp_body = await self.run_in_executor(fp.proses_binary, header, feeder.chunks())
+            finally:
+                if not feed_task.done():
+                    feed_task.cancel()
+                try:
+                    await feed_task
+                except asyncio.CancelledError:
+                    pass
+            await feeder.drain()
+        sent = await self.send_binary_response(resp_header, resp_body, header.get('sendfile', False))
+        fp.catat_request(header, time.perf_counter() - started, resp_header.get('status') == 'OK', size + sent)
+
+    async def send_binary_response(self, header, body, use_sendfile=False):
+        try:
+            size = body_size(body)
+            raw_header = encode_binary_header(header, size)
+            self.writer.write(raw_header)
+            if isinstance(body, (bytes, bytearray, memoryview)):
+                self.writer.write(body)
+            elif use_sendfile and hasattr(body, 'fileno'):
+                await self.writer.drain()
+                await self.loop.sendfile(self.writer.transport, body, body.tell(), size)
+            else:
+                while True:
+                    chunk = await self.run_in_executor(body.read, CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    self.writer.write(chunk)
+                    await self.writer.drain()
+            await self.writer.drain()
+            self.server.fp.metrics.add_bytes(bytes_out=len(raw_header) + size)
+            return len(raw_header) + size
+        finally:
+            if hasattr(body, 'close'):
+                body.close()
+
+
+class Server:
+    def __init__(self, ipaddress='0.0.0.0', port=45000, max_workers=5, max_message_size=MAX_MESSAGE_SIZE, metrics_port=None,
+                 max_connections=MAX_CONNECTIONS, max_inflight_bytes=MAX_INFLIGHT_BYTES, backlog=BACKLOG,
+                 idle_timeout=IDLE_TIMEOUT, read_timeout=READ_TIMEOUT):
+        self.ipinfo = (ipaddress, port)
+        self.max_message_size = max_message_size
+        # port endpoint HTTP /metrics (format Prometheus), None = tidak aktif
+        self.metrics_port = metrics_port
+        # byte pesan JSON lama dipesan bertahap selama dibaca, frame binary
+        # sekaligus dari size di header
+        self.admission = AdmissionControl(max_connections, max_inflight_bytes)
+        self.backlog = backlog
+        self.idle_timeout = idle_timeout
+        self.read_timeout = read_timeout
+        # executor hanya untuk I/O disk, koneksi dilayani oleh satu event loop
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        # jumlah pekerjaan executor yang belum selesai, hanya diubah dari
+        # thread event loop
+        self.pending = 0
+        self.fp = FileProtocol()
+        self.fp.metrics.register_gauge('executor_queue_depth', lambda: max(self.pending - self.executor._max_workers, 0))
+        self.fp.metrics.register_gauge('admission', self.admission.stats)
+        self.success_count = 0
+        self.fail_count = 0
+
+    def executor_done(self, future):
+        self.pending -= 1
+
+    async def handle_client(self, reader, writer):
+        logging.debug(f"Connection from {writer.get_extra_info('peername')}")
+        if not self.admission.try_connection():
+            writer.write(json.dumps(self.admission.busy('too many connections', close=True)).encode() + DELIMITER)
+            try:
+                await asyncio.wait_for(writer.drain(), self.read_timeout)
+            except Exception:
+                pass
+            writer.close()
+            return
+        try:
+            if await ProcessTheClient(self, reader, writer).process():
+                self.success_count += 1
+            else:
+                self.fail_count += 1
+        finally:
+            self.admission.release_connection()
+
+    async def serve(self):
+        server = await asyncio.start_server(self.handle_client, self.ipinfo[0], self.ipinfo[1],
+                                            limit=STREAM_LIMIT, backlog=self.backlog)
+        logging.warning(f"Server running on {self.ipinfo} with {self.executor._max_workers} workers")
+        if self.metrics_port:
+            serve_prometheus(self.fp.metrics, self.metrics_port, self.ipinfo[0])
+        async with server:
+            await server.serve_forever()
+
+    def run(self):
+        if uvloop is not None:
+            uvloop.install()
+        asyncio.run(self.serve())
+
+    def get_stats(self):
+        return {"success": self.success_count, "fail": self.fail_count}
+
+def main(max_workers=5, ipaddress='0.0.0.0', port=45000, metrics_port=None):
+    setup_logging()
+    svr = Server(ipaddress=ipaddress, port=port, max_workers=max_workers, metrics_port=metrics_port)
+    svr.run()
+
+if __name__ == "__main__":
+    import sys
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    metrics_port = int(sys.argv[2]) if len(sys.argv) > 2 else None
+    main(max_workers=workers, metrics_port=metrics_port)
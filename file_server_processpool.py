@@ -1,82 +1,401 @@
 import socket
 import logging
-from concurrent.futures import ProcessPoolExecutor
+import selectors
+import struct
 from file_protocol import FileProtocol
+from file_framing import FrameReader, send_binary_response, send_json_response, MAX_MESSAGE_SIZE
+from file_autoscale import PoolStats, ScalingPolicy, request_class, SCALE_INTERVAL, BULK_WORKER_MEMORY, BUSY, QUEUED, GROWN, SHRUNK
+from file_metrics import serve_prometheus
+from file_admission import AdmissionControl, reject_connection, send_busy, MAX_CONNECTIONS, MAX_INFLIGHT_BYTES, BACKLOG, IDLE_TIMEOUT, READ_TIMEOUT
+from file_logging import setup_logging, setup_logging_after_fork
 import multiprocessing
-import json
+import time
+
+"""
+* server ini memakai proses worker yang di-fork (pre-fork) dalam dua
+kelompok yang jumlahnya diatur otomatis oleh proses utama (lihat
+file_autoscale): worker small dan worker bulk
+
+* socket listening dibuat oleh proses utama lalu diwariskan ke worker
+small, masing-masing worker small menjalankan loop accept/serve sendiri
+sehingga encode/decode yang berat di CPU tersebar ke beberapa core
+
+* koneksi keep-alive yang menunggu request berikutnya tidak menahan
+worker small: koneksi diparkir di selector worker (bersama socket
+listening dan channel handoff) dan baru dilayani saat datanya masuk,
+yang diam lebih dari idle_timeout ditutup; worker yang diminta berhenti
+menyerahkan koneksi parkirnya ke worker small lain
+
+* worker small mengenali perintah setiap request tanpa membacanya
+(FrameReader.peek_command); request bulk (GET, UPLOAD, ...) diserahkan ke
+worker bulk dengan mengirim file descriptor koneksi lewat socket unix
+(send_fds), lalu setelah request selesai koneksi dikembalikan ke kelompok
+small dengan cara yang sama, sehingga LIST/DELETE tidak antri di belakang
+transfer besar
+
+* proses utama menambah/mengurangi worker setiap SCALE_INTERVAL dari
+antrian accept di kernel (kelompok small), jumlah koneksi yang menunggu
+diserahkan (kelompok bulk) dan waktu tunggunya; worker yang dikurangi
+diminta berhenti lewat pesan 'q', worker yang mati karena error dijalankan
+ulang
+
+* metrics (perintah STATS) dicatat per worker, karena setiap worker punya
+FileProtocol sendiri; endpoint Prometheus worker slot ke-i ada di
+metrics_port + i (slot small dulu, lalu bulk)
+"""
+
+MIN_WORKERS = 2
+BULK_MIN_WORKERS = 1
+
+# pesan di socket handoff: jenis (c = koneksi, q = berhenti) + waktu kirim
+HANDOFF = struct.Struct('!cd')
+# offset tcpi_unacked di struct tcp_info, untuk socket LISTEN berisi
+# jumlah koneksi di antrian accept
+TCPI_UNACKED = struct.Struct('=I')
+TCPI_UNACKED_OFFSET = 24
+
+class ProcessTheClient:
+    def __init__(self, connection, address, fp, max_message_size=MAX_MESSAGE_SIZE, admission=None,
+                 idle_timeout=None, read_timeout=None):
+        self.connection = connection
+        self.address = address
+        self.fp = fp
+        self.max_message_size = max_message_size
+        self.admission = admission or AdmissionControl(0, 0)
+        self.idle_timeout = idle_timeout
+        self.read_timeout = read_timeout
+        self.reader = FrameReader(self.connection, recv_size=1024*1024, max_message_size=self.max_message_size, metrics=self.fp.metrics,
+                                  admission=self.admission, idle_timeout=self.idle_timeout, read_timeout=self.read_timeout)
+        self.fp.metrics.connection_opened()
+
+    def serve_one(self):
+        """layani satu pesan, hasil: False jika koneksi sudah ditutup client"""
+        message = self.reader.read_message()
+        if message is None:
+            return False
+        if message[0] == 'busy':
+            send_busy(self.connection, message, self.admission.busy('too many bytes in flight'), self.fp.metrics)
+        elif message[0] == 'binary':
+            started = time.perf_counter()
+            header, body = self.fp.proses_binary(message[1], message[2])
+            message[2].drain()
+            sent = send_binary_response(self.connection, header, body, use_sendfile=message[1].get('sendfile', False),
+                                        metrics=self.fp.metrics)
+            self.fp.catat_request(message[1], time.perf_counter() - started, header.get('status') == 'OK',
+                                  message[2].size + sent)
+        else:
+            send_json_response(self.connection, self.fp.proses_string_stream(message[1]), self.fp.metrics)
+        return True
+
+    def hand_off(self, channel, stats):
+        """
+        kirim koneksi ke kelompok worker lain lewat channel; hasil False
+        jika antrian channel penuh (koneksi tetap dilayani di sini)
+        """
+        try:
+            socket.send_fds(channel, [HANDOFF.pack(b'c', time.monotonic())], [self.connection.fileno()],
+                            socket.MSG_DONTWAIT)
+        except BlockingIOError:
+            return False
+        stats.add(QUEUED)
+        # fd sudah diduplikasi ke penerima, salinan di proses ini ditutup
+        # tanpa melepas slot admission koneksi
+        self.reader.release()
+        self.connection.close()
+        self.fp.metrics.connection_closed()
+        return True
+
+    def close(self):
+        self.reader.release()
+        self.connection.close()
+        self.admission.release_connection()
+        self.fp.metrics.connection_closed()
+
+
+class Worker:
+    """satu proses worker (small atau bulk), semua state diwariskan lewat fork"""
+    def __init__(self, server, group):
+        self.server = server
+        self.group = group
+        self.stats = server.stats[group]
+        self.fp = None
+        # selector koneksi idle, hanya dipakai worker small
+        self.selector = None
+
+    def run(self, metrics_port=None):
+        # thread listener logging tidak ikut ter-fork, pasang ulang di worker
+        setup_logging_after_fork()
+        # satu FileProtocol per proses worker, dipakai ulang untuk semua koneksi
+        self.fp = FileProtocol()
+        self.fp.metrics.register_gauge('admission', self.server.admission.stats)
+        self.fp.metrics.register_gauge('small_pool', self.server.stats['small'].snapshot)
+        self.fp.metrics.register_gauge('bulk_pool', self.server.stats['bulk'].snapshot)
+        if metrics_port:
+            serve_prometheus(self.fp.metrics, metrics_port, self.server.ipinfo[0])
+        if self.group == 'small':
+            self._small_loop()
+        else:
+            self._bulk_loop()
+
+    def _client(self, connection, address):
+        server = self.server
+        return ProcessTheClient(connection, address, self.fp, server.max_message_size, server.admission,
+                                server.idle_timeout, server.read_timeout)
+
+    def _receive(self, channel, flags=0):
+        # hasil: (koneksi, address), 'quit', atau None jika tidak ada pesan
+        try:
+            msg, fds, _, _ = socket.recv_fds(channel, HANDOFF.size, 1, flags)
+        except BlockingIOError:
+            return None
+        kind, sent_at = HANDOFF.unpack(msg)
+        if kind == b'q':
+            return 'quit'
+        self.stats.add(QUEUED, -1)
+        self.stats.observe(wait=time.monotonic() - sent_at)
+        connection = socket.socket(fileno=fds[0])
+        try:
+            address = connection.getpeername()
+        except OSError:
+            address = None
+        return connection, address
+
+    def _small_loop(self):
+        server = self.server
+        channel = server.small_channel[1]
+        self.selector = selectors.DefaultSelector()
+        # data None menandai socket listening dan channel, selain itu koneksi parkir
+        self.selector.register(server.my_socket, selectors.EVENT_READ)
+        self.selector.register(channel, selectors.EVENT_READ)
+        last_sweep = time.monotonic()
+        while True:
+            for key, _ in self.selector.select(timeout=1 if server.idle_timeout else None):
+                if key.fileobj is channel:
+                    received = self._receive(channel, socket.MSG_DONTWAIT)
+                    if received == 'quit':
+                        self._hand_back()
+                        return
+                    if received is not None:
+                        self._park(self._client(*received))
+                elif key.fileobj is server.my_socket:
+                    self._accept()
+                else:
+                    self.selector.unregister(key.fileobj)
+                    self._serve(key.data)
+            now = time.monotonic()
+            if server.idle_timeout and now - last_sweep >= 1:
+                last_sweep = now
+                for key in list(self.selector.get_map().values()):
+                    if key.data is not None and now - key.data.idle_since > server.idle_timeout:
+                        self.selector.unregister(key.fileobj)
+                        self._finish(key.data, True)
+
+    def _accept(self):
+        server = self.server
+        # socket listening non-blocking: worker lain bisa lebih dulu
+        # mengambil koneksi yang sama
+        try:
+            connection, client_address = server.my_socket.accept()
+        except BlockingIOError:
+            return
+        connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        logging.debug(f"Connection from {client_address} in worker {multiprocessing.current_process().name}")
+        if not server.admission.try_connection():
+            reject_connection(connection, server.admission.busy('too many connections', close=True))
+            return
+        self._park(self._client(connection, client_address))
+
+    def _park(self, client):
+        # tunggu request berikutnya di selector, bukan dengan recv yang memblok
+        client.idle_since = time.monotonic()
+        self.selector.register(client.connection, selectors.EVENT_READ, client)
+
+    def _hand_back(self):
+        # worker berhenti: koneksi parkir diserahkan ke worker small lain
+        server = self.server
+        for key in list(self.selector.get_map().values()):
+            if key.data is None:
+                continue
+            self.selector.unregister(key.fileobj)
+            if not key.data.hand_off(server.small_channel[0], server.stats['small']):
+                self._finish(key.data, True)
+        self.selector.close()
+
+    def _bulk_loop(self):
+        channel = self.server.bulk_channel[1]
+        while True:
+            received = self._receive(channel)
+            if received == 'quit':
+                return
+            if received is not None:
+                self._serve(self._client(*received))
+
+    def _serve(self, client):
+        """
+        layani koneksi sampai ditutup, diparkir atau diserahkan ke kelompok
+        lain: worker small memarkir koneksi yang buffer-nya sudah kosong dan
+        menyerahkan request bulk ke worker bulk, worker bulk mengembalikan
+        koneksi ke worker small setelah request selesai; request yang sudah
+        terbaca sebagian (ada di buffer) selalu dilayani di sini
+        """
+        server = self.server
+        self.stats.add(BUSY)
+        served = False
+        try:
+            while True:
+                if served and not client.reader.buffered():
+                    if self.group == 'small':
+                        self._park(client)
+                        return
+                    if client.hand_off(server.small_channel[0], server.stats['small']):
+                        return
+                command = client.reader.peek_command()
+                if command is None:
+                    self._finish(client, True)
+                    return
+                if (self.group == 'small' and request_class(command) == 'bulk' and not client.reader.buffered()
+                        and client.hand_off(server.bulk_channel[0], server.stats['bulk'])):
+                    return
+                started = time.monotonic()
+                if not client.serve_one():
+                    self._finish(client, True)
+                    return
+                self.stats.observe(latency=time.monotonic() - started)
+                served = True
+        except Exception as e:
+            logging.warning(f"Error processing client {client.address}: {e}")
+            self._finish(client, False)
+        finally:
+            self.stats.add(BUSY, -1)
+
+    def _finish(self, client, ok):
+        client.close()
+        count = self.server.success_count if ok else self.server.fail_count
+        with count.get_lock():
+            count.value += 1
 
-def process_client_data(message):
-    fp = FileProtocol()
-    try:
-        result = fp.proses_string(message)
-        return result
-    except Exception as e:
-        logging.warning(f"Error processing message: {e}")
-        return json.dumps(dict(status='ERROR', data=str(e)))
 
 class Server:
-    def __init__(self, ipaddress='0.0.0.0', port=45000, max_workers=5):
+    def __init__(self, ipaddress='0.0.0.0', port=45000, max_workers=5, max_message_size=MAX_MESSAGE_SIZE, metrics_port=None,
+                 max_connections=MAX_CONNECTIONS, max_inflight_bytes=MAX_INFLIGHT_BYTES, backlog=BACKLOG,
+                 idle_timeout=IDLE_TIMEOUT, read_timeout=READ_TIMEOUT, min_workers=MIN_WORKERS,
+                 bulk_min_workers=BULK_MIN_WORKERS, bulk_max_workers=None):
         self.ipinfo = (ipaddress, port)
+        # max_workers adalah batas atas kelompok small (dan bulk jika
+        # bulk_max_workers tidak diberikan)
+        self.max_workers = max_workers
+        bulk_max_workers = bulk_max_workers or max_workers
+        self.policies = dict(small=ScalingPolicy(min(min_workers, max_workers), max_workers),
+                             bulk=ScalingPolicy(min(bulk_min_workers, bulk_max_workers), bulk_max_workers,
+                                                BULK_WORKER_MEMORY))
+        self.max_message_size = max_message_size
+        self.metrics_port = metrics_port
+        # counter admission di shared memory, dipakai bersama semua worker;
+        # koneksi yang dihitung termasuk yang diparkir di worker small
+        self.admission = AdmissionControl(max_connections, max_inflight_bytes, shared=True)
+        self.backlog = backlog
+        self.idle_timeout = idle_timeout
+        self.read_timeout = read_timeout
         self.my_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self.my_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        self.executor = ProcessPoolExecutor(max_workers=max_workers)
+        # channel[0] untuk mengirim, channel[1] dibaca worker kelompok tsb
+        self.small_channel = socket.socketpair(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.bulk_channel = socket.socketpair(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.stats = dict(small=PoolStats(shared=True), bulk=PoolStats(shared=True))
+        self.workers = dict(small={}, bulk={})
+        # worker yang sudah dikirimi pesan 'q' tapi belum berhenti
+        self.quitting = dict(small=0, bulk=0)
         self.success_count = multiprocessing.Value('i', 0)
         self.fail_count = multiprocessing.Value('i', 0)
 
+    def _slot(self, group):
+        # slot menentukan port metrics worker, slot yang sudah kosong dipakai ulang
+        base = 0 if group == 'small' else self.policies['small'].max_workers
+        used = self.workers[group]
+        return next(base + i for i in range(len(used) + 1) if base + i not in used)
+
+    def _start_worker(self, group):
+        slot = self._slot(group)
+        worker = multiprocessing.Process(
+            target=Worker(self, group).run,
+            args=(self.metrics_port + slot if self.metrics_port else None,),
+            name=f"{group}-worker-{slot}",
+            daemon=True,
+        )
+        worker.start()
+        self.workers[group][slot] = worker
+
+    def _stop_worker(self, group):
+        channel = self.small_channel if group == 'small' else self.bulk_channel
+        socket.send_fds(channel[0], [HANDOFF.pack(b'q', time.monotonic())], [])
+        self.quitting[group] += 1
+
+    def _accept_queue(self):
+        try:
+            info = self.my_socket.getsockopt(socket.IPPROTO_TCP, socket.TCP_INFO, 104)
+            return TCPI_UNACKED.unpack_from(info, TCPI_UNACKED_OFFSET)[0]
+        except (OSError, AttributeError, struct.error):
+            return 0
+
+    def _reap(self, group):
+        for slot, worker in list(self.workers[group].items()):
+            if worker.is_alive():
+                continue
+            del self.workers[group][slot]
+            if worker.exitcode == 0 and self.quitting[group]:
+                self.quitting[group] -= 1
+            else:
+                logging.warning(f"{worker.name} exited with code {worker.exitcode}, restarting")
+                self._start_worker(group)
+
+    def _scale(self, group):
+        self._reap(group)
+        stats = self.stats[group]
+        workers = len(self.workers[group]) - self.quitting[group]
+        queued = int(stats.get(QUEUED))
+        if group == 'small':
+            queued += self._accept_queue()
+        target = self.policies[group].target(workers, int(stats.get(BUSY)), queued, stats.take_wait())
+        for _ in range(target - workers):
+            stats.add(GROWN)
+            self._start_worker(group)
+        for _ in range(workers - target):
+            stats.add(SHRUNK)
+            self._stop_worker(group)
+        stats.set_workers(target)
+
     def run(self):
-        logging.warning(f"Server running on {self.ipinfo} with {self.executor._max_workers} workers")
+        logging.warning(f"Server running on {self.ipinfo} with {self.policies['small'].min_workers}-{self.max_workers} "
+                        f"small and {self.policies['bulk'].min_workers}-{self.policies['bulk'].max_workers} bulk workers")
         self.my_socket.bind(self.ipinfo)
-        self.my_socket.listen(50)
-        while True:
-            connection, client_address = self.my_socket.accept()
-            logging.warning(f"Connection from {client_address}")
-            try:
-                buffer = ""
-                while True:
-                    data = connection.recv(1024*1024)
-                    if not data:
-                        break
-                    buffer += data.decode('utf-8', errors='ignore')
-                    while "\r\n\r\n" in buffer:
-                        message, buffer = buffer.split("\r\n\r\n", 1)
-                        if message.strip():
-                            try:
-                                json.loads(message)
-                                future = self.executor.submit(process_client_data, message)
-                                future.add_done_callback(lambda f: self._handle_result(f, connection))
-                            except json.JSONDecodeError as e:
-                                logging.warning(f"Invalid JSON from {client_address}: {e}")
-                                error_response = json.dumps(dict(status='ERROR', data=f"Invalid JSON: {e}"))
-                                connection.sendall((error_response + "\r\n\r\n").encode())
-                                with self.fail_count.get_lock():
-                                    self.fail_count.value += 1
-            except Exception as e:
-                logging.warning(f"Error handling client {client_address}: {e}")
-                with self.fail_count.get_lock():
-                    self.fail_count.value += 1
-            finally:
-                connection.close()
-
-    def _handle_result(self, future, connection):
+        self.my_socket.listen(self.backlog)
+        self.my_socket.setblocking(False)
+        for group, policy in self.policies.items():
+            for _ in range(policy.min_workers):
+                self._start_worker(group)
+            self.stats[group].set_workers(policy.min_workers)
         try:
-            result = future.result()
-            result += "\r\n\r\n"
-            connection.sendall(result.encode())
-            with self.success_count.get_lock():
-                self.success_count.value += 1
-        except Exception as e:
-            logging.warning(f"Error in future result: {e}")
-            with self.fail_count.get_lock():
-                self.fail_count.value += 1
+            while True:
+                time.sleep(SCALE_INTERVAL)
+                for group in self.policies:
+                    self._scale(group)
+        finally:
+            for group in self.workers.values():
+                for worker in group.values():
+                    worker.terminate()
+            self.my_socket.close()
 
     def get_stats(self):
         return {"success": self.success_count.value, "fail": self.fail_count.value}
 
-def main(max_workers=5):
-    svr = Server(max_workers=max_workers)
+def main(max_workers=5, metrics_port=None):
+    setup_logging()
+    svr = Server(max_workers=max_workers, metrics_port=metrics_port)
     svr.run()
 
 if __name__ == "__main__":
     import sys
+    # batas atas worker per kelompok, jumlah sebenarnya diatur otomatis
     workers = int(sys.argv[1]) if len(sys.argv) > 1 else 5
-    main(max_workers=workers)
\ No newline at end of file
+    metrics_port = int(sys.argv[2]) if len(sys.argv) > 2 else None
+    main(max_workers=workers, metrics_port=metrics_port)
@@ -1,68 +1,232 @@
 import socket
 import logging
-from concurrent.futures import ThreadPoolExecutor
+import queue
+import selectors
+import threading
+import time
 from file_protocol import FileProtocol
+from file_framing import FrameReader, send_binary_response, send_json_response, MAX_MESSAGE_SIZE
+from file_autoscale import AutoscalingPool, ScalingPolicy, request_class, BULK_WORKER_MEMORY
+from file_metrics import serve_prometheus
+from file_admission import AdmissionControl, reject_connection, send_busy, MAX_CONNECTIONS, MAX_INFLIGHT_BYTES, BACKLOG, IDLE_TIMEOUT, READ_TIMEOUT
+from file_logging import setup_logging
+
+"""
+* koneksi dilayani per request oleh dua pool thread yang jumlah threadnya
+diatur otomatis (lihat file_autoscale): request kecil (LIST, DELETE, ...)
+di pool small dan transfer isi file (GET, UPLOAD, ...) di pool bulk, jadi
+request kecil tidak antri di belakang transfer besar
+
+* koneksi keep-alive yang sedang menunggu request berikutnya tidak memakan
+worker: koneksi diawasi satu thread dengan selector (_IdlePoller) dan baru
+diserahkan ke pool saat data request berikutnya masuk
+
+* max_workers adalah batas atas pool small (dan pool bulk jika
+bulk_max_workers tidak diberikan); pool bulk juga dibatasi sisa memori
+"""
+
+MIN_WORKERS = 2
+MAX_WORKERS = 64
+BULK_MIN_WORKERS = 1
 
 class ProcessTheClient:
-    def __init__(self, connection, address):
+    def __init__(self, connection, address, fp, max_message_size=MAX_MESSAGE_SIZE, admission=None,
+                 idle_timeout=None, read_timeout=None):
         self.connection = connection
         self.address = address
-        self.fp = FileProtocol()
+        self.fp = fp
+        self.max_message_size = max_message_size
+        self.admission = admission or AdmissionControl(0, 0)
+        self.idle_timeout = idle_timeout
+        self.read_timeout = read_timeout
+        self.reader = FrameReader(self.connection, max_message_size=self.max_message_size, metrics=self.fp.metrics,
+                                  admission=self.admission, idle_timeout=self.idle_timeout, read_timeout=self.read_timeout)
+        self.idle_since = time.monotonic()
+        self.fp.metrics.connection_opened()
 
-    def process(self):
-        buffer = ""
-        try:
-            while True:
-                data = self.connection.recv(8192)
-                if not data:
-                    break
-                buffer += data.decode()
-                while "\r\n\r\n" in buffer:
-                    message, buffer = buffer.split("\r\n\r\n", 1)
-                    result = self.fp.proses_string(message)
-                    result += "\r\n\r\n"
-                    self.connection.sendall(result.encode())
-            return True
-        except Exception as e:
-            logging.warning(f"Error processing client {self.address}: {e}")
+    def serve_one(self):
+        """layani satu pesan, hasil: False jika koneksi sudah ditutup client"""
+        message = self.reader.read_message()
+        if message is None:
             return False
-        finally:
-            self.connection.close()
+        if message[0] == 'busy':
+            send_busy(self.connection, message, self.admission.busy('too many bytes in flight'), self.fp.metrics)
+        elif message[0] == 'binary':
+            started = time.perf_counter()
+            header, body = self.fp.proses_binary(message[1], message[2])
+            message[2].drain()
+            sent = send_binary_response(self.connection, header, body, use_sendfile=message[1].get('sendfile', False),
+                                        metrics=self.fp.metrics)
+            self.fp.catat_request(message[1], time.perf_counter() - started, header.get('status') == 'OK',
+                                  message[2].size + sent)
+        else:
+            send_json_response(self.connection, self.fp.proses_string_stream(message[1]), self.fp.metrics)
+        return True
+
+    def close(self):
+        self.reader.release()
+        self.connection.close()
+        self.admission.release_connection()
+        self.fp.metrics.connection_closed()
+
+
+class _IdlePoller:
+    """
+    mengawasi koneksi keep-alive yang menunggu request berikutnya dengan
+    satu selector; koneksi yang siap dibaca diserahkan ke on_ready, koneksi
+    yang diam lebih dari idle_timeout diserahkan ke on_timeout
+    """
+    def __init__(self, on_ready, on_timeout, idle_timeout=None):
+        self.on_ready = on_ready
+        self.on_timeout = on_timeout
+        self.idle_timeout = idle_timeout
+        self.selector = selectors.DefaultSelector()
+        # selector hanya disentuh thread poller, koneksi baru lewat antrian
+        self.pending = queue.SimpleQueue()
+        self.wake_r, self.wake_w = socket.socketpair()
+        self.wake_r.setblocking(False)
+        self.wake_w.setblocking(False)
+        self.selector.register(self.wake_r, selectors.EVENT_READ)
+        threading.Thread(target=self._loop, name='idle-poller', daemon=True).start()
+
+    def watch(self, client):
+        client.idle_since = time.monotonic()
+        self.pending.put(client)
+        try:
+            self.wake_w.send(b'x')
+        except BlockingIOError:
+            # poller sudah pasti terbangun
+            pass
+
+    def _loop(self):
+        last_sweep = time.monotonic()
+        while True:
+            for key, _ in self.selector.select(timeout=1 if self.idle_timeout else None):
+                if key.fileobj is self.wake_r:
+                    try:
+                        while self.wake_r.recv(4096):
+                            pass
+                    except BlockingIOError:
+                        pass
+                    continue
+                self.selector.unregister(key.fileobj)
+                self.on_ready(key.data)
+            while not self.pending.empty():
+                client = self.pending.get()
+                self.selector.register(client.connection, selectors.EVENT_READ, client)
+            now = time.monotonic()
+            if self.idle_timeout and now - last_sweep >= 1:
+                last_sweep = now
+                for key in list(self.selector.get_map().values()):
+                    if key.data is not None and now - key.data.idle_since > self.idle_timeout:
+                        self.selector.unregister(key.fileobj)
+                        self.on_timeout(key.data)
+
 
 class Server:
-    def __init__(self, ipaddress='0.0.0.0', port=45000, max_workers=5):
+    def __init__(self, ipaddress='0.0.0.0', port=45000, max_workers=MAX_WORKERS, max_message_size=MAX_MESSAGE_SIZE, metrics_port=None,
+                 max_connections=MAX_CONNECTIONS, max_inflight_bytes=MAX_INFLIGHT_BYTES, backlog=BACKLOG,
+                 idle_timeout=IDLE_TIMEOUT, read_timeout=READ_TIMEOUT, min_workers=MIN_WORKERS,
+                 bulk_min_workers=BULK_MIN_WORKERS, bulk_max_workers=None):
         self.ipinfo = (ipaddress, port)
+        self.max_message_size = max_message_size
+        # port endpoint HTTP /metrics (format Prometheus), None = tidak aktif
+        self.metrics_port = metrics_port
+        # koneksi yang dihitung termasuk yang idle dan yang antri menunggu
+        # worker, sehingga antrian pool juga terbatas
+        self.admission = AdmissionControl(max_connections, max_inflight_bytes)
+        self.backlog = backlog
+        self.idle_timeout = idle_timeout
+        self.read_timeout = read_timeout
         self.my_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self.my_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.small = AutoscalingPool('small', ScalingPolicy(min(min_workers, max_workers), max_workers))
+        bulk_max_workers = bulk_max_workers or max_workers
+        self.bulk = AutoscalingPool('bulk', ScalingPolicy(min(bulk_min_workers, bulk_max_workers), bulk_max_workers,
+                                                          BULK_WORKER_MEMORY))
+        self.poller = _IdlePoller(self._dispatch, lambda client: self._finish(client, True), idle_timeout)
+        # satu FileProtocol dipakai bersama semua koneksi agar cache file
+        # juga dipakai bersama
+        self.fp = FileProtocol()
+        self.fp.metrics.register_gauge('small_pool', self.small.stats.snapshot)
+        self.fp.metrics.register_gauge('bulk_pool', self.bulk.stats.snapshot)
+        self.fp.metrics.register_gauge('admission', self.admission.stats)
         self.success_count = 0
         self.fail_count = 0
+        # koneksi selesai di thread worker, counter harus dikunci
+        self.count_lock = threading.Lock()
 
     def run(self):
-        logging.warning(f"Server running on {self.ipinfo} with {self.executor._max_workers} workers")
+        logging.warning(f"Server running on {self.ipinfo} with {self.small.policy.min_workers}-{self.small.policy.max_workers} "
+                        f"small and {self.bulk.policy.min_workers}-{self.bulk.policy.max_workers} bulk workers")
         self.my_socket.bind(self.ipinfo)
-        self.my_socket.listen(50)
+        self.my_socket.listen(self.backlog)
+        if self.metrics_port:
+            serve_prometheus(self.fp.metrics, self.metrics_port, self.ipinfo[0])
         while True:
             connection, client_address = self.my_socket.accept()
-            logging.warning(f"Connection from {client_address}")
-            client_handler = ProcessTheClient(connection, client_address)
-            future = self.executor.submit(client_handler.process)
-            future.add_done_callback(self._handle_result)
-
-    def _handle_result(self, future):
-        if future.result():
-            self.success_count += 1
+            connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            logging.debug(f"Connection from {client_address}")
+            if not self.admission.try_connection():
+                reject_connection(connection, self.admission.busy('too many connections', close=True))
+                continue
+            client = ProcessTheClient(connection, client_address, self.fp, self.max_message_size,
+                                      self.admission, self.idle_timeout, self.read_timeout)
+            self._dispatch(client)
+
+    def _dispatch(self, client):
+        # koneksi siap dibaca: perintah berikutnya dikenali di pool small
+        self.small.submit(self._route, client)
+
+    def _route(self, client):
+        try:
+            command = client.reader.peek_command()
+        except Exception as e:
+            logging.warning(f"Error processing client {client.address}: {e}")
+            self._finish(client, False)
+            return
+        if command is None:
+            self._finish(client, True)
+        elif request_class(command) == 'bulk':
+            self.bulk.submit(self._serve, client)
+        else:
+            self._serve(client)
+
+    def _serve(self, client):
+        try:
+            if not client.serve_one():
+                self._finish(client, True)
+                return
+        except Exception as e:
+            logging.warning(f"Error processing client {client.address}: {e}")
+            self._finish(client, False)
+            return
+        if client.reader.buffered():
+            # request berikutnya sudah ada di buffer (pipelining)
+            self._dispatch(client)
         else:
-            self.fail_count += 1
+            self.poller.watch(client)
+
+    def _finish(self, client, ok):
+        client.close()
+        with self.count_lock:
+            if ok:
+                self.success_count += 1
+            else:
+                self.fail_count += 1
 
     def get_stats(self):
-        return {"success": self.success_count, "fail": self.fail_count}
+        with self.count_lock:
+            return {"success": self.success_count, "fail": self.fail_count}
 
-def main(max_workers=5):
-    svr = Server(max_workers=max_workers)
+def main(max_workers=MAX_WORKERS, metrics_port=None):
+    setup_logging()
+    svr = Server(max_workers=max_workers, metrics_port=metrics_port)
     svr.run()
 
 if __name__ == "__main__":
     import sys
-    workers = int(sys.argv[1]) if len(sys.argv) > 1 else 5
-    main(max_workers=workers)
\ No newline at end of file
+    # batas atas worker, jumlah sebenarnya diatur otomatis
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else MAX_WORKERS
+    metrics_port = int(sys.argv[2]) if len(sys.argv) > 2 else None
+    main(max_workers=workers, metrics_port=metrics_port)
\ No newline at end of file
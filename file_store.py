@@ -0,0 +1,302 @@
+import hashlib
+import os
+import re
+import threading
+import uuid
+from contextlib import nullcontext
+
+from file_atomic import write_temp, sync_file, sync_dir
+
+"""
+* class ContentStore adalah backend penyimpanan content-addressed: isi
+file disimpan sekali sebagai blob bernama SHA-256 isinya di
+files/.blobs/<2 huruf awal>/<sha256>, dan files/<filename> hanyalah
+symlink ke blob tersebut
+
+* symlink berperan sebagai index nama file -> hash: tersimpan di disk,
+diganti secara atomik (os.replace) dan langsung terlihat oleh semua
+thread maupun proses worker, sementara GET, GET_RANGE, sendfile dan LIST
+tetap bekerja karena open/stat mengikuti symlink
+
+* upload dengan isi yang sudah ada (hash sama) tidak menulis blob baru,
+cukup membuat symlink; HAS <sha256> memungkinkan client mengecek blob
+lebih dulu sehingga transfer bisa dilewati sama sekali
+
+* blob yang sudah tidak dirujuk nama file mana pun dihapus saat file
+ditimpa atau di-DELETE. Cek dan hapus dilakukan di bawah write lock per
+blob (FileLocks dengan path blob, berlaku antar proses) yang juga dipegang
+saat symlink baru ke blob itu dibuat, sehingga blob tidak pernah hilang
+sesaat selama masih dirujuk: GET nama lain yang berbagi blob tetap jalan,
+dan upload bersamaan dengan isi yang sama tidak kehilangan isinya
+
+* untuk mengecek apakah blob masih dirujuk, setiap symlink dicatat di
+index balik .blobs/refs/<2 huruf awal>/<sha256>/<hash path> yang berisi
+path symlink; cek cukup membaca entry hash tersebut (bukan menelusuri
+seluruh files/), dan setiap entry diverifikasi ke symlink-nya sehingga
+entry yang tertinggal (misalnya karena crash) tidak menahan blob dan ikut
+dihapus bersama blob. Index
+dibangun sekali dari disk jika belum ada (store lama), dan entry
+dipindah saat migrasi susunan direktori memindah symlink
+"""
+
+SHA256_PATTERN = re.compile(r'^[0-9a-f]{64}$')
+BLOB_DIR = '.blobs'
+REFS_DIR = 'refs'
+# penanda index balik sudah lengkap dibangun dari disk
+REFS_COMPLETE = '.complete'
+
+
+class ChecksumMismatch(ValueError):
+    pass
+
+
+class ContentStore:
+    def __init__(self, files_dir, fsync='none', locks=None):
+        self.files_dir = files_dir
+        self.fsync = fsync
+        # FileLocks milik FileInterface, dipakai saat memetakan nama file
+        self.locks = locks
+        self.blobs_dir = os.path.join(files_dir, BLOB_DIR)
+        self.tmp_dir = os.path.join(self.blobs_dir, 'tmp')
+        os.makedirs(self.tmp_dir, exist_ok=True)
+        self.refs_dir = os.path.join(self.blobs_dir, REFS_DIR)
+        self.lock = threading.Lock()
+        self.dedup_hits = 0
+        self.dedup_bytes = 0
+        if not os.path.exists(os.path.join(self.refs_dir, REFS_COMPLETE)):
+            self.rebuild_refs()
+
+    def blob_path(self, digest):
+        if not SHA256_PATTERN.match(str(digest)):
+            raise ValueError(f'Invalid sha256 {digest}')
+        return os.path.join(self.blobs_dir, digest[:2], digest)
+
+    def has(self, digest):
+        return os.path.exists(self.blob_path(digest))
+
+    def digest_of(self, file_path):
+        # hash diambil dari target symlink, None jika bukan file CAS
+        try:
+            target = os.readlink(file_path)
+        except OSError:
+            return None
+        digest = os.path.basename(target)
+        return digest if SHA256_PATTERN.match(digest) else None
+
+    def _ref_path(self, digest, file_path):
+        rel = os.path.relpath(file_path, self.files_dir)
+        key = hashlib.blake2b(os.fsencode(rel), digest_size=16).hexdigest()
+        return os.path.join(self.refs_dir, digest[:2], digest, key), rel
+
+    def _add_ref(self, digest, file_path):
+        ref, rel = self._ref_path(digest, file_path)
+        while True:
+            os.makedirs(os.path.dirname(ref), exist_ok=True)
+            try:
+                fd = os.open(ref, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+                break
+            except FileNotFoundError:
+                # direktori hash dihapus release() bersamaan, buat ulang
+                continue
+        try:
+            os.write(fd, os.fsencode(rel))
+            sync_file(fd, self.fsync)
+        finally:
+            os.close(fd)
+        sync_dir(os.path.dirname(ref), self.fsync)
+
+    def _drop_ref(self, digest, file_path):
+        try:
+            os.remove(self._ref_path(digest, file_path)[0])
+        except FileNotFoundError:
+            pass
+
+    def rebuild_refs(self):
+        """bangun index balik dari semua symlink di files/"""
+        for root, dirs, files in os.walk(self.files_dir):
+            dirs[:] = [d for d in dirs if not d.startswith('.')]
+            for name in files:
+                file_path = os.path.join(root, name)
+                digest = self.digest_of(file_path)
+                if digest is not None:
+                    with self._locked(self.blob_path(digest)):
+                        self._add_ref(digest, file_path)
+        os.makedirs(self.refs_dir, exist_ok=True)
+        open(os.path.join(self.refs_dir, REFS_COMPLETE), 'w').close()
+
+    def moved(self, old_path, file_path):
+        # symlink dipindah ke path lain (migrasi susunan direktori)
+        digest = self.digest_of(file_path)
+        if digest is not None:
+            with self._locked(self.blob_path(digest)):
+                self._add_ref(digest, file_path)
+            self._drop_ref(digest, old_path)
+
+    def _locked(self, file_path):
+        return self.locks.write(file_path) if self.locks is not None else nullcontext()
+
+    def open(self, file_path):
+        """
+        hasil: (file object, sha256); blob dibuka langsung sehingga isi
+        yang dibaca selalu cocok dengan hash walaupun file ditimpa
+        """
+        digest = self.digest_of(file_path)
+        if digest is None:
+            return open(file_path, 'rb'), None
+        return open(self.blob_path(digest), 'rb'), digest
+
+    def _bind(self, file_path, digest):
+        # ganti file_path dengan symlink ke blob secara atomik, hasil: hash
+        # blob lama yang sebelumnya dirujuk file_path; dipanggil di bawah
+        # lock nama file dan lock blob, entry index balik dibuat sebelum
+        # symlink dan entry lama dihapus sesudahnya
+        old = self.digest_of(file_path)
+        self._add_ref(digest, file_path)
+        target = os.path.relpath(self.blob_path(digest), os.path.dirname(file_path))
+        link_path = os.path.join(os.path.dirname(file_path),
+                                 f'.{os.path.basename(file_path)}.{uuid.uuid4().hex}.link')
+        os.symlink(target, link_path)
+        try:
+            os.replace(link_path, file_path)
+        except:
+            os.remove(link_path)
+            raise
+        sync_dir(os.path.dirname(file_path), self.fsync)
+        if old is not None and old != digest:
+            self._drop_ref(old, file_path)
+        return old
+
+    def _install(self, tmp_path, digest):
+        # True jika blob baru dipasang, False jika blob sudah ada
+        blob = self.blob_path(digest)
+        os.makedirs(os.path.dirname(blob), exist_ok=True)
+        try:
+            os.link(tmp_path, blob)
+            sync_dir(os.path.dirname(blob), self.fsync)
+            return True
+        except FileExistsError:
+            return False
+
+    def _put_tmp(self, file_path, tmp_path, digest, size):
+        # urutan lock selalu nama file lalu blob, release() hanya memegang
+        # lock blob
+        try:
+            with self._locked(file_path), self._locked(self.blob_path(digest)):
+                created = self._install(tmp_path, digest)
+                old = self._bind(file_path, digest)
+        finally:
+            os.remove(tmp_path)
+        if not created:
+            with self.lock:
+                self.dedup_hits += 1
+                self.dedup_bytes += size
+        if old is not None and old != digest:
+            self.release(old)
+        return dict(sha256=digest, size=size, deduplicated=not created)
+
+    def put(self, file_path, chunks, expected=None):
+        """
+        simpan isi dari iterable chunk sebagai file_path; hash dihitung
+        sambil menulis ke file sementara, dan jika expected diberikan isi
+        yang tidak cocok ditolak tanpa mengubah file_path
+        """
+        tmp_path = os.path.join(self.tmp_dir, uuid.uuid4().hex)
+        h = hashlib.sha256()
+        size = write_temp(tmp_path, chunks, self.fsync, h.update)
+        digest = h.hexdigest()
+        if expected and expected != digest:
+            os.remove(tmp_path)
+            raise ChecksumMismatch(f'Checksum mismatch: expected {expected}, got {digest}')
+        return self._put_tmp(file_path, tmp_path, digest, size)
+
+    def put_file(self, file_path, src_path, expected=None):
+        # pindahkan file yang sudah utuh di disk (misalnya hasil upload per
+        # bagian) ke store; isinya dibaca sekali untuk menghitung hash
+        h = hashlib.sha256()
+        with open(src_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                h.update(chunk)
+            size = f.tell()
+            sync_file(f.fileno(), self.fsync)
+        digest = h.hexdigest()
+        if expected and expected != digest:
+            os.remove(src_path)
+            raise ChecksumMismatch(f'Checksum mismatch: expected {expected}, got {digest}')
+        tmp_path = os.path.join(self.tmp_dir, uuid.uuid4().hex)
+        os.replace(src_path, tmp_path)
+        return self._put_tmp(file_path, tmp_path, digest, size)
+
+    def link(self, file_path, digest):
+        """
+        petakan file_path ke blob yang sudah ada tanpa transfer isi;
+        hasil: False jika blob tidak ada
+        """
+        blob = self.blob_path(digest)
+        with self._locked(file_path), self._locked(blob):
+            if not os.path.exists(blob):
+                return False
+            old = self._bind(file_path, digest)
+        with self.lock:
+            self.dedup_hits += 1
+            self.dedup_bytes += os.path.getsize(file_path)
+        if old is not None and old != digest:
+            self.release(old)
+        return True
+
+    def remove(self, file_path):
+        with self._locked(file_path):
+            digest = self.digest_of(file_path)
+            os.remove(file_path)
+            if digest is not None:
+                self._drop_ref(digest, file_path)
+        if digest is not None:
+            self.release(digest)
+
+    def _referenced(self, digest):
+        # dipanggil di bawah lock blob; entry yang symlink-nya sudah
+        # berganti hash atau sudah dihapus diabaikan
+        ref_dir = os.path.join(self.refs_dir, digest[:2], digest)
+        try:
+            refs = os.listdir(ref_dir)
+        except FileNotFoundError:
+            return False
+        for ref in refs:
+            try:
+                with open(os.path.join(ref_dir, ref), 'rb') as f:
+                    rel = os.fsdecode(f.read())
+            except FileNotFoundError:
+                continue
+            if self.digest_of(os.path.join(self.files_dir, rel)) == digest:
+                return True
+        return False
+
+    def release(self, digest):
+        # hapus blob jika sudah tidak dirujuk; lock blob membuat cek dan
+        # hapus tidak bisa diselingi _bind ke blob yang sama
+        blob = self.blob_path(digest)
+        with self._locked(blob):
+            if self._referenced(digest):
+                return
+            try:
+                os.remove(blob)
+            except FileNotFoundError:
+                pass
+            ref_dir = os.path.join(self.refs_dir, digest[:2], digest)
+            try:
+                refs = os.listdir(ref_dir)
+            except FileNotFoundError:
+                return
+            # entry yang tertinggal ikut dibuang
+            for ref in refs:
+                try:
+                    os.remove(os.path.join(ref_dir, ref))
+                except FileNotFoundError:
+                    pass
+            try:
+                os.rmdir(ref_dir)
+            except OSError:
+                pass
+
+    def stats(self):
+        with self.lock:
+            return dict(dedup_hits=self.dedup_hits, dedup_bytes=self.dedup_bytes)
@@ -0,0 +1,377 @@
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import logging
+import mmap
+import multiprocessing
+import os
+import random
+import time
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+from benchmark_suite import make_test_file, percentile
+from file_client_cli import FileClient, server_address
+from file_framing import BINARY_MAGIC, HEADER_LEN, DELIMITER, CHUNK_SIZE, encode_binary_header
+
+"""
+* load generator untuk menjenuhkan server dari satu host: berbeda dengan
+stress_test_client yang meng-encode base64 dan membaca file di setiap
+worker, di sini request di-encode sekali di proses induk lalu disimpan di
+shared memory anonim (mmap) yang ikut ter-fork ke semua proses generator,
+sehingga tidak ada salinan payload per proses maupun per koneksi
+
+* setiap proses (default satu per core) menjalankan satu event loop asyncio
+dengan banyak koneksi sekaligus; protokol (frame binary dan JSON lama)
+diimplementasikan langsung di atas asyncio stream
+
+* isi download tidak disimpan: setiap chunk langsung masuk ke sha256 lalu
+dibuang, dan hash dibandingkan dengan hash file uji (untuk JSON, hash
+teks base64-nya) yang dihitung sekali di awal
+
+* closed-loop: setiap koneksi mengirim request berikutnya begitu respon
+diterima; open-loop (--rate): request datang dengan laju tetap (atau
+poisson) tanpa menunggu respon sebelumnya, dan latency dihitung dari
+jadwal kedatangan sehingga antrian di sisi client ikut terukur
+"""
+
+# penanda awal isi base64 pada respon GET JSON (lihat file_codec.splice_prefix)
+DATA_MARKER = b'"data_file":"'
+CONNECT_TIMEOUT = 30
+
+
+class SharedPayload:
+    """
+    request yang sudah di-encode, disimpan di mmap anonim MAP_SHARED;
+    proses yang di-fork setelahnya membaca halaman memori yang sama
+    """
+    def __init__(self, data):
+        self.length = len(data)
+        self.mm = mmap.mmap(-1, max(self.length, 1))
+        self.mm.write(data)
+
+    def view(self):
+        return memoryview(self.mm)[:self.length]
+
+
+class Result:
+    def __init__(self):
+        self.latencies = []
+        self.bytes = 0
+        self.busy = 0
+        self.fail = 0
+        self.checksum_fail = 0
+        self.connections = 0
+
+
+def raise_fd_limit():
+    # ribuan koneksi per proses butuh batas file descriptor yang cukup
+    if resource is None:
+        return
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if hard == resource.RLIM_INFINITY or soft < hard:
+        try:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+        except (ValueError, OSError):
+            pass
+
+
+def build_request(operation, mode, filename):
+    """
+    hasil: (bytes request, sha256 isi yang diharapkan untuk download atau
+    None, jumlah byte isi file per request)
+    """
+    name = os.path.basename(filename)
+    size = os.path.getsize(filename)
+    if operation == 'LIST':
+        command = {'command': 'LIST', 'params': []}
+        if mode == 'json':
+            return json.dumps(command).encode() + DELIMITER, None, 0
+        return encode_binary_header(command), None, 0
+    with open(filename, 'rb') as fp:
+        content = fp.read()
+    if operation == 'UPLOAD':
+        if mode == 'json':
+            command = {'command': 'UPLOAD', 'params': [name, base64.b64encode(content).decode()]}
+            return json.dumps(command).encode() + DELIMITER, None, size
+        return encode_binary_header({'command': 'UPLOAD', 'params': [name]}, size) + content, None, size
+    if mode == 'json':
+        expected = hashlib.sha256(base64.b64encode(content)).hexdigest()
+        return json.dumps({'command': 'GET', 'params': [name]}).encode() + DELIMITER, expected, size
+    command = {'command': 'GET', 'params': [name], 'sendfile': mode == 'sendfile'}
+    return encode_binary_header(command), hashlib.sha256(content).hexdigest(), size
+
+
+class Connection:
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+
+    @classmethod
+    async def open(cls, address):
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(*address, limit=CHUNK_SIZE * 4),
+                                                CONNECT_TIMEOUT)
+        return cls(reader, writer)
+
+    async def send(self, payload):
+        # dikirim per chunk dengan drain: buffer transport tidak pernah
+        # menyalin seluruh payload
+        for i in range(0, len(payload), CHUNK_SIZE):
+            self.writer.write(payload[i:i + CHUNK_SIZE])
+            await self.writer.drain()
+
+    async def read_binary(self, digest):
+        """hasil: (header, sha256 isi atau None)"""
+        head = await self.reader.readexactly(len(BINARY_MAGIC) + HEADER_LEN.size)
+        if head[:len(BINARY_MAGIC)] != BINARY_MAGIC:
+            # server penuh membalas BUSY dalam bentuk JSON
+            return json.loads(head + await self.reader.readuntil(DELIMITER)), None
+        (length,) = HEADER_LEN.unpack(head[len(BINARY_MAGIC):])
+        header = json.loads(await self.reader.readexactly(length))
+        sisa = header.get('size', 0)
+        h = hashlib.sha256() if digest else None
+        while sisa > 0:
+            chunk = await self.reader.read(min(sisa, CHUNK_SIZE * 4))
+            if not chunk:
+                raise ConnectionError('connection closed by server')
+            if h is not None:
+                h.update(chunk)
+            sisa -= len(chunk)
+        return header, h.hexdigest() if h is not None else None
+
+    async def read_json(self, digest):
+        """
+        hasil: (objek respon tanpa data_file, sha256 teks base64 atau None);
+        isi data_file di-hash sambil dibaca tanpa ditampung
+        """
+        head = bytearray()
+        while True:
+            chunk = await self.reader.read(CHUNK_SIZE * 4)
+            if not chunk:
+                raise ConnectionError('connection closed by server')
+            head += chunk
+            pos = head.find(DATA_MARKER)
+            if pos >= 0:
+                break
+            if head.endswith(DELIMITER):
+                return json.loads(bytes(head[:-len(DELIMITER)])), None
+        prefix = bytes(head[:pos]).rstrip(b',')
+        hasil = json.loads(prefix + b'}' if prefix != b'{' else b'{}')
+        h = hashlib.sha256()
+        data = bytes(head[pos + len(DATA_MARKER):])
+        while True:
+            end = data.find(b'"')
+            if end >= 0:
+                h.update(data[:end])
+                tail = data[end:]
+                break
+            h.update(data)
+            data = await self.reader.read(CHUNK_SIZE * 4)
+            if not data:
+                raise ConnectionError('connection closed by server')
+        while not tail.endswith(DELIMITER):
+            chunk = await self.reader.read(CHUNK_SIZE)
+            if not chunk:
+                raise ConnectionError('connection closed by server')
+            tail += chunk
+        return hasil, h.hexdigest() if digest else None
+
+    async def request(self, payload, mode, digest):
+        await self.send(payload)
+        if mode == 'json':
+            return await self.read_json(digest)
+        return await self.read_binary(digest)
+
+    def close(self):
+        self.writer.close()
+
+
+class Generator:
+    """satu proses generator: satu event loop, banyak koneksi"""
+    def __init__(self, address, payload, mode, digest, size, max_connections):
+        self.address = address
+        self.payload = payload
+        self.mode = mode
+        self.digest = digest
+        self.size = size
+        self.max_connections = max_connections
+        self.result = Result()
+
+    async def _connect(self):
+        conn = await Connection.open(self.address)
+        self.result.connections += 1
+        return conn
+
+    async def _run(self, conn, start):
+        """satu request, hasil: koneksi yang masih bisa dipakai atau None"""
+        try:
+            hasil, digest = await conn.request(self.payload, self.mode, self.digest)
+        except (OSError, asyncio.IncompleteReadError, ValueError) as e:
+            logging.warning(f"request failed: {e}")
+            self.result.fail += 1
+            conn.close()
+            return None
+        status = hasil.get('status')
+        if status == 'OK' and digest != self.digest:
+            logging.warning(f"checksum mismatch: expected {self.digest}, got {digest}")
+            self.result.checksum_fail += 1
+        elif status == 'OK':
+            self.result.latencies.append(time.perf_counter() - start)
+            self.result.bytes += self.size
+        elif status == 'BUSY':
+            self.result.busy += 1
+        else:
+            logging.warning(f"request failed: {hasil.get('data')}")
+            self.result.fail += 1
+        if hasil.get('close'):
+            conn.close()
+            return None
+        return conn
+
+    async def _closed_worker(self, requests, deadline):
+        conn = None
+        done = 0
+        while done < requests and time.perf_counter() < deadline:
+            done += 1
+            if conn is None:
+                try:
+                    conn = await self._connect()
+                except (OSError, asyncio.TimeoutError) as e:
+                    logging.warning(f"connect failed: {e}")
+                    self.result.fail += 1
+                    await asyncio.sleep(0.1)
+                    continue
+            conn = await self._run(conn, time.perf_counter())
+        if conn is not None:
+            conn.close()
+
+    async def closed_loop(self, requests, duration):
+        deadline = time.perf_counter() + duration
+        await asyncio.gather(*[self._closed_worker(requests, deadline) for _ in range(self.max_connections)])
+
+    async def _open_request(self, idle, slots, scheduled):
+        # koneksi idle dipakai ulang; koneksi baru dibuka selama belum
+        # mencapai batas, selebihnya request menunggu (waktu tunggu
+        # termasuk latency karena dihitung dari jadwal)
+        async with slots:
+            conn = idle.pop() if idle else None
+            if conn is None:
+                try:
+                    conn = await self._connect()
+                except (OSError, asyncio.TimeoutError) as e:
+                    logging.warning(f"connect failed: {e}")
+                    self.result.fail += 1
+                    return
+            conn = await self._run(conn, scheduled)
+            if conn is not None:
+                idle.append(conn)
+
+    async def open_loop(self, rate, requests, duration, poisson, phase):
+        idle = []
+        slots = asyncio.Semaphore(self.max_connections)
+        tasks = set()
+        start = time.perf_counter() + phase
+        deadline = start + duration
+        scheduled = start
+        for _ in range(requests):
+            if scheduled >= deadline:
+                break
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            task = asyncio.ensure_future(self._open_request(idle, slots, scheduled))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+            scheduled += random.expovariate(rate) if poisson else 1 / rate
+        if tasks:
+            await asyncio.gather(*tasks)
+        for conn in idle:
+            conn.close()
+
+
+def generator_process(index, args, shared, digest, size, queue):
+    raise_fd_limit()
+    logging.basicConfig(level=logging.ERROR)
+    generator = Generator(args.address, shared.view(), args.mode, digest, size, args.connections)
+    # batas jumlah request dan laju dibagi rata ke semua proses
+    requests = args.requests // args.processes + (index < args.requests % args.processes)
+    if args.rate:
+        rate = args.rate / args.processes
+        phase = index / args.rate
+        asyncio.run(generator.open_loop(rate, requests, args.duration, args.poisson, phase))
+    else:
+        per_connection = -(-requests // args.connections)
+        asyncio.run(generator.closed_loop(per_connection, args.duration))
+    r = generator.result
+    queue.put((r.latencies, r.bytes, r.busy, r.fail, r.checksum_fail, r.connections))
+
+
+def parse_address(value):
+    host, _, port = value.rpartition(':')
+    return host, int(port)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Async multi-process load generator for the file server")
+    parser.add_argument("--address", type=parse_address, default=server_address, help="Server address host:port")
+    parser.add_argument("--operation", choices=["UPLOAD", "DOWNLOAD", "LIST"], default="DOWNLOAD")
+    parser.add_argument("--mode", choices=["json", "binary", "sendfile"], default="binary")
+    parser.add_argument("--size", type=float, default=1, help="Test file size in MB")
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1, help="Generator processes (one event loop each)")
+    parser.add_argument("--connections", type=int, default=100, help="Connections per process")
+    parser.add_argument("--requests", type=int, default=10 ** 9, help="Total requests across all processes")
+    parser.add_argument("--duration", type=float, default=10, help="Seconds to generate load")
+    parser.add_argument("--rate", type=float, default=0, help="Open-loop arrival rate in requests/s (0 = closed loop)")
+    parser.add_argument("--poisson", action="store_true", help="Poisson arrivals instead of a fixed interval")
+    parser.add_argument("--workdir", default=".", help="Directory for the test file")
+    args = parser.parse_args()
+
+    filename = make_test_file(args.workdir, args.size)
+    if args.operation == 'DOWNLOAD':
+        client = FileClient(args.address)
+        try:
+            with open(filename, 'rb') as fp:
+                hasil, _ = client.request_binary({'command': 'UPLOAD', 'params': [os.path.basename(filename)]}, fp)
+        finally:
+            client.close()
+        if hasil['status'] != 'OK':
+            raise SystemExit(f"upload of test file failed: {hasil.get('data')}")
+
+    data, digest, size = build_request(args.operation, args.mode, filename)
+    shared = SharedPayload(data)
+    del data
+
+    # fork diperlukan agar mmap anonim terbagi ke semua proses
+    ctx = multiprocessing.get_context('fork')
+    queue = ctx.Queue()
+    processes = [ctx.Process(target=generator_process, args=(i, args, shared, digest, size, queue))
+                 for i in range(args.processes)]
+    start = time.perf_counter()
+    for p in processes:
+        p.start()
+    results = [queue.get() for _ in processes]
+    wall = time.perf_counter() - start
+    for p in processes:
+        p.join()
+
+    latencies = [lat for r in results for lat in r[0]]
+    total_bytes = sum(r[1] for r in results)
+    busy, fail, checksum_fail = (sum(r[i] for r in results) for i in (2, 3, 4))
+    print(f"operation={args.operation} mode={args.mode} size={args.size}MB processes={args.processes} "
+          f"connections={args.processes * args.connections} "
+          f"{'open-loop rate=' + str(args.rate) + '/s' if args.rate else 'closed-loop'}")
+    print(f"ok={len(latencies)} busy={busy} fail={fail} checksum_fail={checksum_fail} "
+          f"opened_connections={sum(r[5] for r in results)} wall={wall:.2f}s")
+    print(f"throughput={len(latencies) / wall:.1f} req/s  {total_bytes / (1024 * 1024) / wall:.2f} MB/s")
+    print(f"latency p50={percentile(latencies, 50):.4f}s p95={percentile(latencies, 95):.4f}s "
+          f"p99={percentile(latencies, 99):.4f}s")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.ERROR)
+    main()
@@ -6,17 +6,89 @@ import json
 import logging
 import argparse
 from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
-from file_client_cli import send_command
+from file_client_cli import get_client
 import random
 
-server_address = ('172.16.16.101', 45000)
+# None berarti memakai file_client_cli: server_address, atau semua node
+# cluster jika FILE_CLUSTER diisi
+server_address = None
 
 def generate_test_file(filename, size_bytes):
+    # file uji dipakai ulang jika ukurannya sudah sesuai
+    if os.path.exists(filename) and os.path.getsize(filename) == size_bytes:
+        return filename
     with open(filename, 'wb') as f:
         f.write(os.urandom(size_bytes))
     return filename
 
-def client_task(operation, filename, concurrency_type="thread", worker_id=0):
+def binary_client_task(operation, filename, mode="binary", worker_id=0):
+    # mode binary/sendfile: isi file dikirim mentah lewat frame binary,
+    # mode sendfile meminta server mengirim GET dengan socket.sendfile
+    start_time = time.time()
+    try:
+        if operation == "UPLOAD":
+            command_str = {'command': 'UPLOAD', 'params': [filename]}
+            with open(filename, "rb") as fp:
+                result, _ = get_client(server_address).request_binary(command_str, fp)
+            file_size = os.path.getsize(filename)
+        else:
+            command_str = {'command': 'GET', 'params': [filename], 'sendfile': mode == "sendfile"}
+            result, isifile = get_client(server_address).request_binary(command_str)
+            file_size = len(isifile)
+        if not result or result['status'] != 'OK':
+            logging.error(f"Worker {worker_id} failed: {result['data'] if result else 'no response'}")
+            return False, 0, 0
+        elapsed_time = time.time() - start_time
+        throughput = file_size / elapsed_time if elapsed_time > 0 else 0
+        return True, elapsed_time, throughput
+    except Exception as e:
+        logging.error(f"Worker {worker_id} exception: {e}")
+        return False, 0, 0
+
+def pipelined_client_task(operation, filename, mode="json", worker_id=0, depth=1):
+    # depth request dikirim berturut-turut lewat satu koneksi tanpa menunggu
+    # respon (FileClient.pipeline), waktu dihitung untuk seluruh batch
+    start_time = time.time()
+    try:
+        client = get_client(server_address)
+        if not hasattr(client, 'pipeline'):
+            logging.error(f"Worker {worker_id} failed: pipelining is not supported in cluster mode")
+            return False, 0, 0
+        binary = mode != "json"
+        if operation == "UPLOAD":
+            with open(filename, "rb") as fp:
+                file_content = fp.read()
+            if binary:
+                requests = [({'command': 'UPLOAD', 'params': [filename]}, file_content)] * depth
+            else:
+                requests = [{'command': 'UPLOAD', 'params': [filename, base64.b64encode(file_content).decode()]}] * depth
+        else:
+            command_str = {'command': 'GET', 'params': [filename]}
+            if binary:
+                command_str['sendfile'] = mode == "sendfile"
+            requests = [(command_str, b'') if binary else command_str] * depth
+        file_size = 0
+        for hasil in client.pipeline(requests):
+            result, isifile = hasil if binary else (hasil, None)
+            if result['status'] != 'OK':
+                logging.error(f"Worker {worker_id} failed: {result['data']}")
+                return False, 0, 0
+            if operation == "UPLOAD":
+                file_size += len(file_content)
+            else:
+                file_size += len(isifile) if binary else len(base64.b64decode(result['data_file']))
+        elapsed_time = time.time() - start_time
+        throughput = file_size / elapsed_time if elapsed_time > 0 else 0
+        return True, elapsed_time, throughput
+    except Exception as e:
+        logging.error(f"Worker {worker_id} exception: {e}")
+        return False, 0, 0
+
+def client_task(operation, filename, concurrency_type="thread", worker_id=0, mode="json", pipeline=1):
+    if pipeline > 1:
+        return pipelined_client_task(operation, filename, mode, worker_id, pipeline)
+    if mode != "json":
+        return binary_client_task(operation, filename, mode, worker_id)
     start_time = time.time()
     downloaded_file = None
     if operation == "UPLOAD":
@@ -44,7 +116,8 @@ def client_task(operation, filename, concurrency_type="thread", worker_id=0):
         return False, 0, 0
 
     try:
-        result = send_command(command_str)
+        # koneksi diambil dari pool FileClient, dipakai ulang antar request
+        result = get_client(server_address).request(command_str)
         if result['status'] == 'OK':
             if operation == "DOWNLOAD":
                 namafile = result['data_namafile']
@@ -76,20 +149,22 @@ def client_task(operation, filename, concurrency_type="thread", worker_id=0):
                 logging.warning(f"Failed to delete downloaded file {downloaded_file}: {e}")
         return False, 0, 0
 
-def run_stress_test(operation, file_size_mb, client_workers, concurrency_type="thread"):
+def run_stress_test(operation, file_size_mb, client_workers, concurrency_type="thread", mode="json", pipeline=1):
     file_size_bytes = file_size_mb * 1024 * 1024
     filename = f"test_file_{file_size_mb}MB.bin"
     generate_test_file(filename, file_size_bytes)
     
     results = []
     executor_class = ThreadPoolExecutor if concurrency_type == "thread" else ProcessPoolExecutor
+    start_time = time.time()
     with executor_class(max_workers=client_workers) as executor:
         futures = [
-            executor.submit(client_task, operation, filename, concurrency_type, i)
+            executor.submit(client_task, operation, filename, concurrency_type, i, mode, pipeline)
             for i in range(client_workers)
         ]
         for future in futures:
             results.append(future.result())
+    wall_time = time.time() - start_time
     
     success_count = sum(1 for r in results if r[0])
     fail_count = len(results) - success_count
@@ -99,7 +174,10 @@ def run_stress_test(operation, file_size_mb, client_workers, concurrency_type="t
         "success": success_count,
         "fail": fail_count,
         "avg_time": total_time,
-        "avg_throughput": total_throughput
+        "avg_throughput": total_throughput,
+        # total byte semua client yang berhasil dibagi waktu keseluruhan test
+        # (setiap client mengirim pipeline request)
+        "aggregate_throughput": success_count * pipeline * file_size_bytes / wall_time if wall_time > 0 else 0
     }
 
 def main():
@@ -130,10 +208,22 @@ def main():
         required=True,
         help="Number of client workers (1, 5, or 50)"
     )
+    parser.add_argument(
+        "--mode",
+        choices=["json", "binary", "sendfile"],
+        default="json",
+        help="Wire protocol: legacy JSON+base64, binary frames, or binary frames with zero-copy GET"
+    )
+    parser.add_argument(
+        "--pipeline",
+        type=int,
+        default=1,
+        help="Requests each client worker sends back-to-back on one connection without waiting for responses"
+    )
     args = parser.parse_args()
 
-    print(f"Running test: {args.operation}, {args.volume}MB, {args.worker} workers, {args.method}")
-    result = run_stress_test(args.operation, args.volume, args.worker, args.method)
+    print(f"Running test: {args.operation}, {args.volume}MB, {args.worker} workers, {args.method}, {args.mode}, pipeline {args.pipeline}")
+    result = run_stress_test(args.operation, args.volume, args.worker, args.method, args.mode, args.pipeline)
     
     result_entry = {
         "number": 1,
@@ -141,15 +231,17 @@ def main():
         "volume_mb": args.volume,
         "client_workers": args.worker,
         "concurrency_type": args.method,
+        "pipeline": args.pipeline,
         "avg_time": result["avg_time"],
         "avg_throughput": result["avg_throughput"],
+        "aggregate_throughput": result["aggregate_throughput"],
         "client_success": result["success"],
         "client_fail": result["fail"]
     }
 
-    print("\nStress Test Results:")
-    print(f"{'No':<5} {'Op':<10} {'Size(MB)':<10} {'Client Workers':<15} {'Concurrency':<12} {'Avg Time(s)':<12} {'Throughput(B/s)':<15} {'Client Success':<15} {'Client Fail':<10}")
-    print(f"{result_entry['number']:<5} {result_entry['operation']:<10} {result_entry['volume_mb']:<10} {result_entry['client_workers']:<15} {result_entry['concurrency_type']:<12} {result_entry['avg_time']:<12.2f} {result_entry['avg_throughput']:<15.2f} {result_entry['client_success']:<15} {result_entry['client_fail']:<10}")
+    print("\nStress Test Results (untuk matriks lengkap gunakan benchmark_suite.py):")
+    print(f"{'No':<5} {'Op':<10} {'Size(MB)':<10} {'Client Workers':<15} {'Concurrency':<12} {'Avg Time(s)':<12} {'Throughput(B/s)':<15} {'Aggregate(B/s)':<15} {'Client Success':<15} {'Client Fail':<10}")
+    print(f"{result_entry['number']:<5} {result_entry['operation']:<10} {result_entry['volume_mb']:<10} {result_entry['client_workers']:<15} {result_entry['concurrency_type']:<12} {result_entry['avg_time']:<12.2f} {result_entry['avg_throughput']:<15.2f} {result_entry['aggregate_throughput']:<15.2f} {result_entry['client_success']:<15} {result_entry['client_fail']:<10}")
 
 if __name__ == "__main__":
     logging.basicConfig(level=logging.WARNING)